@@ -1,6 +1,18 @@
 """
 Build script to create an executable for the Image Resizer application.
 
+Usage:
+    python build_exe.py                     GUI version, single-file executable
+    python build_exe.py --cli               CLI version
+    python build_exe.py --cli --fast-start  CLI version built to start quickly
+
+The default single-file executable unpacks itself to a temporary folder on
+every launch. The fast-start profile builds a folder instead (dist/NAME/NAME.exe)
+that starts without unpacking, leaves the bundled libraries uncompressed (UPX
+compressed libraries are decompressed on every load) and leaves out the Pillow
+plugins of formats the resizer does not read or write. The CLI version never
+includes tkinter.
+
 Author: Gianpaolo Albanese
 Email: albaneg@yahoo.com
 Version: 2
@@ -11,9 +23,16 @@ Assisted by: Amazon Q for VS Code
 import PyInstaller.__main__
 import os
 import sys
+import pkgutil
+
+import PIL
+
+from image_resizer_output import _FORMAT_PLUGINS
 
 # Determine if we're running the GUI or CLI version
-if len(sys.argv) > 1 and sys.argv[1] == "--cli":
+cli = "--cli" in sys.argv[1:]
+fast_start = "--fast-start" in sys.argv[1:]
+if cli:
     print("Building CLI version...")
     script = "image_resizer.py"
     name = "ImageResizer_CLI"
@@ -30,13 +49,33 @@ if not os.path.exists("dist"):
 args = [
     script,
     "--name=" + name,
-    "--onefile",
+    "--onedir" if fast_start else "--onefile",
     "--clean",
-    "--windowed" if script == "image_resizer_gui.py" else "",
     "--add-data=README.md;.",
 ]
+if not cli:
+    args.append("--windowed")
+else:
+    args.append("--exclude-module=tkinter")
+
+if fast_start:
+    print("Using the fast-start profile")
+    args.append("--noupx")
+    # Build tools pulled in through optional dependencies (e.g. cffi for pyvips); once
+    # bundled, a runtime hook imports pkg_resources on every launch
+    for module in ("setuptools", "pkg_resources", "distutils"):
+        args.append(f"--exclude-module={module}")
+    # The plugins of the supported formats are imported by name, so list them explicitly;
+    # multi-picture JPEGs (written by many cameras) are read by the MPO plugin
+    used_plugins = set(_FORMAT_PLUGINS.values()) | {"MpoImagePlugin"}
+    for plugin in sorted(used_plugins):
+        args.append(f"--hidden-import=PIL.{plugin}")
+    for module in pkgutil.iter_modules(PIL.__path__):
+        if module.name.endswith("ImagePlugin") and module.name not in used_plugins:
+            args.append(f"--exclude-module=PIL.{module.name}")
 
 # Run PyInstaller
 PyInstaller.__main__.run(args)
 
-print(f"\nBuild complete! Executable created at: dist/{name}.exe")
\ No newline at end of file
+executable = f"dist/{name}/{name}.exe" if fast_start else f"dist/{name}.exe"
+print(f"\nBuild complete! Executable created at: {executable}")
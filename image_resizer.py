@@ -13,10 +13,21 @@ Assisted by: Amazon Q for VS Code
 """
 
 import os
+import io
 import sys
+import time
 import argparse
+import functools
+import itertools
 from PIL import Image
-from pathlib import Path
+
+from image_resizer_animation import ANIMATED_FORMATS, is_animated, resize_animation
+from image_resizer_archive import ArchiveReader, ArchiveWriter, is_archive
+from image_resizer_backend import BACKENDS, DEFAULT_BACKEND, check_backend, get_backend, open_source
+from image_resizer_output import (OUTPUT_FORMATS, PRESETS, byte_size, encode_within, format_for_path,
+                                  output_extension_path, output_options, prepare_image)
+from image_resizer_profile import NULL_TIMER, StageTimer, RunProfile
+from image_resizer_strips import DEFAULT_LARGE_IMAGE_PIXELS, PngStripReader, open_strip_reader, resize_strips
 
 
 def create_directory(directory_path):
@@ -26,7 +37,346 @@ def create_directory(directory_path):
         print(f"Created directory: {directory_path}")
 
 
-def resize_image(input_path, output_path, size=None, percentage=None):
+# File extensions of supported image formats (matched case-insensitively)
+SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".webp"}
+
+
+def scan_images(input_folder, recursive=False, exclude=None):
+    """
+    Find supported images in a folder, yielding them as they are discovered.
+    
+    Each directory is listed once with os.scandir and extensions are matched
+    case-insensitively, so every file is reported exactly once.
+    
+    Args:
+        input_folder: Path to the folder to scan
+        recursive: Also scan subfolders
+        exclude: Optional folder to leave out when recursing (e.g. an output
+                 folder nested inside the input folder)
+    
+    Yields:
+        Tuples of (path, relative_path) where relative_path is relative to input_folder
+    """
+    excluded = os.path.realpath(exclude) if exclude else None
+    pending = [(input_folder, "")]
+    while pending:
+        directory, relative_dir = pending.pop()
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    if os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                        yield entry.path, os.path.join(relative_dir, entry.name)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    if os.path.realpath(entry.path) != excluded:
+                        subdirectories.append((entry.path, os.path.join(relative_dir, entry.name)))
+        # Visit subfolders in name order after the files of the current folder
+        pending.extend(sorted(subdirectories, reverse=True))
+
+
+# Minimum ratio between the intermediate and the final size in fast downscale mode.
+# Pillow only reduces by integer factors (JPEG DCT scaling, Image.reduce) down to
+# this multiple of the target before the final LANCZOS pass. At 3.0 the output
+# differs from the full-resolution path by less than 1 level (out of 255) on
+# average per channel, with isolated pixels differing by at most a few levels.
+FAST_REDUCING_GAP = 3.0
+
+
+def resize_pixels(img, new_size, fast=False, timer=NULL_TIMER):
+    """
+    Resize an opened image to new_size with the LANCZOS filter.
+    
+    Args:
+        img: An opened PIL image that has not been loaded yet
+        new_size: Tuple of (width, height) for the new size
+        fast: If True, let the JPEG decoder decode at a reduced scale and reduce by
+              integer factors before the final filter (see FAST_REDUCING_GAP)
+        timer: Optional StageTimer receiving the decode and resize times
+    
+    Returns:
+        The resized image
+    """
+    if fast:
+        # Ask the decoder for the smallest scale that stays above the reducing gap.
+        # This is a no-op for formats without draft support.
+        draft_size = (int(new_size[0] * FAST_REDUCING_GAP), int(new_size[1] * FAST_REDUCING_GAP))
+        img.draft(img.mode, draft_size)
+    
+    with timer.stage("decode"):
+        img.load()
+    with timer.stage("resize"):
+        if fast:
+            return img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=FAST_REDUCING_GAP)
+        return img.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def encode_image(img, output_path, timer=NULL_TIMER, output=None):
+    """
+    Encode an image in memory in the format matching the extension of output_path.
+    
+    Args:
+        output: Optional encoder settings from image_resizer_output.output_options.
+                With a byte budget (max_bytes), the quality is searched with trial
+                encodes of the same pixels, and their number is added to the
+                timer's trial_encodes.
+    
+    Returns:
+        The encoded image as bytes
+    """
+    image_format = format_for_path(output_path)
+    if image_format is None:
+        raise ValueError(f"unknown file extension: {os.path.splitext(output_path)[1]}")
+    with timer.stage("encode"):
+        img, save_options = prepare_image(img, image_format, output)
+        if output and output.get("max_bytes"):
+            data, quality, trials = encode_within(img, image_format, save_options, output["max_bytes"])
+            timer.add("quality_searches", 1)
+            timer.add("trial_encodes", trials)
+            if quality is not None:
+                timer.set("quality", quality)
+            return data
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format, **save_options)
+    return buffer.getvalue()
+
+
+def write_file(data, output_path):
+    """
+    Write data to output_path through a temporary file that then replaces it.
+    
+    Readers never see a partial image, and an existing output that is hardlinked
+    elsewhere (see --dedup) is replaced rather than overwritten in place.
+    """
+    directory, name = os.path.split(output_path)
+    temporary_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    with open(temporary_path, "wb") as output_file:
+        output_file.write(data)
+    os.replace(temporary_path, output_path)
+
+
+def save_image(img, output_path, timer=NULL_TIMER, output=None, sink=None):
+    """
+    Encode an image and write it to output_path, timing the two stages separately.
+    
+    Args:
+        sink: Optional function called with (output_path, data) instead of writing
+              the file, e.g. to hand the encoded image to a write-behind stage
+    
+    Returns:
+        Number of bytes written
+    """
+    data = encode_image(img, output_path, timer, output)
+    if sink is not None:
+        sink(output_path, data)
+    else:
+        with timer.stage("write"):
+            write_file(data, output_path)
+    timer.add("output_bytes", len(data))
+    timer.add("output_pixels", img.width * img.height)
+    return len(data)
+
+
+# A smaller rendition is derived from the previous (larger) one only when that one is
+# at least this many times larger in both dimensions; otherwise it is derived from
+# the decoded source so the extra resampling step stays invisible.
+CASCADE_MIN_RATIO = 2.0
+
+
+def compute_new_size(original_size, size=None, percentage=None, maintain_aspect=False):
+    """
+    Compute the target size of a resize.
+    
+    Args:
+        original_size: Tuple of (width, height) of the source image
+        size: Tuple of (width, height) for the new size, or None if using percentage
+        percentage: Percentage to resize the image, or None if using fixed dimensions
+        maintain_aspect: With fixed dimensions, keep the aspect ratio of the source by
+                         using the width for landscape and the height for portrait images
+    
+    Returns:
+        Tuple of (new_size, resize_type) where resize_type describes the resize
+    """
+    if percentage is not None:
+        # Calculate new dimensions based on percentage
+        scale_factor = percentage / 100.0
+        new_width = int(original_size[0] * scale_factor)
+        new_height = int(original_size[1] * scale_factor)
+        return (new_width, new_height), f"{percentage}% ({new_width}x{new_height})"
+    
+    if maintain_aspect:
+        # Calculate new size if maintaining aspect ratio
+        original_width, original_height = original_size
+        aspect_ratio = original_width / original_height
+        if original_width > original_height:
+            new_width, new_height = size[0], int(size[0] / aspect_ratio)
+        else:
+            new_width, new_height = int(size[1] * aspect_ratio), size[1]
+        return (new_width, new_height), f"{new_width}x{new_height}"
+    
+    # Use the provided fixed dimensions
+    return tuple(size), f"{size[0]}x{size[1]}"
+
+
+def rendition_output_path(output_path, rendition, output_root=None):
+    """
+    Return where a rendition of an image is saved.
+    
+    Args:
+        output_path: Path the image would be saved to without renditions
+        rendition: Rendition dictionary with either a "subfolder" or a "suffix" entry
+        output_root: Folder the rendition subfolder is created in, with the layout
+                     below it mirrored (defaults to the folder of output_path)
+    
+    Returns:
+        Path of the rendition
+    """
+    if rendition.get("suffix"):
+        stem, extension = os.path.splitext(output_path)
+        return stem + rendition["suffix"] + extension
+    
+    output_root = output_root or os.path.dirname(output_path)
+    relative_path = os.path.relpath(output_path, output_root)
+    return os.path.join(output_root, rendition["subfolder"], relative_path)
+
+
+def output_paths(output_path, renditions=None, output_root=None):
+    """Return every path written for an image saved to output_path."""
+    if not renditions:
+        return [output_path]
+    return [rendition_output_path(output_path, rendition, output_root) for rendition in renditions]
+
+
+def _resize_targets(original_size, output_path, size=None, percentage=None, renditions=None, output_root=None,
+                    maintain_aspect=False):
+    """
+    List the images to produce from a source of the given size.
+    
+    Returns:
+        List of (new_size, resize_type, path) tuples, largest first
+    """
+    if not renditions:
+        new_size, resize_type = compute_new_size(original_size, size=size, percentage=percentage,
+                                                 maintain_aspect=maintain_aspect)
+        return [(new_size, resize_type, output_path)]
+    
+    targets = []
+    for rendition in renditions:
+        new_size, resize_type = compute_new_size(original_size, size=rendition.get("size"),
+                                                 percentage=rendition.get("percentage"),
+                                                 maintain_aspect=maintain_aspect)
+        path = rendition_output_path(output_path, rendition, output_root)
+        targets.append((new_size, f"{rendition['name']}: {resize_type}", path))
+    targets.sort(key=lambda target: target[0][0] * target[0][1], reverse=True)
+    return targets
+
+
+def _resize_file(input_path, output_path, size=None, percentage=None, fast=False, renditions=None,
+                 output_root=None, large_image_pixels=DEFAULT_LARGE_IMAGE_PIXELS, maintain_aspect=False,
+                 output=None, backend=DEFAULT_BACKEND, timer=NULL_TIMER, source=None, sink=None):
+    """
+    Resize a single image and save it, raising on any error.
+    
+    With renditions, the source is decoded once and every rendition is resized from
+    the smallest already resized image that is still large enough (see
+    CASCADE_MIN_RATIO), largest rendition first.
+    
+    TIFF and PNG images with at least large_image_pixels pixels are read and resized
+    strip by strip so that memory use does not grow with the image size.
+    
+    The output format follows the extension of output_path; output holds the
+    encoder settings (see image_resizer_output.output_options).
+    
+    Animated GIF and WebP images written as GIF or WebP are resized frame by frame
+    (see image_resizer_animation); other formats get the first frame.
+    
+    backend names the engine that opens and resizes the source (see
+    image_resizer_backend); animations are always resized with Pillow.
+    
+    source optionally holds the bytes of input_path, already read into memory, and
+    sink receives the encoded outputs instead of them being written (see save_image);
+    output folders are then left to the sink as well.
+    
+    Returns:
+        A short description of the resize that was applied, e.g. "800x600"
+    """
+    input_bytes = len(source) if source is not None else os.path.getsize(input_path)
+    engine = get_backend(backend)
+    if large_image_pixels and not engine.streams:
+        with timer.stage("open"):
+            reader = open_strip_reader(io.BytesIO(source) if source is not None else input_path,
+                                       large_image_pixels)
+        if reader is not None:
+            with reader.fp:
+                return _resize_file_in_strips(reader, input_path, output_path, size, percentage,
+                                              renditions, output_root, maintain_aspect, output, timer,
+                                              input_bytes, sink)
+    
+    with timer.stage("open"):
+        # A source resized only once can be streamed
+        img = engine.open(input_path, source, sequential=not renditions)
+    with img:
+        timer.set("format", img.format)
+        timer.set("input_bytes", input_bytes)
+        timer.set("input_pixels", img.width * img.height)
+        
+        targets = _resize_targets(img.size, output_path, size, percentage, renditions, output_root,
+                                  maintain_aspect)
+        image_format = format_for_path(output_path)
+        if image_format in ANIMATED_FORMATS and is_animated(img):
+            if sink is None:
+                for _, _, path in targets:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Animations are resized frame by frame with Pillow whatever the backend
+            with img if isinstance(img, Image.Image) else open_source(input_path, source) as animation:
+                frames = resize_animation(animation, [(new_size, path) for new_size, _, path in targets],
+                                          image_format, fast=fast, output=output, timer=timer, sink=sink)
+            return ", ".join(resize_type for _, resize_type, _ in targets) + f" ({frames} frames)"
+        
+        if not renditions:
+            new_size, resize_type, _ = targets[0]
+            # Resize the image
+            resized_img = engine.resize(img, new_size, fast=fast, timer=timer)
+            # Save the resized image
+            save_image(resized_img, output_path, timer, output, sink)
+            return resize_type
+        
+        # Decode once, at a reduced scale that still suits the largest rendition
+        if fast:
+            largest = targets[0][0]
+            img.draft(img.mode, (int(largest[0] * FAST_REDUCING_GAP), int(largest[1] * FAST_REDUCING_GAP)))
+        
+        previous = img
+        for new_size, _, path in targets:
+            if (not engine.cascades or previous.width < new_size[0] * CASCADE_MIN_RATIO
+                    or previous.height < new_size[1] * CASCADE_MIN_RATIO):
+                previous = img
+            resized_img = engine.resize(previous, new_size, fast=fast, timer=timer)
+            if sink is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            save_image(resized_img, path, timer, output, sink)
+            previous = resized_img
+        return ", ".join(resize_type for _, resize_type, _ in targets)
+
+
+def _resize_file_in_strips(reader, input_path, output_path, size, percentage, renditions, output_root,
+                           maintain_aspect, output, timer, input_bytes, sink=None):
+    """Resize a large image strip by strip into every target size in a single pass."""
+    timer.set("format", "PNG" if isinstance(reader, PngStripReader) else "TIFF")
+    timer.set("input_bytes", input_bytes)
+    timer.set("input_pixels", reader.size[0] * reader.size[1])
+    
+    targets = _resize_targets(reader.size, output_path, size, percentage, renditions, output_root,
+                              maintain_aspect)
+    resized_images = resize_strips(reader, [new_size for new_size, _, _ in targets], timer)
+    for (_, _, path), resized_img in zip(targets, resized_images):
+        if sink is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        save_image(resized_img, path, timer, output, sink)
+    return ", ".join(resize_type for _, resize_type, _ in targets) + " (in strips)"
+
+
+def resize_image(input_path, output_path, size=None, percentage=None, fast=False, renditions=None,
+                 maintain_aspect=False, output=None, backend=DEFAULT_BACKEND):
     """
     Resize an image and save it to the output path.
     
@@ -35,73 +385,651 @@ def resize_image(input_path, output_path, size=None, percentage=None):
         output_path: Path where the resized image will be saved
         size: Tuple of (width, height) for the new size, or None if using percentage
         percentage: Percentage to resize the image, or None if using fixed dimensions
+        fast: Use the fast downscale path (reduced-scale decoding and integer pre-reduction)
+        renditions: Optional list of rendition dictionaries, used instead of size and
+                    percentage. Each has a "name", either a "size" or a "percentage", and
+                    either a "subfolder" (next to output_path) or a filename "suffix".
+        maintain_aspect: With fixed dimensions, keep the aspect ratio of the source
+        output: Optional encoder settings (see image_resizer_output.output_options).
+                The format is taken from the extension of output_path.
+        backend: Resize engine, "pillow" or "vips" (see image_resizer_backend)
+    
+    Returns:
+        True if the image was resized successfully, False otherwise
     """
     try:
-        with Image.open(input_path) as img:
-            original_width, original_height = img.size
-            
-            if percentage is not None:
-                # Calculate new dimensions based on percentage
-                scale_factor = percentage / 100.0
-                new_width = int(original_width * scale_factor)
-                new_height = int(original_height * scale_factor)
-                new_size = (new_width, new_height)
-                resize_type = f"{percentage}% ({new_width}x{new_height})"
-            else:
-                # Use the provided fixed dimensions
-                new_size = size
-                resize_type = f"{size[0]}x{size[1]}"
-            
-            # Resize the image
-            resized_img = img.resize(new_size, Image.Resampling.LANCZOS)
-            # Save the resized image
-            resized_img.save(output_path)
-            print(f"Resized: {os.path.basename(input_path)} -> {resize_type}")
+        resize_type = _resize_file(input_path, output_path, size=size, percentage=percentage,
+                                   fast=fast, renditions=renditions, maintain_aspect=maintain_aspect,
+                                   output=output, backend=backend)
+        print(f"Resized: {os.path.basename(input_path)} -> {resize_type}")
+        return True
     except Exception as e:
         print(f"Error processing {input_path}: {e}")
+        return False
+
+
+def searches_quality(options):
+    """Return True if the jobs with these options search the quality for a byte budget."""
+    return bool((options.get("output") or {}).get("max_bytes"))
+
+
+def count_trial_encodes(summary, stats):
+    """Add the trial encodes of a finished job's quality searches (see --max-bytes) to a run summary."""
+    if stats and stats.get("quality_searches"):
+        summary["quality_searches"] = summary.get("quality_searches", 0) + stats["quality_searches"]
+        summary["trial_encodes"] = summary.get("trial_encodes", 0) + stats["trial_encodes"]
+
+
+def new_summary(**counters):
+    """Return the summary of a run (see run_jobs) before any job finished, with extra counters."""
+    summary = {"total": 0, "succeeded": 0, "failed": 0, "failures": [], "elapsed": 0.0, "cancelled": False,
+               "input_bytes": 0, "output_bytes": 0}
+    summary.update(counters)
+    return summary
+
+
+def add_result(summary, result, profile=None, keep_failures=True):
+    """
+    Add a finished job to a run summary.
+    
+    Args:
+        summary: Summary dictionary from new_summary
+        result: Tuple of (input_path, success, message, stats) from _run_job
+        profile: Optional RunProfile the stages of the job are added to
+        keep_failures: List a failed job in the failures of the summary; runs
+                       that log their failures elsewhere leave it off
+    """
+    input_path, success, message, stats = result
+    summary["total"] += 1
+    if success:
+        summary["succeeded"] += 1
+        summary["input_bytes"] += stats.get("input_bytes", 0)
+        summary["output_bytes"] += stats.get("output_bytes", 0)
+        count_trial_encodes(summary, stats)
+    else:
+        summary["failed"] += 1
+        if keep_failures:
+            summary["failures"].append((input_path, message))
+    if profile is not None:
+        profile.add(input_path, stats)
+
+
+def _run_job(job, profile=False):
+    """
+    Worker entry point: resize one file and report the outcome instead of raising.
+    
+    Args:
+        job: Tuple of (input_path, output_path, options) where options are keyword
+             arguments for _resize_file
+        profile: Time the stages of the job
+    
+    Returns:
+        Tuple of (input_path, success, message, stats) where stats is the StageTimer
+        record of the job when profiling or searching the quality, and otherwise
+        holds only its input_bytes and output_bytes (None for failed jobs)
+    """
+    input_path, output_path, options = job
+    timer = StageTimer() if profile or searches_quality(options) else NULL_TIMER
+    try:
+        resize_type = _resize_file(input_path, output_path, timer=timer, **options)
+        stats = timer.record
+        if stats is None:
+            written = output_paths(output_path, options.get("renditions"), options.get("output_root"))
+            stats = {"input_bytes": os.path.getsize(input_path),
+                     "output_bytes": sum(os.path.getsize(path) for path in written)}
+        return input_path, True, resize_type, stats
+    except Exception as e:
+        return input_path, False, str(e), None
+
+
+class WorkerPool:
+    """
+    Pool of worker processes that outlives the death of a worker.
+    
+    A worker that dies in the middle of a job (e.g. killed for using too much
+    memory) breaks the whole process pool. The job it was running then fails
+    with a "worker process died" error and the other jobs in flight are
+    submitted again to a new pool, so one job cannot end a run.
+    """
+    
+    def __init__(self, workers, function=_run_job, initializer=None):
+        # Imported here: single-image runs from scripts never need them
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers
+        self._function = function
+        self._initializer = initializer
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        # Future -> (key, arguments) of the jobs in flight
+        self._pending = {}
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.shutdown()
+    
+    @property
+    def futures(self):
+        """Futures of the jobs in flight, e.g. to wait on them along with other futures."""
+        return list(self._pending)
+    
+    def submit(self, key, *args):
+        """Run function(*args) on a worker; collect returns its result along with key."""
+        self._pending[self._executor.submit(self._function, *args)] = (key, args)
+    
+    def collect(self, timeout=None):
+        """
+        Wait for jobs in flight to finish.
+        
+        Args:
+            timeout: Seconds to wait at most, or None to wait until a job finishes
+        
+        Returns:
+            List of (key, result, error) of the finished jobs, where error is None,
+            or a message (and result None) if the worker running the job died
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        from concurrent.futures.process import BrokenProcessPool
+        done, _ = wait(list(self._pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        finished = []
+        for future in done:
+            if future not in self._pending:
+                # Submitted again after the pool broke
+                continue
+            key, _ = self._pending.pop(future)
+            try:
+                finished.append((key, future.result(), None))
+            except BrokenProcessPool as e:
+                finished.append((key, None, f"worker process died ({e})"))
+                self._replace_executor()
+        return finished
+    
+    def _replace_executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        self._executor.shutdown(wait=False)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self._initializer)
+        for future, (key, args) in list(self._pending.items()):
+            # Jobs that finished before the pool broke keep their results
+            if future.done() and not isinstance(future.exception(), BrokenProcessPool):
+                continue
+            del self._pending[future]
+            self.submit(key, *args)
+    
+    def cancel(self):
+        """Drop the jobs in flight that have not started yet."""
+        for future in list(self._pending):
+            if future.cancel():
+                del self._pending[future]
+    
+    def run(self, items, on_done, cancelled=None):
+        """
+        Run jobs and wait for all of them to finish.
+        
+        Jobs are submitted lazily and at most twice the worker count is in flight
+        at any time.
+        
+        Args:
+            items: Iterable of (key, arguments) pairs, one per job
+            on_done: Callback called with (key, result, error) (see collect) for
+                     every finished job, in completion order
+            cancelled: Optional function; once it returns True, no more jobs are
+                       submitted, the jobs not started yet are dropped and the
+                       running ones finish
+        """
+        def stop():
+            return cancelled is not None and cancelled()
+        for key, args in items:
+            while len(self._pending) >= self.workers * 2 and not stop():
+                # Wake up regularly so a cancellation is noticed promptly
+                for finished in self.collect(timeout=0.2 if cancelled is not None else None):
+                    on_done(*finished)
+            if stop():
+                break
+            self.submit(key, *args)
+        if stop():
+            self.cancel()
+        while self._pending:
+            for finished in self.collect():
+                on_done(*finished)
+    
+    def shutdown(self):
+        """Wait for the jobs in flight and stop the worker processes."""
+        self._executor.shutdown()
+
+
+def run_jobs(jobs, workers=None, on_result=None, profile=None, cancel_event=None):
+    """
+    Run resize jobs on a pool of worker processes.
+    
+    Jobs are submitted lazily and at most a small multiple of the worker count is
+    in flight at any time, so only a bounded number of images are decoded at once
+    no matter how many jobs there are. A single job runs in the current process,
+    as starting the worker processes would take longer than the job itself.
+    
+    Args:
+        jobs: Iterable of (input_path, output_path, options) tuples
+        workers: Number of worker processes (defaults to the CPU count). With a
+                 single worker the jobs run in the current process.
+        on_result: Optional callback called with (input_path, success, message, stats)
+                   for every finished job, in completion order
+        profile: Optional RunProfile; when given, the stages of every job are timed
+                 and added to it
+        cancel_event: Optional threading.Event; once set, no new jobs are started,
+                      queued jobs are dropped and the jobs already running finish
+    
+    Returns:
+        Summary dictionary with total, succeeded, failed, failures, elapsed time,
+        whether the run was cancelled, and the input and output bytes of the
+        succeeded jobs
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = new_summary()
+    
+    def cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            summary["cancelled"] = True
+        return summary["cancelled"]
+    start_time = time.perf_counter()
+    
+    def record(result):
+        add_result(summary, result, profile)
+        if on_result is not None:
+            on_result(result)
+    
+    jobs = iter(jobs)
+    first_jobs = list(itertools.islice(jobs, 2))
+    jobs = itertools.chain(first_jobs, jobs)
+    if workers == 1 or len(first_jobs) < 2:
+        for job in jobs:
+            if cancelled():
+                break
+            record(_run_job(job, profile is not None))
+    else:
+        def finish(job, result, error):
+            record(result if error is None else (job[0], False, error, None))
+        with WorkerPool(workers) as pool:
+            pool.run(((job, (job, profile is not None)) for job in jobs), finish, cancelled)
+    
+    summary["elapsed"] = time.perf_counter() - start_time
+    return summary
+
+
+def format_bytes(count):
+    """Return a byte count as a short human-readable string, e.g. "12.3 MB"."""
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if count < 1000 or unit == "GB":
+            return f"{count} {unit}" if unit == "bytes" else f"{count:.1f} {unit}"
+        count /= 1000
+
 
+def print_summary(summary, log=print):
+    """Print the aggregated result of a batch run (or pass each line to log)."""
+    elapsed = summary["elapsed"]
+    rate = summary["total"] / elapsed if elapsed > 0 else 0.0
+    if summary.get("cancelled"):
+        log(f"Cancelled after processing {summary['total']} images in {elapsed:.2f}s")
+    else:
+        log(f"Finished processing {summary['total']} images in {elapsed:.2f}s ({rate:.1f} images/s)")
+    log(f"Succeeded: {summary['succeeded']}, Failed: {summary['failed']}")
+    if summary.get("duplicates"):
+        log(f"Duplicates: {summary['duplicates']} images ({format_bytes(summary['duplicate_bytes'])}) were "
+            f"linked or copied instead of resized, saving {summary['duplicates']} decodes and "
+            f"{summary['saved_encodes']} encodes (hashed {format_bytes(summary['hashed_bytes'])} to find them)")
+    if summary.get("input_bytes"):
+        input_bytes, output_bytes = summary["input_bytes"], summary["output_bytes"]
+        log(f"Size: {format_bytes(input_bytes)} -> {format_bytes(output_bytes)} "
+            f"({1 - output_bytes / input_bytes:.1%} smaller)")
+    if summary.get("quality_searches"):
+        log(f"Quality search: {summary['trial_encodes'] / summary['quality_searches']:.1f} trial encodes per "
+            f"output on average ({summary['quality_searches']} outputs)")
+    if summary.get("skipped"):
+        log(f"Skipped (already up to date): {summary['skipped']}")
+    for input_path, error in summary["failures"]:
+        log(f"  Failed: {input_path}: {error}")
+
+
+def resize_options(output_folder, width=None, height=None, percentage=None, renditions=None, fast=False,
+                   large_image_pixels=DEFAULT_LARGE_IMAGE_PIXELS, maintain_aspect=False, output=None,
+                   backend=DEFAULT_BACKEND):
+    """
+    Return the _resize_file keyword arguments shared by every job of a run.
+    
+    Only settings that are in use are included, so the manifest parameter key of
+    a run stays the same when unrelated options are added.
+    """
+    if renditions:
+        options = {"renditions": renditions, "output_root": output_folder}
+    elif percentage is not None:
+        options = {"percentage": percentage}
+    else:
+        options = {"size": (width, height)}
+    options["fast"] = fast
+    options["large_image_pixels"] = large_image_pixels
+    if maintain_aspect:
+        options["maintain_aspect"] = True
+    if output:
+        options["output"] = output
+    if backend != DEFAULT_BACKEND:
+        options["backend"] = backend
+    return options
 
-def process_images(input_folder, output_folder, width=None, height=None, percentage=None):
+
+def job_output_path(output_folder, relative_path, options):
+    """Return the output path for the source at relative_path, with the extension of the output format."""
+    return output_extension_path(os.path.join(output_folder, relative_path), options.get("output"))
+
+
+def process_images(input_folder, output_folder, width=None, height=None, percentage=None, workers=None,
+                   fast=False, incremental=False, recursive=False, renditions=None, profile_path=None,
+                   large_image_pixels=DEFAULT_LARGE_IMAGE_PIXELS, maintain_aspect=False, output=None,
+                   dedup=None, pipeline=None, plan=False, dry_run=False, backend=DEFAULT_BACKEND, shard=None,
+                   log=print, on_result=None, cancel_event=None):
     """
-    Process all JPG images in the input folder and save resized versions to the output folder.
+    Process all supported images in the input folder and save resized versions to the output folder.
+    
+    Either folder may be a zip or tar archive (.zip, .tar, .tar.gz, .tgz, .tar.bz2,
+    .tar.xz). Images are then read from and written into the archive directly,
+    through the pipelined runner (see image_resizer_archive); all folders inside
+    an input archive are included.
     
     Args:
-        input_folder: Path to the folder containing images to resize
-        output_folder: Path to the folder where resized images will be saved
+        input_folder: Path to the folder (or archive) containing images to resize
+        output_folder: Path to the folder (or archive) where resized images will be saved
         width: Width of the resized images (if using fixed dimensions)
         height: Height of the resized images (if using fixed dimensions)
         percentage: Percentage to resize the images (if using percentage-based resizing)
+        workers: Number of worker processes (defaults to the CPU count)
+        fast: Use the fast downscale path (reduced-scale decoding and integer pre-reduction)
+        incremental: Skip images whose output is up to date according to the manifest
+                     in the output folder, and record newly resized images in it
+        recursive: Also process subfolders, mirroring their layout in the output folder
+        renditions: Optional list of rendition dictionaries (see resize_image), used
+                    instead of width, height and percentage. Rendition subfolders are
+                    created in the output folder.
+        profile_path: Optional path of a JSON report with per-stage timings
+        large_image_pixels: TIFF and PNG images with at least this many pixels are
+                            resized strip by strip with bounded memory (0 disables)
+        maintain_aspect: With fixed dimensions, keep the aspect ratio of each image
+        output: Optional encoder settings from image_resizer_output.output_options.
+                When they name a format, the output files get its extension.
+        dedup: Resize byte-identical sources only once; the outputs of the other
+               copies are hardlinks ("link") or copies ("copy") of the first result
+        pipeline: Optional dictionary of keyword arguments for
+                  image_resizer_pipeline.run_pipelined_jobs (readers, writers,
+                  max_buffer_bytes); when given, source files are read ahead and
+                  outputs written behind in threads while the workers resize
+        plan: Read the image headers first (see image_resizer_plan), then resize
+              the largest images first and skip unreadable files without
+              sending them to a worker
+        dry_run: Only plan: print the report and return it without resizing
+        backend: Resize engine, "pillow" (default) or "vips" when pyvips is
+                 installed (see image_resizer_backend)
+        shard: Optional (index, count) tuple: only resize the images of shard
+               index (1 to count), chosen by a hash of their relative paths, and
+               write a summary of the run into the output folder for
+               image_resizer_shard.py to merge. Incremental runs keep a manifest
+               per shard.
+        log: Function receiving every progress message (default: print)
+        on_result: Optional callback called with (input_path, success, message, stats)
+                   for every finished image
+        cancel_event: Optional threading.Event that stops the run when set
+    
+    Returns:
+        Summary dictionary from run_jobs, the plan report with dry_run, or None if
+        no images were found
     """
-    # Create output directory if it doesn't exist
-    create_directory(output_folder)
+    input_archive = is_archive(input_folder)
+    output_archive = is_archive(output_folder)
+    if (input_archive or output_archive) and (incremental or dedup):
+        raise ValueError("incremental runs and dedup need folders, not archives")
+    if input_archive and (plan or dry_run):
+        raise ValueError("planning needs an input folder, not an archive")
+    if output_archive and shard is not None:
+        raise ValueError("sharded runs need an output folder, not an archive")
+    check_backend(backend)
     
-    # Get all supported image files in the input directory
-    input_path = Path(input_folder)
-    supported_extensions = ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.bmp", "*.tiff", "*.tif", "*.webp"]
+    options = resize_options(output_folder, width, height, percentage, renditions, fast, large_image_pixels,
+                             maintain_aspect, output, backend)
     
-    image_files = []
-    for ext in supported_extensions:
-        image_files.extend(list(input_path.glob(ext)))
-        # Also check for uppercase extensions
-        image_files.extend(list(input_path.glob(ext.upper())))
+    if shard is not None:
+        import image_resizer_shard
     
-    if not image_files:
-        print(f"No supported images found in {input_folder}")
-        print(f"Supported formats: JPG, PNG, GIF, BMP, TIFF, WEBP")
-        return
+    if dry_run:
+        from image_resizer_plan import plan_images, plan_report, print_plan
+        log(f"Reading image headers in {input_folder}{' (including subfolders)' if recursive else ''}")
+        images = scan_images(input_folder, recursive=recursive, exclude=output_folder)
+        if shard is not None:
+            images = image_resizer_shard.select_shard(images, *shard)
+        planned, unreadable = plan_images(images)
+        report = plan_report(planned, unreadable, options)
+        print_plan(report, workers or os.cpu_count() or 1, log)
+        return report
     
-    print(f"Found {len(image_files)} images to process")
+    run = run_jobs
+    if pipeline is not None or input_archive or output_archive:
+        from image_resizer_pipeline import run_pipelined_jobs
+        pipeline = dict(pipeline or {})
+        # Archive members are read and written one at a time
+        if input_archive:
+            pipeline.update(source=ArchiveReader(input_folder), readers=1)
+        if output_archive:
+            pipeline.update(destination=ArchiveWriter(output_folder), writers=1)
+        run = functools.partial(run_pipelined_jobs, **pipeline)
     
-    # Process each image
-    for image_file in image_files:
-        output_path = os.path.join(output_folder, image_file.name)
-        
-        if percentage is not None:
-            resize_image(str(image_file), output_path, percentage=percentage)
+    if not output_archive:
+        # Create output directory if it doesn't exist
+        create_directory(output_folder)
+    
+    if input_archive:
+        log(f"Reading images from the archive {input_folder}")
+        images = pipeline["source"].scan(SUPPORTED_EXTENSIONS)
+    else:
+        log(f"Scanning {input_folder} for images{' (including subfolders)' if recursive else ''}")
+        images = scan_images(input_folder, recursive=recursive, exclude=output_folder)
+    if shard is not None:
+        log(f"Taking shard {shard[0]} of {shard[1]}")
+        images = image_resizer_shard.select_shard(images, *shard)
+    
+    unreadable = []
+    if plan:
+        from image_resizer_plan import plan_images
+        planned, unreadable = plan_images(images)
+        log(f"Planned {len(planned)} images from their headers; resizing the largest first")
+        images = [(path, relative_path) for path, relative_path, _, _, _ in planned]
+        for path, error in unreadable:
+            log(f"Skipping unreadable image {path}: {error}")
+            if on_result is not None:
+                on_result((path, False, error, None))
+    
+    manifest = params = None
+    if incremental or shard is not None:
+        from image_resizer_manifest import MANIFEST_FILENAME, ResizeManifest, params_key
+        params = params_key(options)
+    if incremental:
+        # Shards run on different machines, so each keeps its own manifest
+        filename = MANIFEST_FILENAME if shard is None else image_resizer_shard.manifest_filename(*shard)
+        manifest = ResizeManifest(output_folder, filename)
+    # Source stats and output paths of in-flight jobs, recorded in the manifest on success
+    in_flight = {}
+    skipped = 0
+    
+    finder = None
+    if dedup:
+        from image_resizer_dedup import DuplicateFinder, link_or_copy
+        finder = DuplicateFinder()
+    # Sources being resized -> duplicates waiting for their outputs, and failed sources -> error
+    waiting = {}
+    failed_originals = {}
+    duplicates = {"duplicates": 0, "duplicate_bytes": 0, "saved_encodes": 0, "failed": 0, "failures": []}
+    
+    def outputs_of(source):
+        output_path = job_output_path(output_folder, os.path.relpath(source, input_folder), options)
+        return output_paths(output_path, renditions, output_folder)
+    
+    def finish_duplicate(original, duplicate):
+        """Give a duplicate the outputs of its original, or its error."""
+        source, source_stat, expected_outputs = duplicate
+        error = failed_originals.get(original)
+        method = "link" if dedup == "link" else "copy"
+        if error is None:
+            try:
+                for original_output, duplicate_output in zip(outputs_of(original), expected_outputs):
+                    os.makedirs(os.path.dirname(duplicate_output) or ".", exist_ok=True)
+                    if os.path.abspath(original_output) != os.path.abspath(duplicate_output):
+                        method = link_or_copy(original_output, duplicate_output, dedup)
+            except OSError as e:
+                error = str(e)
+        if error is None:
+            duplicates["duplicates"] += 1
+            duplicates["duplicate_bytes"] += source_stat.st_size
+            duplicates["saved_encodes"] += len(expected_outputs)
+            log(f"Duplicate: {os.path.basename(source)} -> {method} of the output of {os.path.basename(original)}")
+            if manifest is not None:
+                manifest.record(source, source_stat, params, expected_outputs)
         else:
-            resize_image(str(image_file), output_path, size=(width, height))
+            duplicates["failed"] += 1
+            duplicates["failures"].append((source, error))
+            log(f"Error processing {source}: {error}")
+        if on_result is not None:
+            on_result((source, error is None, error or method, None))
+    
+    def make_jobs():
+        nonlocal skipped
+        created_directories = {output_folder}
+        # Images are yielded as the scan discovers them, so work starts immediately
+        for source, relative_path in images:
+            output_path = job_output_path(output_folder, relative_path, options)
+            expected_outputs = output_paths(output_path, renditions, output_folder)
+            original = None
+            try:
+                if not output_archive:
+                    # Only the folders that are written to (renditions may have their own)
+                    for directory in {os.path.dirname(path) for path in expected_outputs} - created_directories:
+                        os.makedirs(directory, exist_ok=True)
+                        created_directories.add(directory)
+                if manifest is not None or finder is not None:
+                    source_stat = os.stat(source)
+                if finder is not None:
+                    # Identical bytes only give identical outputs when saved in the same format.
+                    # Up-to-date sources are registered too, as their outputs can serve later duplicates.
+                    original = finder.original_of(source, source_stat.st_size, format_for_path(output_path))
+            except OSError as e:
+                # The file vanished or became unreadable after the scan
+                unreadable.append((source, str(e)))
+                log(f"Error processing {source}: {e}")
+                if on_result is not None:
+                    on_result((source, False, str(e), None))
+                continue
+            if manifest is not None and manifest.is_up_to_date(source, source_stat, params, expected_outputs):
+                skipped += 1
+                continue
+            if finder is not None:
+                if original is not None:
+                    duplicate = (source, source_stat, expected_outputs)
+                    if original in waiting:
+                        waiting[original].append(duplicate)
+                    else:
+                        finish_duplicate(original, duplicate)
+                    continue
+                waiting[source] = []
+            if manifest is not None:
+                in_flight[source] = (source_stat, expected_outputs)
+            yield source, output_path, options
+    
+    def report(result):
+        input_path, success, message, _ = result
+        if success:
+            log(f"Resized: {os.path.basename(input_path)} -> {message}")
+        else:
+            log(f"Error processing {input_path}: {message}")
+        if manifest is not None:
+            source_stat, expected_outputs = in_flight.pop(input_path)
+            if success:
+                manifest.record(input_path, source_stat, params, expected_outputs)
+        if on_result is not None:
+            on_result(result)
+        if finder is not None:
+            if not success:
+                failed_originals[input_path] = f"same content as {input_path}, which failed: {message}"
+            for duplicate in waiting.pop(input_path, []):
+                finish_duplicate(input_path, duplicate)
+    
+    profile = RunProfile() if profile_path else None
+    
+    # Process the images in parallel
+    try:
+        summary = run(make_jobs(), workers=workers, on_result=report, profile=profile, cancel_event=cancel_event)
+    except BaseException:
+        if output_archive:
+            pipeline["destination"].close(keep=False)
+        raise
+    else:
+        if output_archive:
+            pipeline["destination"].close()
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if input_archive:
+            pipeline["source"].close()
+    summary["skipped"] = skipped
+    if unreadable:
+        summary["total"] += len(unreadable)
+        summary["failed"] += len(unreadable)
+        summary["failures"].extend(unreadable)
+    if finder is not None:
+        summary["total"] += duplicates["duplicates"] + duplicates["failed"]
+        summary["succeeded"] += duplicates["duplicates"]
+        summary["failed"] += duplicates["failed"]
+        summary["failures"].extend(duplicates.pop("failures"))
+        del duplicates["failed"]
+        summary.update(duplicates, hashed_bytes=finder.hashed_bytes)
     
-    print(f"Finished processing {len(image_files)} images")
+    if profile is not None:
+        profile.write(profile_path)
+        log(f"Profile report written to {profile_path}")
+    
+    if shard is not None:
+        path = image_resizer_shard.write_summary(output_folder, *shard, summary, input_folder, params)
+        log(f"Shard summary written to {path}")
+    
+    if summary["total"] == 0 and skipped == 0 and not summary["cancelled"]:
+        log(f"No supported images found in {input_folder}")
+        log(f"Supported formats: JPG, PNG, GIF, BMP, TIFF, WEBP")
+        return
+    
+    print_summary(summary, log)
+    return summary
+
+
+def parse_rendition(spec):
+    """
+    Parse a NAME=WIDTHxHEIGHT or NAME=PERCENTAGE% rendition argument.
+    
+    Returns:
+        Rendition dictionary with a "name" and either a "size" or a "percentage"
+    """
+    name, separator, value = spec.partition("=")
+    name = name.strip()
+    value = value.strip().lower()
+    try:
+        if not separator or not name:
+            raise ValueError
+        if value.endswith("%"):
+            percentage = float(value[:-1])
+            if percentage <= 0:
+                raise ValueError
+            return {"name": name, "percentage": percentage}
+        width, height = (int(part) for part in value.split("x"))
+        if width <= 0 or height <= 0:
+            raise ValueError
+        return {"name": name, "size": (width, height)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid rendition '{spec}' (expected NAME=WIDTHxHEIGHT or NAME=PERCENTAGE%)")
 
 
 def main():
@@ -119,39 +1047,274 @@ Date: May 8th 2025
         epilog=epilog,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
-    parser.add_argument("input_folder", help="Path to the folder containing images to resize")
-    parser.add_argument("output_folder", help="Path to the folder where resized images will be saved")
+    parser.add_argument("input_folder", nargs="?", help="Path to the folder containing images to resize")
+    parser.add_argument("output_folder", nargs="?", help="Path to the folder where resized images will be saved")
     
     # Create a mutually exclusive group for resize options
-    resize_group = parser.add_mutually_exclusive_group(required=True)
+    resize_group = parser.add_mutually_exclusive_group()
     resize_group.add_argument("-d", "--dimensions", nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'),
                              help="Resize to specific dimensions (width height)")
     resize_group.add_argument("-p", "--percentage", type=float,
                              help="Resize by percentage (e.g., 50 for 50%%)")
+    resize_group.add_argument("-R", "--rendition", action="append", type=parse_rendition, metavar="NAME=SIZE",
+                             help="Produce a named rendition; SIZE is WIDTHxHEIGHT or a percentage "
+                                  "such as 50%%. Repeat for several sizes (e.g. -R thumb=150x150 "
+                                  "-R medium=800x600 -R large=50%%); each source is decoded once")
+    parser.add_argument("--rendition-layout", choices=["folder", "suffix"], default="folder",
+                       help="Save renditions in a subfolder named after them (default) or next to "
+                            "each other with a _NAME filename suffix")
+    parser.add_argument("-k", "--keep-aspect", action="store_true",
+                       help="With --dimensions, keep the aspect ratio of each image (the width is used "
+                            "for landscape and the height for portrait images)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                       help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("-f", "--fast", action="store_true",
+                       help="Fast downscale: decode JPEGs at reduced scale and pre-reduce by integer "
+                            "factors before the final filter (output within 1 level on average)")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                       help="Skip images whose output is already up to date (tracked in a manifest "
+                            "in the output folder); changed images or parameters are rebuilt")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                       help="Also process subfolders, mirroring their layout in the output folder")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                       help="Resize engine: pillow (default) or vips, which streams large images with less "
+                            "memory and time (needs pyvips and libvips)")
+    parser.add_argument("--large-threshold", type=float, default=DEFAULT_LARGE_IMAGE_PIXELS / 1_000_000,
+                       metavar="MEGAPIXELS",
+                       help="Resize TIFF and PNG images of at least this many megapixels strip by strip "
+                            "with bounded memory (default: %(default)g, 0 disables)")
+    output_group = parser.add_argument_group("output options")
+    output_group.add_argument("--format", choices=[name.lower() for name in OUTPUT_FORMATS], type=str.lower,
+                              help="Convert the images to this format (default: keep the source format)")
+    output_group.add_argument("--preset", choices=sorted(PRESETS),
+                              help="Encoder preset: fast-encode favors encode speed, smallest-bytes favors "
+                                   "file size; the options below override the preset")
+    output_group.add_argument("-q", "--quality", type=int,
+                              help="JPEG and WebP quality from 1 to 100 (Pillow default: 75 for JPEG, "
+                                   "80 for WebP)")
+    output_group.add_argument("--progressive", action="store_true", default=None,
+                              help="Write progressive JPEGs")
+    output_group.add_argument("--optimize", action="store_true", default=None,
+                              help="Optimize JPEG Huffman tables and PNG compression (smaller, slower)")
+    output_group.add_argument("--webp-method", type=int, metavar="0-6",
+                              help="WebP encoder effort from 0 (fastest) to 6 (smallest)")
+    output_group.add_argument("--max-bytes", type=byte_size, metavar="SIZE",
+                              help="Byte budget per output file, e.g. 50000, 50KB or 1.5MB: JPEG and WebP "
+                                   "images get the highest quality that fits (up to --quality, default 95), "
+                                   "found with trial encodes in memory; other formats fail when over it")
+    output_group.add_argument("--strip-metadata", action="store_true", default=None,
+                              help="Drop EXIF, ICC profile, XMP and comments; by default the EXIF "
+                                   "data and ICC profile are carried over to JPEG, WebP and PNG output")
+    parser.add_argument("--profile", metavar="REPORT",
+                       help="Time the open, decode, resize, encode and write stages of every image "
+                            "and write a JSON report to this file")
+    parser.add_argument("--dedup", nargs="?", const="link", choices=["link", "copy"],
+                       help="Resize byte-identical images only once; the other copies get hardlinks "
+                            "(default) or copies of the first result")
+    parser.add_argument("--plan", action="store_true",
+                       help="Read the headers of all images first, then resize the largest images first "
+                            "and skip unreadable files")
+    parser.add_argument("--dry-run", action="store_true",
+                       help="Only read the image headers and report the image count, megapixels, output "
+                            "sizes and estimated decode time per format; nothing is written")
+    parser.add_argument("--shard", metavar="INDEX/COUNT",
+                       help="Only resize shard INDEX (1 to COUNT) of the images, chosen by a hash of their "
+                            "relative paths, so COUNT machines sharing the folders each take a disjoint "
+                            "slice; a summary is written to the output folder for image_resizer_shard.py "
+                            "to merge")
+    pipeline_group = parser.add_argument_group("pipelined I/O (for slow or network folders)")
+    pipeline_group.add_argument("--pipeline", action="store_true",
+                                help="Read source files ahead and write outputs behind in threads, so file "
+                                     "I/O overlaps with resizing")
+    pipeline_group.add_argument("--readers", type=int, default=4,
+                                help="With --pipeline, number of threads reading files (default: %(default)s)")
+    pipeline_group.add_argument("--writers", type=int, default=4,
+                                help="With --pipeline, number of threads writing files (default: %(default)s)")
+    pipeline_group.add_argument("--max-buffer", type=int, default=256, metavar="MB",
+                                help="With --pipeline, ceiling for the file data held in memory between the "
+                                     "stages (default: %(default)s)")
+    jobs_group = parser.add_argument_group("job files (instead of the folders)")
+    jobs_group.add_argument("--jobs", metavar="FILE",
+                            help="Run the jobs of a JSONL file (- for stdin), one JSON object per line with "
+                                 "source, destination and optionally width and height, percentage, "
+                                 "format, quality, max_bytes and the other output options; -d, -p, -k, -f, --backend "
+                                 "and the output options above are the defaults")
+    jobs_group.add_argument("--results", metavar="FILE", default="-",
+                            help="With --jobs, write the JSONL results log here (default: stdout)")
+    watch_group = parser.add_argument_group("watch mode")
+    watch_group.add_argument("--watch", action="store_true",
+                             help="Keep running and resize new or modified images as soon as they are "
+                                  "completely written; stop with Ctrl+C or SIGTERM")
+    watch_group.add_argument("--poll", action="store_true",
+                             help="With --watch, poll the input folder instead of using inotify (e.g. "
+                                  "for network shares)")
+    watch_group.add_argument("--poll-interval", type=float, default=0.25, metavar="SECONDS",
+                             help="Seconds between scans when polling (default: %(default)g)")
     parser.add_argument("-v", "--version", action="version", 
                        version="Image Resizer v2 by Gianpaolo Albanese")
     
     args = parser.parse_args()
+    if args.jobs:
+        if args.input_folder or args.output_folder:
+            parser.error("--jobs takes no input or output folder; the jobs name their files")
+        if (args.rendition or args.watch or args.incremental or args.dedup or args.pipeline or args.plan
+                or args.dry_run or args.shard):
+            parser.error("--jobs cannot be used with -R, --watch, --incremental, --dedup, --pipeline, --plan, "
+                         "--dry-run or --shard")
+    elif not (args.input_folder and args.output_folder):
+        parser.error("the following arguments are required: input_folder, output_folder")
+    elif not (args.dimensions or args.percentage is not None or args.rendition):
+        parser.error("one of the arguments -d/--dimensions -p/--percentage -R/--rendition is required")
+    
+    shard = None
+    if args.shard:
+        from image_resizer_shard import parse_shard
+        try:
+            shard = parse_shard(args.shard)
+        except argparse.ArgumentTypeError as e:
+            parser.error(f"argument --shard: {e}")
+    
+    # Validate input folder (job files name their own sources)
+    if not args.jobs:
+        if is_archive(args.input_folder):
+            if not os.path.isfile(args.input_folder):
+                print(f"Error: Input archive '{args.input_folder}' does not exist")
+                return
+        elif not os.path.isdir(args.input_folder):
+            print(f"Error: Input folder '{args.input_folder}' does not exist")
+            return
+        
+        uses_archives = is_archive(args.input_folder) or is_archive(args.output_folder)
+        if uses_archives and (args.incremental or args.dedup or args.watch):
+            print("Error: --incremental, --dedup and --watch cannot be used with archives")
+            return
+        if is_archive(args.input_folder) and (args.plan or args.dry_run):
+            print("Error: --plan and --dry-run need an input folder, not an archive")
+            return
+        if is_archive(args.output_folder) and shard is not None:
+            print("Error: --shard needs an output folder, not an archive")
+            return
+    
+    if args.workers <= 0:
+        print("Error: Workers must be a positive integer")
+        return
+    
+    if args.large_threshold < 0:
+        print("Error: Large image threshold must not be negative")
+        return
+    
+    if args.quality is not None and not 1 <= args.quality <= 100:
+        print("Error: Quality must be between 1 and 100")
+        return
+    
+    if args.webp_method is not None and not 0 <= args.webp_method <= 6:
+        print("Error: WebP method must be between 0 and 6")
+        return
+    
+    if args.poll_interval <= 0:
+        print("Error: Poll interval must be a positive number")
+        return
     
-    # Validate input folder
-    if not os.path.isdir(args.input_folder):
-        print(f"Error: Input folder '{args.input_folder}' does not exist")
+    if args.readers <= 0 or args.writers <= 0 or args.max_buffer <= 0:
+        print("Error: Readers, writers and the buffer size must be positive integers")
         return
     
+    try:
+        check_backend(args.backend)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    
+    if args.max_bytes is not None and args.max_bytes <= 0:
+        print("Error: The byte budget must be positive")
+        return
+    
+    output = output_options(args.preset, args.format, args.quality, args.progressive, args.optimize,
+                            args.webp_method, args.strip_metadata, args.max_bytes)
+    
+    if args.jobs:
+        from image_resizer_jobs import run_job_file
+        if args.dimensions and min(args.dimensions) <= 0 or args.percentage is not None and args.percentage <= 0:
+            print("Error: Width, height and percentage must be positive", file=sys.stderr)
+            return
+        defaults = {
+            "size": tuple(args.dimensions) if args.dimensions else None,
+            "percentage": args.percentage,
+            "maintain_aspect": args.keep_aspect,
+            "fast": args.fast,
+            "large_image_pixels": int(args.large_threshold * 1_000_000),
+            "output": output,
+            "backend": args.backend,
+        }
+        try:
+            summary = run_job_file(args.jobs, args.results, args.workers, defaults)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return
+        # The results log may be on stdout, so the summary goes to stderr
+        print_summary(summary, log=lambda line: print(line, file=sys.stderr))
+        if summary["failed"]:
+            print(f"Failed jobs ({summary['invalid']} of them invalid) are listed in the results log",
+                  file=sys.stderr)
+        return
+    
+    # Options shared by every resize method
+    options = {
+        "workers": args.workers,
+        "fast": args.fast,
+        "incremental": args.incremental,
+        "recursive": args.recursive,
+        "profile_path": args.profile,
+        "large_image_pixels": int(args.large_threshold * 1_000_000),
+        "maintain_aspect": args.keep_aspect,
+        "dedup": args.dedup,
+        "plan": args.plan,
+        "dry_run": args.dry_run,
+        "pipeline": {"readers": args.readers, "writers": args.writers,
+                     "max_buffer_bytes": args.max_buffer * 1024 * 1024} if args.pipeline else None,
+        "output": output,
+        "backend": args.backend,
+        "shard": shard,
+    }
+    
+    # Watch mode always keeps the manifest, so the incremental flag has no effect there
+    run = process_images
+    if args.watch:
+        from image_resizer_watch import watch_images
+        if args.dedup or args.pipeline or args.plan or args.dry_run or shard is not None:
+            print("Error: --dedup, --pipeline, --plan, --dry-run and --shard cannot be used with --watch")
+            return
+        del (options["incremental"], options["dedup"], options["pipeline"], options["plan"], options["dry_run"],
+             options["shard"])
+        options.update(poll_interval=args.poll_interval, use_inotify=not args.poll)
+        run = watch_images
+    
     # Process based on the chosen resize method
-    if args.dimensions:
+    if args.rendition:
+        renditions = []
+        for rendition in args.rendition:
+            if args.rendition_layout == "suffix":
+                rendition["suffix"] = f"_{rendition['name']}"
+            else:
+                rendition["subfolder"] = rendition["name"]
+            renditions.append(rendition)
+        run(args.input_folder, args.output_folder, renditions=renditions, **options)
+    elif args.dimensions:
         width, height = args.dimensions
         if width <= 0 or height <= 0:
             print("Error: Width and height must be positive integers")
             return
-        process_images(args.input_folder, args.output_folder, width=width, height=height)
+        run(args.input_folder, args.output_folder, width=width, height=height, **options)
     else:
         percentage = args.percentage
         if percentage <= 0:
             print("Error: Percentage must be a positive number")
             return
-        process_images(args.input_folder, args.output_folder, percentage=percentage)
+        run(args.input_folder, args.output_folder, percentage=percentage, **options)
 
 
 if __name__ == "__main__":
+    # Required for worker processes in frozen executables on Windows
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,434 @@
+"""
+Image Resizer Animation
+
+Resizes animated GIF and WebP images one frame at a time. Frames are decoded,
+resized and written in a stream, so memory use stays at a few frames no matter
+how long the animation is. Frame durations and the loop count are kept.
+
+GIF output uses one palette for all frames: the palette of the source, or a
+palette quantized once from the first frame. Only GIF sources whose frames have
+color tables of their own get a palette for each frame, quantized from its own
+colors. Only the part of each frame that changed is stored, and the disposal of each frame is chosen so that the
+resized animation looks like the source. Identical consecutive frames are merged.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+import os
+import struct
+
+from PIL import Image
+
+from image_resizer_profile import NULL_TIMER
+
+
+# Formats whose animations are kept; other output formats get the first frame only
+ANIMATED_FORMATS = ("GIF", "WEBP")
+
+# Alpha values below this are fully transparent in GIF output
+GIF_ALPHA_THRESHOLD = 128
+
+# GIF frame disposal methods
+_DISPOSE_NONE = 1
+_DISPOSE_BACKGROUND = 2
+
+
+def is_animated(img):
+    """
+    Return True if img is a GIF or WebP animation.
+
+    Other multi-frame files (TIFF pages, MPO stereo pairs) are not animations;
+    their first frame is resized like a still image.
+    """
+    return img.format in ANIMATED_FORMATS and getattr(img, "is_animated", False)
+
+
+def iter_frames(img, timer=NULL_TIMER):
+    """
+    Yield the frames of an animation one at a time.
+
+    Pillow composites each frame onto the previous ones, so every frame is the
+    full picture as it is shown. Frames without transparency are RGB, which
+    resizes faster than RGBA.
+
+    Yields:
+        Tuples of (RGB or RGBA frame, duration in milliseconds)
+    """
+    index = 0
+    while True:
+        with timer.stage("decode"):
+            try:
+                img.seek(index)
+            except EOFError:
+                return
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            frame = img.convert("RGBA" if has_alpha else "RGB")
+        yield frame, img.info.get("duration", 0) or 0
+        index += 1
+
+
+def _changed_box(previous, frame):
+    """Return the bounding box of the pixels that differ between two frames, or None."""
+    # Imported here, like GifImagePlugin below: most runs have no animations
+    from PIL import ImageChops
+
+    if previous.mode != frame.mode:
+        return (0, 0) + frame.size
+    difference = ImageChops.difference(previous, frame)
+    bands = difference.split()
+    combined = bands[0]
+    for band in bands[1:]:
+        combined = ImageChops.lighter(combined, band)
+    return combined.getbbox()
+
+
+def _transparent_mask(frame):
+    """Return a mask that is 255 where the frame is transparent in GIF output, or None if it is opaque."""
+    if frame.mode != "RGBA":
+        return None
+    return frame.getchannel("A").point(lambda alpha: 255 if alpha < GIF_ALPHA_THRESHOLD else 0)
+
+
+class GifFrameWriter:
+    """
+    Writes an animated GIF frame by frame.
+
+    The frame before the current one is held back until the next frame is known,
+    so identical frames can be merged and its disposal chosen correctly.
+    """
+
+    def __init__(self, fp, size, colors=None, loop=None):
+        """
+        Args:
+            fp: Binary file to write to
+            size: Canvas size
+            colors: Up to 255 (r, g, b) colors of the global palette, or None to
+                    quantize every frame to a palette of its own; one more
+                    index is added for transparency
+            loop: Loop count (0 = forever), or None to play once
+        """
+        self.fp = fp
+        self.size = size
+        if colors is None:
+            # Each frame's palette gets one more color for transparency (see _indexed)
+            self.quantize_palette = None
+            self.transparency = 255
+            flat_colors = [0, 0, 0] * 255
+        else:
+            colors = list(colors)[:255]
+            flat_colors = [channel for color in colors for channel in color]
+            # Opaque colors only, so no opaque pixel is mapped to the transparent index
+            self.quantize_palette = Image.new("P", (1, 1))
+            self.quantize_palette.putpalette(flat_colors)
+            self.transparency = len(colors)
+
+        header_image = Image.new("P", size)
+        header_image.putpalette(flat_colors + [0, 0, 0])
+        info = {"transparency": self.transparency, "background": self.transparency}
+        if loop is not None:
+            info["loop"] = loop
+        from PIL import GifImagePlugin
+        header, _ = GifImagePlugin.getheader(header_image, info=info)
+        for block in header:
+            fp.write(block)
+        # [indexed frame, RGBA frame, duration, box to store or None for the full frame]
+        self.pending = None
+
+    def _frame_transparency(self, indexed):
+        """Return the transparent index of an indexed frame: the color after its own palette, if it has one."""
+        if self.quantize_palette is None:
+            return len(indexed.getpalette()) // 3 - 1
+        return self.transparency
+
+    def _indexed(self, frame):
+        if self.quantize_palette is None:
+            indexed = frame.convert("RGB").quantize(255, dither=Image.Dither.NONE)
+            indexed.putpalette(indexed.getpalette()[:255 * 3] + [0, 0, 0])
+        else:
+            indexed = frame.convert("RGB").quantize(palette=self.quantize_palette, dither=Image.Dither.NONE)
+        mask = _transparent_mask(frame)
+        if mask is not None and mask.getbbox():
+            indexed.paste(self._frame_transparency(indexed), mask=mask)
+        return indexed
+
+    def _write(self, disposal):
+        from PIL import GifImagePlugin
+        indexed, _, duration, box = self.pending
+        transparency = self._frame_transparency(indexed)
+        if box is not None:
+            indexed = indexed.crop(box)
+        offset = box[:2] if box is not None else (0, 0)
+        for block in GifImagePlugin.getdata(indexed, offset, duration=duration, disposal=disposal,
+                                            transparency=transparency,
+                                            include_color_table=self.quantize_palette is None):
+            self.fp.write(block)
+
+    def add(self, frame, duration):
+        """Add a frame (RGB or RGBA, canvas size) shown for duration milliseconds."""
+        if self.pending is None:
+            self.pending = [self._indexed(frame), frame, duration, None]
+            return
+        previous = self.pending[1]
+        box = _changed_box(previous, frame)
+        if box is None:
+            self.pending[2] += duration
+            return
+        # Transparent pixels show what is below them, so a frame that turns opaque
+        # pixels transparent needs a cleared canvas: the previous frame is stored
+        # whole and restored to the background, and this frame is stored whole
+        transparent, previous_transparent = _transparent_mask(frame), _transparent_mask(previous)
+        if transparent is None:
+            revealed = False
+        elif previous_transparent is None:
+            revealed = transparent.getbbox() is not None
+        else:
+            from PIL import ImageChops
+            revealed = ImageChops.multiply(transparent, ImageChops.invert(previous_transparent)).getbbox()
+        if revealed:
+            self.pending[3] = None
+            self._write(_DISPOSE_BACKGROUND)
+            box = None
+        else:
+            self._write(_DISPOSE_NONE)
+        self.pending = [self._indexed(frame), frame, duration, box]
+
+    def close(self):
+        """Write the last frame and the GIF trailer."""
+        if self.pending is not None:
+            self._write(_DISPOSE_NONE)
+            self.pending = None
+        self.fp.write(b";")
+
+
+def _chunk(fourcc, payload):
+    """Return a RIFF chunk, padded to an even length."""
+    return fourcc + struct.pack("<I", len(payload)) + payload + (b"\0" if len(payload) % 2 else b"")
+
+
+def _uint24(value):
+    return struct.pack("<I", value)[:3]
+
+
+class WebPFrameWriter:
+    """
+    Writes an animated WebP frame by frame.
+
+    Each frame is encoded on its own and stored as an ANMF chunk covering the
+    region that changed since the previous frame. Frames replace the canvas
+    pixels they cover (no blending), which keeps transparency exact.
+    """
+
+    def __init__(self, fp, size, loop=0, background=(0, 0, 0, 0), save_options=None):
+        self.fp = fp
+        self.size = size
+        self.save_options = save_options or {}
+        self.start = fp.tell()
+        self.has_alpha = False
+        # Placeholders for the RIFF header and the VP8X chunk, filled in by close()
+        fp.write(b"\0" * 30)
+        red, green, blue, alpha = background
+        fp.write(_chunk(b"ANIM", bytes((blue, green, red, alpha)) + struct.pack("<H", loop)))
+        # [RGBA frame, duration, box]
+        self.pending = None
+
+    def _write(self):
+        frame, duration, box = self.pending
+        if box is None:
+            box = (0, 0) + frame.size
+        region = frame.crop(box)
+        if region.mode == "RGBA" and region.getchannel("A").getextrema()[0] == 255:
+            region = region.convert("RGB")
+        elif region.mode == "RGBA":
+            self.has_alpha = True
+        buffer = io.BytesIO()
+        region.save(buffer, format="WEBP", **self.save_options)
+        data = buffer.getvalue()
+
+        # Keep the alpha and bitstream chunks of the still image
+        frame_chunks = []
+        offset = 12
+        while offset + 8 <= len(data):
+            fourcc = data[offset:offset + 4]
+            length = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+            end = offset + 8 + length + (length % 2)
+            if fourcc in (b"ALPH", b"VP8 ", b"VP8L"):
+                frame_chunks.append(data[offset:end])
+            offset = end
+
+        header = (_uint24(box[0] // 2) + _uint24(box[1] // 2) + _uint24(region.width - 1)
+                  + _uint24(region.height - 1) + _uint24(min(int(duration), 0xFFFFFF)))
+        # Flags: do not blend, do not dispose
+        self.fp.write(_chunk(b"ANMF", header + b"\x02" + b"".join(frame_chunks)))
+
+    def add(self, frame, duration):
+        """Add a frame (RGB or RGBA, canvas size) shown for duration milliseconds."""
+        if self.pending is None:
+            self.pending = [frame, duration, None]
+            return
+        box = _changed_box(self.pending[0], frame)
+        if box is None:
+            self.pending[1] += duration
+            return
+        self._write()
+        # Frame offsets are stored in units of two pixels
+        box = (box[0] & ~1, box[1] & ~1, box[2], box[3])
+        self.pending = [frame, duration, box]
+
+    def close(self):
+        """Write the last frame and fill in the file header."""
+        if self.pending is not None:
+            self._write()
+            self.pending = None
+        end = self.fp.tell()
+        flags = 0x02 | (0x10 if self.has_alpha else 0)
+        vp8x = bytes((flags, 0, 0, 0)) + _uint24(self.size[0] - 1) + _uint24(self.size[1] - 1)
+        self.fp.seek(self.start)
+        self.fp.write(b"RIFF" + struct.pack("<I", end - self.start - 8) + b"WEBP" + _chunk(b"VP8X", vp8x))
+        self.fp.seek(end)
+
+
+def _has_local_palettes(img):
+    """
+    Return True if a frame of a GIF has a color table of its own.
+
+    Only the block structure of the file is read; no frame is decoded.
+    """
+    if img.format != "GIF":
+        return False
+    fp = img.fp
+    position = fp.tell()
+    try:
+        # Logical screen descriptor: the global color table follows it
+        fp.seek(10)
+        flags = fp.read(1)[0]
+        fp.seek(2, os.SEEK_CUR)
+        if flags & 0x80:
+            fp.seek(3 << ((flags & 7) + 1), os.SEEK_CUR)
+        while True:
+            block = fp.read(1)
+            if block == b",":
+                descriptor = fp.read(9)
+                if len(descriptor) < 9:
+                    return False
+                if descriptor[8] & 0x80:
+                    return True
+                fp.read(1)  # LZW minimum code size
+            elif block == b"!":
+                fp.read(1)  # Extension label
+            else:
+                # Trailer (or a truncated file)
+                return False
+            # Skip the data sub-blocks
+            while True:
+                length = fp.read(1)
+                if not length or not length[0]:
+                    break
+                fp.seek(length[0], os.SEEK_CUR)
+    finally:
+        fp.seek(position)
+
+
+def _palette_colors(img):
+    """Return the opaque colors of the palette of the first frame, or None if it has none."""
+    if img.mode != "P":
+        return None
+    palette = img.getpalette()
+    transparency = img.info.get("transparency")
+    colors = []
+    for index in range(len(palette) // 3):
+        if index != transparency:
+            colors.append(tuple(palette[index * 3:index * 3 + 3]))
+    return colors[:255]
+
+
+def resize_animation(img, targets, image_format, fast=False, output=None, timer=NULL_TIMER, sink=None):
+    """
+    Resize every frame of an animated image into one or more output files.
+
+    Args:
+        img: Opened animated image, positioned at its first frame
+        targets: List of ((width, height), output path) pairs
+        image_format: "GIF" or "WEBP"
+        fast: Use the fast downscale path
+        output: Optional encoder settings (quality, WebP method and the byte
+                budget are used; the quality of animations is not searched, so
+                an animation over the budget raises ValueError)
+        timer: StageTimer for profiling
+        sink: Optional function called with (output path, data) instead of writing
+              the files; the encoded animations are then built in memory
+
+    Returns:
+        Number of frames read
+    """
+    # Imported here as image_resizer imports this module
+    from image_resizer import resize_pixels
+
+    output = output or {}
+    loop = img.info.get("loop")
+    # Frames with color tables of their own are quantized one by one (see GifFrameWriter)
+    frame_palettes = image_format == "GIF" and _has_local_palettes(img)
+    source_colors = _palette_colors(img) if image_format == "GIF" and not frame_palettes else None
+    save_options = {key: output[key] for key in ("quality", "method") if output.get(key) is not None}
+    background = img.info.get("background")
+    if not (isinstance(background, tuple) and len(background) == 4):
+        background = (0, 0, 0, 0)
+
+    files = []
+    writers = [None] * len(targets)
+    frames = 0
+    try:
+        for frame, duration in iter_frames(img, timer):
+            frames += 1
+            for index, (size, path) in enumerate(targets):
+                resized = resize_pixels(frame, size, fast=fast, timer=timer)
+                with timer.stage("encode"):
+                    if writers[index] is None:
+                        if sink is not None:
+                            files.append((io.BytesIO(), None, path))
+                        else:
+                            temporary_path = os.path.join(os.path.dirname(path),
+                                                          f".{os.path.basename(path)}.{os.getpid()}.tmp")
+                            files.append((open(temporary_path, "wb"), temporary_path, path))
+                        if image_format == "GIF":
+                            colors = source_colors
+                            if colors is None and not frame_palettes:
+                                # Quantize once, from the first frame, when the source has no palette
+                                colors = [color for _, color in sorted(
+                                    resized.convert("RGB").quantize(255).convert("RGB").getcolors(256) or [],
+                                    reverse=True)]
+                            writers[index] = GifFrameWriter(files[-1][0], size, colors, loop)
+                        else:
+                            writers[index] = WebPFrameWriter(files[-1][0], size, loop or 0, background,
+                                                             save_options)
+                    writers[index].add(resized, duration)
+        with timer.stage("write"):
+            sizes = []
+            for writer, (output_file, _, _) in zip(writers, files):
+                writer.close()
+                sizes.append(output_file.tell())
+            # Nothing is written unless every output fits the budget
+            max_bytes = output.get("max_bytes")
+            for size in sizes:
+                if max_bytes and size > max_bytes:
+                    raise ValueError(f"animated {image_format} output is {size} bytes, over the budget of "
+                                     f"{max_bytes} (the quality of animations is not searched)")
+            for writer, size, (output_file, temporary_path, path) in zip(writers, sizes, files):
+                if sink is not None:
+                    sink(path, output_file.getvalue())
+                else:
+                    output_file.close()
+                    os.replace(temporary_path, path)
+                timer.add("output_bytes", size)
+                timer.add("output_pixels", writer.size[0] * writer.size[1] * frames)
+    finally:
+        for output_file, temporary_path, _ in files:
+            if not output_file.closed:
+                output_file.close()
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+    return frames
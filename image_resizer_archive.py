@@ -0,0 +1,166 @@
+"""
+Image Resizer Archive
+
+Reads source images straight from zip and tar archives and writes resized
+images straight into zip and tar archives, without extracting anything to
+disk. ArchiveReader and ArchiveWriter plug into the read-ahead and
+write-behind stages of image_resizer_pipeline in place of the file system.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+import os
+import time
+import threading
+
+
+# Archive file name endings -> (archive kind, tar compression)
+ARCHIVE_SUFFIXES = {
+    ".zip": ("zip", None),
+    ".tar": ("tar", ""),
+    ".tar.gz": ("tar", "gz"),
+    ".tgz": ("tar", "gz"),
+    ".tar.bz2": ("tar", "bz2"),
+    ".tbz2": ("tar", "bz2"),
+    ".tar.xz": ("tar", "xz"),
+    ".txz": ("tar", "xz"),
+}
+
+
+def archive_type(path):
+    """Return (kind, compression) for an archive path, or None if path is not an archive name."""
+    lower_path = path.lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if lower_path.endswith(suffix):
+            return kind
+    return None
+
+
+def is_archive(path):
+    """Return True if path names a zip or tar archive (by its extension)."""
+    return archive_type(path) is not None
+
+
+def _relative_member_path(name):
+    """Return a member name as a relative path, or None if it would point outside the output folder."""
+    name = name.replace("\\", "/")
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or name.startswith("/") or ".." in parts or ":" in parts[0]:
+        return None
+    return os.path.join(*parts)
+
+
+class ArchiveReader:
+    """
+    Source of the images stored in a zip or tar archive.
+
+    Paths are the archive path joined with the member name, as if the archive
+    were a folder. Zip members are read when asked for. A tar archive is read
+    front to back in a single pass (compressed tar files cannot be read in any
+    other order efficiently), so scan() reads each image as it is listed and
+    read() hands it over.
+    """
+
+    def __init__(self, path):
+        # Imported here: the archive modules are slow to import and most runs use folders
+        import tarfile
+        import zipfile
+        self.path = path
+        self.kind, compression = archive_type(path)
+        self.lock = threading.Lock()
+        # Relative path -> ZipInfo for zip archives, or the member data for tar archives
+        self.members = {}
+        if self.kind == "zip":
+            self.archive = zipfile.ZipFile(path)
+        else:
+            self.archive = tarfile.open(path, "r|" + (compression or "*"))
+
+    def scan(self, extensions):
+        """
+        Find the images in the archive, in archive order; folders in the archive are included.
+
+        Args:
+            extensions: Lower-case file extensions to include
+
+        Yields:
+            Tuples of (path, relative_path) like image_resizer.scan_images
+        """
+        if self.kind == "zip":
+            members = ((info.filename, info) for info in self.archive.infolist() if not info.is_dir())
+        else:
+            members = ((member.name, member) for member in self.archive if member.isfile())
+        for name, member in members:
+            relative_path = _relative_member_path(name)
+            if relative_path is None or os.path.splitext(relative_path)[1].lower() not in extensions:
+                continue
+            if self.kind == "tar":
+                with self.lock:
+                    member = self.archive.extractfile(member).read()
+            self.members[relative_path] = member
+            yield os.path.join(self.path, relative_path), relative_path
+
+    def size(self, path):
+        member = self.members[os.path.relpath(path, self.path)]
+        return member.file_size if self.kind == "zip" else len(member)
+
+    def read(self, path):
+        relative_path = os.path.relpath(path, self.path)
+        with self.lock:
+            if self.kind == "zip":
+                return self.archive.read(self.members[relative_path])
+            return self.members.pop(relative_path)
+
+    def close(self):
+        self.archive.close()
+
+
+class ArchiveWriter:
+    """
+    Destination that stores the resized images in a zip or tar archive.
+
+    The archive is built in a temporary file next to path, which replaces path
+    when close() is called, so an existing archive is only ever replaced by a
+    complete one. Zip members are stored uncompressed, as the images are
+    compressed already.
+    """
+
+    def __init__(self, path):
+        import tarfile
+        import zipfile
+        self.path = path
+        self.kind, compression = archive_type(path)
+        self.lock = threading.Lock()
+        directory, name = os.path.split(path)
+        os.makedirs(directory or ".", exist_ok=True)
+        self.temporary_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        if self.kind == "zip":
+            self.archive = zipfile.ZipFile(self.temporary_path, "w", zipfile.ZIP_STORED)
+        else:
+            self.archive = tarfile.open(self.temporary_path, "w:" + compression)
+
+    def write(self, path, data):
+        import tarfile
+        import zipfile
+        name = os.path.relpath(path, self.path).replace(os.sep, "/")
+        with self.lock:
+            if self.kind == "zip":
+                self.archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                info.mode = 0o644
+                self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self, keep=True):
+        """Finish the archive and move it into place, or discard it when keep is False."""
+        self.archive.close()
+        if keep:
+            os.replace(self.temporary_path, self.path)
+        else:
+            os.remove(self.temporary_path)
@@ -0,0 +1,254 @@
+"""
+Image Resizer Backend
+
+Pluggable engines for the resize core: opening a source image and resizing its
+pixels. Encoding and writing are shared, so every backend produces the same
+formats and honours the same encoder settings.
+
+- pillow (default): Pillow's decoders and LANCZOS filter (see
+  image_resizer.resize_pixels), with strip-by-strip reading for large TIFF and
+  PNG images
+- vips: libvips through pyvips, when installed. libvips decodes and resizes in
+  one streaming pass, so large images need far less memory and time, and with
+  --fast it decodes JPEG and WebP images at a reduced scale (shrink-on-load).
+  Files libvips cannot read (e.g. BMP without ImageMagick support) and palette,
+  1-bit and 16-bit or deeper images, whose mode libvips would not keep, are
+  handed to Pillow, and animations written as GIF or WebP are still resized frame by
+  frame with Pillow (see image_resizer_animation).
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+
+from PIL import Image, UnidentifiedImageError
+
+from image_resizer_output import format_for_path
+from image_resizer_profile import NULL_TIMER
+
+
+# Names of the backends, default first
+BACKENDS = ("pillow", "vips")
+DEFAULT_BACKEND = "pillow"
+
+# Pillow modes of 8-bit libvips images by band count
+_VIPS_MODES = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
+# libvips loader name prefixes -> Pillow format names
+_VIPS_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP", "gif": "GIF", "tiff": "TIFF", "bmp": "BMP"}
+
+# Backend instances by name, created on first use in each process
+_backends = {}
+
+
+def open_source(input_path, source=None):
+    """Open an image with Pillow, from source (bytes already read) when given."""
+    # Pillow tries the plugins it has loaded, so load the one the extension names
+    format_for_path(input_path)
+    if source is None:
+        return Image.open(input_path)
+    try:
+        return Image.open(io.BytesIO(source))
+    except UnidentifiedImageError:
+        # Name the file rather than the in-memory buffer
+        raise UnidentifiedImageError(f"cannot identify image file {input_path!r}") from None
+
+
+class PillowBackend:
+    """Resizes with Pillow's LANCZOS filter; the default backend."""
+
+    name = "pillow"
+    # Large TIFF and PNG images are read strip by strip (see image_resizer_strips)
+    streams = False
+    # Smaller renditions may be resized from larger ones (see CASCADE_MIN_RATIO)
+    cascades = True
+
+    def open(self, input_path, source=None, sequential=False):
+        """Open an image without decoding its pixels."""
+        return open_source(input_path, source)
+
+    def resize(self, img, new_size, fast=False, timer=NULL_TIMER):
+        """Resize an opened image (see image_resizer.resize_pixels) and return a Pillow image."""
+        # Imported here as image_resizer imports this module
+        from image_resizer import resize_pixels
+        return resize_pixels(img, new_size, fast=fast, timer=timer)
+
+
+class VipsImage:
+    """
+    A source image opened with libvips.
+
+    Offers the few Pillow Image attributes the resize core reads (format, mode,
+    size, width, height, is_animated). Pixels are only decoded when resized.
+    """
+
+    def __init__(self, image, input_path, source=None):
+        self.image = image
+        self.input_path = input_path
+        self.source = source
+        self.size = (image.width, image.height)
+        self.width, self.height = self.size
+        self.mode = _VIPS_MODES.get(image.bands, "RGB")
+        loader = image.get("vips-loader") if image.get_typeof("vips-loader") else ""
+        self.format = _VIPS_FORMATS.get(loader.split("load")[0], loader.upper() or None)
+        pages = image.get("n-pages") if image.get_typeof("n-pages") else 1
+        self.is_animated = pages > 1
+
+    def draft(self, mode, size):
+        # Reduced-scale decoding happens in VipsBackend.resize
+        pass
+
+    def close(self):
+        self.image = self.source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class VipsBackend:
+    """
+    Resizes with libvips (pyvips) and hands the result to Pillow for encoding.
+
+    The source is opened for sequential access when it is resized only once, so
+    it streams through decode and resize without ever being held in memory whole.
+    Alpha is premultiplied while resizing, as Pillow does.
+    """
+
+    name = "vips"
+    streams = True
+    cascades = False
+
+    def __init__(self):
+        import pyvips
+        self.pyvips = pyvips
+        # Every file is opened once, so caching operations only holds on to memory
+        pyvips.cache_set_max(0)
+
+    def open(self, input_path, source=None, sequential=False):
+        """Open an image with libvips, or with Pillow if libvips cannot read it."""
+        access = "sequential" if sequential else "random"
+        try:
+            if source is None:
+                image = self.pyvips.Image.new_from_file(input_path, access=access)
+            else:
+                image = self.pyvips.Image.new_from_buffer(source, "", access=access)
+        except self.pyvips.Error:
+            return open_source(input_path, source)
+        if _keeps_mode_in_pillow(image):
+            return open_source(input_path, source)
+        return VipsImage(image, input_path, source)
+
+    def resize(self, img, new_size, fast=False, timer=NULL_TIMER):
+        """
+        Resize an image opened by open() and return a Pillow image.
+
+        libvips decodes while it resizes, so both count as the resize stage.
+        """
+        if isinstance(img, Image.Image):
+            return PillowBackend().resize(img, new_size, fast=fast, timer=timer)
+        width, height = new_size
+        with timer.stage("resize"):
+            if fast:
+                # Shrink-on-load: the decoder skips the detail the target size cannot show
+                options = {"height": height, "size": "force", "no_rotate": True}
+                if img.source is not None:
+                    image = self.pyvips.Image.thumbnail_buffer(img.source, width, **options)
+                else:
+                    image = self.pyvips.Image.thumbnail(img.input_path, width, **options)
+            else:
+                image = img.image
+            image, converted = _eight_bit(image)
+            if not fast:
+                if image.hasalpha():
+                    image = image.premultiply()
+                image = image.resize(width / image.width, vscale=height / image.height, kernel="lanczos3")
+                if image.hasalpha():
+                    image = image.unpremultiply()
+                if image.format != "uchar":
+                    image = image.rint().cast("uchar")
+            if (image.width, image.height) != new_size:
+                # Rounding in libvips can be a pixel off the requested size
+                image = image.gravity("north-west", width, height, extend="copy")
+            resized = Image.frombytes(_VIPS_MODES[image.bands], new_size, image.write_to_memory())
+        # Metadata for image_resizer_output.prepare_image to carry over
+        if image.get_typeof("exif-data"):
+            resized.info["exif"] = image.get("exif-data")
+        if image.get_typeof("icc-profile-data") and not converted and img.image.interpretation != "cmyk":
+            resized.info["icc_profile"] = image.get("icc-profile-data")
+        return resized
+
+
+def _keeps_mode_in_pillow(image):
+    """
+    Return True if Pillow keeps a mode for the image that libvips would change.
+
+    libvips expands palette images to RGB, reads 1-bit images as 8-bit grey and
+    keeps 16-bit and deeper samples that the resize turns into 8 bits, while
+    Pillow resizes all of them in their own mode (P, 1, I;16, I or F).
+    """
+    if image.format != "uchar":
+        return True
+    if any(image.get_typeof(field) and image.get(field) for field in ("palette", "palette-bit-depth")):
+        return True
+    return bool(image.get_typeof("bits-per-sample")) and image.get("bits-per-sample") == 1
+
+
+def _eight_bit(image):
+    """
+    Return (image, converted) with image as 8-bit grey or sRGB, with or without alpha.
+
+    converted is True when the colour space was changed, in which case an
+    embedded ICC profile no longer describes the pixels.
+    """
+    converted = False
+    if image.interpretation == "cmyk" or image.format != "uchar" or image.bands > 4:
+        target = "b-w" if image.bands <= 2 and image.interpretation != "cmyk" else "srgb"
+        image = image.colourspace(target)
+        converted = True
+        if image.format != "uchar":
+            image = image.cast("uchar")
+        if image.bands > 4:
+            image = image.extract_band(0, n=4)
+    return image, converted
+
+
+def backend_available(name):
+    """Return True if the named backend can be used in this environment."""
+    if name == "pillow":
+        return True
+    if name == "vips":
+        try:
+            import pyvips  # noqa: F401
+        except (ImportError, OSError):
+            # OSError: pyvips is installed but the libvips library is missing
+            return False
+        return True
+    return False
+
+
+def available_backends():
+    """Return the names of the backends that can be used, default first."""
+    return [name for name in BACKENDS if backend_available(name)]
+
+
+def check_backend(name):
+    """Raise ValueError if the named backend is unknown or not installed."""
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend: {name} (choose from {', '.join(BACKENDS)})")
+    if not backend_available(name):
+        raise ValueError(f"the {name} backend needs pyvips and the libvips library (pip install pyvips)")
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """Return the backend of the given name, created on first use."""
+    if name not in _backends:
+        check_backend(name)
+        _backends[name] = PillowBackend() if name == "pillow" else VipsBackend()
+    return _backends[name]
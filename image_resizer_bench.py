@@ -0,0 +1,584 @@
+"""
+Image Resizer Benchmark
+
+Generates a reproducible synthetic image corpus and measures the resize pipeline
+under several configurations. Each configuration runs in a fresh Python process so
+that its peak memory is measured on its own. Results are written as JSON and can
+be compared against an earlier run to spot regressions.
+
+Usage:
+    python image_resizer_bench.py --output results.json
+    python image_resizer_bench.py --quick --compare results.json
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+
+import PIL
+from PIL import Image, ImageChops, ImageStat
+
+import image_resizer
+from image_resizer_animation import ANIMATED_FORMATS
+from image_resizer_backend import BACKENDS, DEFAULT_BACKEND, backend_available, get_backend
+from image_resizer_output import PRESETS, output_extension_path
+
+
+# Synthetic corpus: (format, mode, megapixels, number of files, pages per file)
+CORPUS = [
+    ("JPEG", "RGB", 0.3, 8, 1),
+    ("JPEG", "RGB", 2, 6, 1),
+    ("JPEG", "RGB", 12, 3, 1),
+    ("JPEG", "RGB", 24, 1, 1),
+    ("JPEG", "RGB", 50, 1, 1),
+    ("PNG", "RGB", 0.3, 3, 1),
+    ("PNG", "RGBA", 2, 3, 1),
+    ("PNG", "RGBA", 12, 1, 1),
+    ("WEBP", "RGB", 2, 3, 1),
+    ("GIF", "P", 0.3, 3, 1),
+    ("BMP", "RGB", 2, 2, 1),
+    ("TIFF", "RGB", 2, 2, 1),
+    ("TIFF", "RGB", 12, 1, 3),
+    # Animations last, so the files above keep their random data
+    ("GIF", "P", 0.3, 2, 60),
+    ("WEBP", "RGBA", 0.3, 1, 60),
+]
+
+# Extra images for --parity only, in modes a backend must keep: (format, mode).
+# They are kept out of the benchmark corpus so its results stay comparable.
+PARITY_CORPUS = [
+    ("PNG", "P"),
+    ("PNG", "I;16"),
+    ("PNG", "LA"),
+    ("TIFF", "1"),
+    ("TIFF", "I;16"),
+]
+
+# Size of the --parity images in megapixels
+PARITY_MEGAPIXELS = 0.3
+
+# Largest image size (in megapixels) generated with --quick
+QUICK_MAX_MEGAPIXELS = 12
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif", "BMP": ".bmp", "TIFF": ".tif"}
+
+# Benchmark configurations: keyword arguments for image_resizer.process_images.
+# The worker count is added from the command line unless a configuration sets it.
+CONFIGURATIONS = {
+    "percentage": {"percentage": 10},
+    "percentage-single-worker": {"percentage": 10, "workers": 1},
+    "dimensions": {"width": 800, "height": 600},
+    "fast": {"percentage": 10, "fast": True},
+    "renditions": {"renditions": [
+        {"name": "large", "percentage": 50, "subfolder": "large"},
+        {"name": "medium", "size": (800, 600), "subfolder": "medium"},
+        {"name": "thumb", "size": (150, 150), "subfolder": "thumb"},
+    ]},
+    "fast-encode": {"percentage": 10, "output": PRESETS["fast-encode"]},
+    "smallest-bytes": {"percentage": 10, "output": PRESETS["smallest-bytes"]},
+    "webp": {"percentage": 10, "output": {"format": "WEBP"}},
+    "pipelined": {"percentage": 10, "pipeline": {}},
+    "largest-first": {"percentage": 10, "plan": True},
+    # Run only when pyvips is installed
+    "vips": {"percentage": 10, "backend": "vips"},
+    "vips-fast": {"percentage": 10, "fast": True, "backend": "vips"},
+    "vips-renditions": {"backend": "vips", "renditions": [
+        {"name": "large", "percentage": 50, "subfolder": "large"},
+        {"name": "medium", "size": (800, 600), "subfolder": "medium"},
+        {"name": "thumb", "size": (150, 150), "subfolder": "thumb"},
+    ]},
+}
+
+# Largest mean difference per channel (out of 255) allowed between the pixels
+# resized by another backend and by the default backend in --parity checks
+PARITY_TOLERANCE = 1.5
+
+# Scale of the --parity resizes
+PARITY_PERCENTAGE = 25
+
+# Relative change in a metric that counts as a regression when comparing runs
+DEFAULT_THRESHOLD = 0.10
+
+# Timed runs of each command in the startup benchmark (the median is reported)
+DEFAULT_STARTUP_RUNS = 5
+
+# Prints the modules a CLI run has loaded (the CLI arguments follow the script path)
+_MODULES_PROBE = (
+    "import json, runpy, sys\n"
+    "sys.argv = sys.argv[1:]\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+    "sys.stderr.write(json.dumps(sorted(sys.modules)))\n"
+)
+
+
+def _synthetic_image(rng, mode, size):
+    """Create a deterministic photo-like image: smooth random colour blended with a gradient."""
+    tile = Image.frombytes("RGB", (32, 32), rng.randbytes(32 * 32 * 3))
+    img = tile.resize(size, Image.Resampling.BICUBIC)
+    gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+    img = Image.blend(img, gradient, 0.3)
+    if mode == "RGBA":
+        img.putalpha(Image.radial_gradient("L").resize(size))
+    elif mode == "P":
+        img = img.quantize(256)
+    elif mode == "LA":
+        img = img.convert("L")
+        img.putalpha(Image.radial_gradient("L").resize(size))
+    elif mode == "1":
+        img = img.convert("1")
+    elif mode == "I;16":
+        # Spread the 8-bit levels over the 16-bit range
+        img = img.convert("L").convert("I").point(lambda value: value * 257).convert("I;16")
+    return img
+
+
+def generate_corpus(corpus_folder, quick=False, seed=0):
+    """
+    Generate the synthetic corpus in corpus_folder, skipping files that already exist.
+
+    Returns:
+        List of generated file paths
+    """
+    os.makedirs(corpus_folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for image_format, mode, megapixels, count, pages in CORPUS:
+        for index in range(count):
+            # Draw the random data even for skipped files so the corpus stays stable
+            page_seeds = [rng.randbytes(8) for _ in range(pages)]
+            if quick and megapixels > QUICK_MAX_MEGAPIXELS:
+                continue
+            name = f"{image_format.lower()}_{mode.lower()}_{megapixels}mp_{index}"
+            if pages > 1:
+                name += f"_{pages}pages"
+            path = os.path.join(corpus_folder, name + EXTENSIONS[image_format])
+            paths.append(path)
+            if os.path.exists(path):
+                continue
+            # 3:2 aspect ratio like most camera sensors
+            width = int((megapixels * 1_000_000 * 1.5) ** 0.5)
+            size = (width, int(width / 1.5))
+            if image_format in ANIMATED_FORMATS and pages > 1:
+                # Animation frames: the first page scrolling sideways
+                first = _synthetic_image(random.Random(page_seeds[0]), mode, size)
+                frames = [ImageChops.offset(first, page * 4, 0) for page in range(pages)]
+            else:
+                frames = [_synthetic_image(random.Random(page_seed), mode, size) for page_seed in page_seeds]
+            save_options = {"quality": 90} if image_format in ("JPEG", "WEBP") else {}
+            if pages > 1:
+                save_options.update(save_all=True, append_images=frames[1:])
+            frames[0].save(path, format=image_format, **save_options)
+    return paths
+
+
+def generate_parity_corpus(parity_folder, seed=0):
+    """
+    Generate the extra --parity images in parity_folder, skipping files that already exist.
+
+    Returns:
+        List of generated file paths
+    """
+    os.makedirs(parity_folder, exist_ok=True)
+    rng = random.Random(seed)
+    width = int((PARITY_MEGAPIXELS * 1_000_000 * 1.5) ** 0.5)
+    size = (width, int(width / 1.5))
+    paths = []
+    for image_format, mode in PARITY_CORPUS:
+        page_seed = rng.randbytes(8)
+        name = f"{image_format.lower()}_{mode.lower().replace(';', '')}_{PARITY_MEGAPIXELS}mp"
+        path = os.path.join(parity_folder, name + EXTENSIONS[image_format])
+        paths.append(path)
+        if not os.path.exists(path):
+            _synthetic_image(random.Random(page_seed), mode, size).save(path, format=image_format)
+    return paths
+
+
+def _folder_bytes(folder):
+    """Return the total size of all files below folder."""
+    total = 0
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            total += os.path.getsize(os.path.join(directory, name))
+    return total
+
+
+def _percentile(values, fraction):
+    """Return the value at the given fraction (0-1) of the sorted values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _peak_rss_mb():
+    """Return the peak resident set size of this process and of its largest child, in MB."""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1_000_000
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1_000_000
+    return round(own, 1), round(children, 1)
+
+
+def _resize_image_options(options):
+    """Translate process_images keyword arguments into resize_image keyword arguments."""
+    resize_options = {key: value for key, value in options.items()
+                      if key in ("percentage", "fast", "renditions", "output", "backend")}
+    if "width" in options:
+        resize_options["size"] = (options["width"], options["height"])
+    return resize_options
+
+
+def _libvips_version():
+    """Return the version of libvips, or None when the vips backend is not installed."""
+    if not backend_available("vips"):
+        return None
+    import pyvips
+    return ".".join(str(pyvips.version(part)) for part in range(3))
+
+
+def _frame_count(path):
+    """Return the number of frames the resize pipeline reads from path."""
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1) if img.format in ANIMATED_FORMATS else 1
+
+
+def run_configuration(name, corpus_folder, workers):
+    """
+    Measure one configuration in the current process.
+
+    The batch run through process_images gives throughput; a second pass calling
+    resize_image on each file gives the per-image latency distribution.
+
+    Returns:
+        Dictionary of metrics
+    """
+    options = dict(CONFIGURATIONS[name])
+    options.setdefault("workers", workers)
+    input_files = sorted(os.path.join(corpus_folder, name) for name in os.listdir(corpus_folder))
+    input_bytes = sum(os.path.getsize(path) for path in input_files)
+    input_frames = sum(_frame_count(path) for path in input_files)
+
+    output_folder = tempfile.mkdtemp(prefix="image_resizer_bench_")
+    try:
+        with redirect_stdout(io.StringIO()):
+            summary = image_resizer.process_images(corpus_folder, output_folder, **options)
+        output_bytes = _folder_bytes(output_folder)
+
+        latencies = []
+        resize_options = _resize_image_options(options)
+        for path in input_files:
+            output_path = os.path.join(output_folder, "latency_" + os.path.basename(path))
+            output_path = output_extension_path(output_path, options.get("output"))
+            start_time = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                image_resizer.resize_image(path, output_path, **resize_options)
+            latencies.append(time.perf_counter() - start_time)
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    elapsed = summary["elapsed"]
+    peak_rss, peak_worker_rss = _peak_rss_mb()
+    return {
+        "workers": options["workers"],
+        "images": summary["total"],
+        "failed": summary["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "images_per_s": round(summary["total"] / elapsed, 2),
+        # Animated images count every frame
+        "frames_per_s": round(input_frames / elapsed, 2),
+        "mb_in_per_s": round(input_bytes / 1_000_000 / elapsed, 2),
+        "mb_out_per_s": round(output_bytes / 1_000_000 / elapsed, 2),
+        "output_mb": round(summary["output_bytes"] / 1_000_000, 2),
+        "latency_p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "peak_rss_mb": peak_rss,
+        "peak_worker_rss_mb": peak_worker_rss,
+    }
+
+
+def _parity_pixels(img):
+    """Return img as premultiplied RGBA data, so the colour of invisible pixels does not count."""
+    if img.mode.startswith("I;16"):
+        # Compare 16-bit images in 8-bit levels, like the other modes
+        img = img.convert("I").point(lambda value: value / 257).convert("L")
+    return Image.frombytes("RGBA", img.size, img.convert("RGBA").convert("RGBa").tobytes())
+
+
+def check_parity(paths, backends, fast=False, percentage=PARITY_PERCENTAGE, tolerance=PARITY_TOLERANCE):
+    """
+    Resize every image in paths with each backend and compare the result with the default backend.
+
+    Returns:
+        Tuple of (rows, failures) where rows are (file, backend, mean difference,
+        largest difference, mode) and failures are the rows over the tolerance
+        or whose mode differs from the default backend's (mode is then
+        "expected -> actual")
+    """
+    reference = get_backend(DEFAULT_BACKEND)
+    rows, failures = [], []
+    for path in paths:
+        name = os.path.basename(path)
+        with reference.open(path) as img:
+            new_size, _ = image_resizer.compute_new_size(img.size, percentage=percentage)
+            expected = reference.resize(img, new_size, fast=fast)
+        for backend_name in backends:
+            backend = get_backend(backend_name)
+            with backend.open(path, sequential=True) as img:
+                resized = backend.resize(img, new_size, fast=fast)
+            difference = ImageChops.difference(_parity_pixels(expected), _parity_pixels(resized))
+            mode = expected.mode if resized.mode == expected.mode else f"{expected.mode} -> {resized.mode}"
+            row = (name, backend_name, max(ImageStat.Stat(difference).mean),
+                   max(high for _, high in difference.getextrema()), mode)
+            rows.append(row)
+            if row[2] > tolerance or resized.mode != expected.mode:
+                failures.append(row)
+    return rows, failures
+
+
+def _median_ms(command, runs, environment_for_run):
+    """Run command runs times and return the median wall time in milliseconds."""
+    times = []
+    for run in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(command, capture_output=True, check=True, env=environment_for_run(run))
+        times.append(time.perf_counter() - start_time)
+    return round(statistics.median(times) * 1000, 1)
+
+
+def measure_startup(corpus_folder, executable=None, runs=DEFAULT_STARTUP_RUNS):
+    """
+    Time whole command line runs, whose cost is mostly startup: printing the
+    version, and resizing a single image.
+
+    Cold runs of the script start with an empty bytecode cache (a new
+    PYTHONPYCACHEPREFIX each time), so every module is compiled again as after an
+    install or upgrade; warm runs share one cache. A frozen executable has no
+    bytecode cache: its first run is the cold one and the others are warm.
+
+    Args:
+        executable: Optional path of a frozen CLI executable to time instead of
+                    image_resizer.py
+
+    Returns:
+        Dictionary of metrics, with the modules a single-image run of the script
+        loads and whether tkinter is among them
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_resizer.py")
+    command = [executable] if executable else [sys.executable, script]
+    work_folder = tempfile.mkdtemp(prefix="image_resizer_startup_")
+    try:
+        # The smallest JPEG of the corpus, alone in a folder
+        input_folder = os.path.join(work_folder, "input")
+        os.makedirs(input_folder)
+        source = min((name for name in os.listdir(corpus_folder) if name.endswith(".jpg")),
+                     key=lambda name: os.path.getsize(os.path.join(corpus_folder, name)))
+        shutil.copy(os.path.join(corpus_folder, source), input_folder)
+        commands = {
+            "version": command + ["--version"],
+            "single_image": command + [input_folder, os.path.join(work_folder, "output"), "-p", "50", "-w", "1"],
+        }
+
+        # Bytecode has to be written for the warm runs to find it
+        environment = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+
+        def cold_environment(run):
+            return dict(environment, PYTHONPYCACHEPREFIX=os.path.join(work_folder, f"cache_cold_{name}_{run}"))
+
+        def warm_environment(run):
+            return dict(environment, PYTHONPYCACHEPREFIX=os.path.join(work_folder, "cache_warm"))
+
+        results = {}
+        for name, timed_command in commands.items():
+            if executable:
+                results[f"{name}_cold_ms"] = _median_ms(timed_command, 1, warm_environment)
+            else:
+                results[f"{name}_cold_ms"] = _median_ms(timed_command, runs, cold_environment)
+                # Fill the shared cache before the warm runs
+                _median_ms(timed_command, 1, warm_environment)
+            results[f"{name}_warm_ms"] = _median_ms(timed_command, runs, warm_environment)
+
+        if not executable:
+            probe = subprocess.run([sys.executable, "-c", _MODULES_PROBE] + commands["single_image"][1:],
+                                   capture_output=True, text=True, check=True)
+            modules = json.loads(probe.stderr.strip().splitlines()[-1])
+            results["modules_loaded"] = len(modules)
+            results["pillow_plugins_loaded"] = sum(1 for module in modules if module.endswith("ImagePlugin"))
+            results["tkinter_loaded"] = "tkinter" in modules
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+    return results
+
+
+def run_benchmark(corpus_folder, configurations, workers):
+    """
+    Run each configuration in its own Python process.
+
+    Returns:
+        Dictionary of configuration name to metrics
+    """
+    results = {}
+    for name in configurations:
+        print(f"Running configuration: {name}", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-configuration", name,
+             "--corpus", corpus_folder, "--workers", str(workers)],
+            capture_output=True, text=True, check=True
+        )
+        results[name] = json.loads(completed.stdout)
+    return results
+
+
+def compare_results(previous, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two benchmark reports.
+
+    Returns:
+        List of human-readable regression descriptions (empty if none)
+    """
+    # Metrics where a higher value is better; for all others lower is better
+    higher_is_better = {"images_per_s", "frames_per_s", "mb_in_per_s", "mb_out_per_s"}
+    compared = ["images_per_s", "frames_per_s", "mb_in_per_s", "output_mb", "latency_p50_ms", "latency_p99_ms",
+                "peak_worker_rss_mb", "version_cold_ms", "version_warm_ms", "single_image_cold_ms",
+                "single_image_warm_ms", "modules_loaded", "pillow_plugins_loaded"]
+    regressions = []
+    if current["results"].get("startup", {}).get("tkinter_loaded"):
+        regressions.append("startup: the command line run loads tkinter")
+    for name, metrics in current["results"].items():
+        old_metrics = previous.get("results", {}).get(name)
+        if not old_metrics:
+            continue
+        for metric in compared:
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"{name:28} {metric:20} {old:>10} -> {new:>10} ({change:+.1%})", file=sys.stderr)
+            worse = -change if metric in higher_is_better else change
+            if worse > threshold:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Image Resizer pipeline on a synthetic corpus.")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "image_resizer_bench_corpus"),
+                        help="Folder for the generated corpus (reused between runs)")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"Leave out images larger than {QUICK_MAX_MEGAPIXELS} MP")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--configurations", nargs="+", choices=sorted(CONFIGURATIONS),
+                        default=[name for name, options in CONFIGURATIONS.items()
+                                 if backend_available(options.get("backend", DEFAULT_BACKEND))],
+                        help="Configurations to run (default: all whose backend is installed)")
+    parser.add_argument("--parity", action="store_true",
+                        help="Instead of benchmarking, check that every installed backend resizes the "
+                             "corpus within --tolerance of the default backend; exit with status 1 if not")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE,
+                        help="With --parity, largest mean difference per channel out of 255 "
+                             "(default: %(default)g)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", metavar="REPORT",
+                        help="Compare with an earlier JSON report and exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change that counts as a regression (default: 0.10)")
+    parser.add_argument("--startup-runs", type=int, default=DEFAULT_STARTUP_RUNS,
+                        help="Timed runs of each command in the startup benchmark, reported as "
+                             "\"startup\" (default: %(default)s, 0 skips it)")
+    parser.add_argument("--executable", metavar="PATH",
+                        help="Time the startup of this frozen CLI executable (see build_exe.py) instead "
+                             "of image_resizer.py")
+    parser.add_argument("--run-configuration", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_configuration:
+        print(json.dumps(run_configuration(args.run_configuration, args.corpus, args.workers)))
+        return
+
+    # Keep quick and full corpora apart so they never mix
+    corpus_folder = os.path.join(args.corpus, f"seed{args.seed}{'_quick' if args.quick else ''}")
+    print(f"Generating corpus in {corpus_folder}", file=sys.stderr)
+    paths = generate_corpus(corpus_folder, quick=args.quick, seed=args.seed)
+
+    if args.parity:
+        backends = [name for name in BACKENDS if name != DEFAULT_BACKEND and backend_available(name)]
+        if not backends:
+            print("No other backend is installed; nothing to compare", file=sys.stderr)
+            return
+        parity_paths = sorted(paths) + generate_parity_corpus(corpus_folder + "_parity", seed=args.seed)
+        failures = []
+        for fast in (False, True):
+            rows, fast_failures = check_parity(parity_paths, backends, fast=fast, tolerance=args.tolerance)
+            for name, backend_name, mean, largest, mode in rows:
+                print(f"{name:36} {backend_name:8} {'fast' if fast else 'full':5} mean {mean:5.2f} max {largest:3} "
+                      f"{mode}", file=sys.stderr)
+            failures.extend(fast_failures)
+        for name, backend_name, mean, _, mode in failures:
+            print(f"PARITY: {name}: {backend_name} differs by {mean:.2f} on average ({mode})", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        return
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "libvips": _libvips_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": {
+            "seed": args.seed,
+            "quick": args.quick,
+            "files": len(paths),
+            "bytes": sum(os.path.getsize(path) for path in paths),
+        },
+        "results": run_benchmark(corpus_folder, args.configurations, args.workers),
+    }
+    if args.startup_runs > 0:
+        print("Measuring startup", file=sys.stderr)
+        report["results"]["startup"] = measure_startup(corpus_folder, args.executable, args.startup_runs)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        regressions = compare_results(previous, report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Image Resizer Cache
+
+Size-bounded LRU caches of rendered images, shared by the resize server and the
+preview window: MemoryCache keeps them in memory and DiskCache in a folder, where
+they survive restarts.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """Thread-safe LRU cache of rendered images, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DiskCache:
+    """
+    LRU cache of rendered images in a folder, bounded by their total size in bytes.
+
+    Files are named after the ETag of the variant. The recency order is kept in
+    memory and rebuilt from the file modification times on startup.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        with os.scandir(folder) as scanned:
+            files = [(entry.stat().st_mtime_ns, entry.name, entry.stat().st_size)
+                     for entry in scanned if entry.is_file() and not entry.name.startswith(".")]
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.size += size
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, name):
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        try:
+            with open(os.path.join(self.folder, name), "rb") as cached_file:
+                return cached_file.read()
+        except FileNotFoundError:
+            with self.lock:
+                self.size -= self.entries.pop(name, 0)
+            return None
+
+    def put(self, name, data):
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temporary file first so readers never see a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.folder, prefix=".")
+        with os.fdopen(descriptor, "wb") as cached_file:
+            cached_file.write(data)
+        os.replace(temporary_path, os.path.join(self.folder, name))
+        with self.lock:
+            self.size += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+            self._evict()
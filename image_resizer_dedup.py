@@ -0,0 +1,103 @@
+"""
+Image Resizer Dedup
+
+Finds byte-identical source images so that each unique content is resized only
+once per run. Files are compared by size first; only files whose size is shared
+with another file are hashed, with a streaming hash that reads them in chunks.
+The outputs of duplicates are hardlinks (or copies) of the first result.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import shutil
+import hashlib
+
+
+# Bytes read at a time while hashing
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_digest(path):
+    """Return the BLAKE2b digest of a file, read in chunks so memory use stays constant."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class DuplicateFinder:
+    """
+    Recognizes files whose content was already seen, in the order they are added.
+
+    Only files that share their size (and group) with an earlier file are hashed;
+    the earlier file is hashed too the first time that happens.
+    """
+
+    def __init__(self):
+        # (size, group) -> [first path, {digest: path} or None until a second file shows up]
+        self.sizes = {}
+        self.hashed_bytes = 0
+
+    def _digest(self, path, size):
+        self.hashed_bytes += size
+        return file_digest(path)
+
+    def original_of(self, path, size, group=None):
+        """
+        Register a file and look for an earlier file with the same content.
+
+        Args:
+            path: Path of the file
+            size: Size of the file in bytes
+            group: Optional key that must match as well, e.g. the output format
+
+        Returns:
+            Path of the earlier identical file, or None if the content is new
+        """
+        entry = self.sizes.get((size, group))
+        if entry is None:
+            self.sizes[(size, group)] = [path, None]
+            return None
+        first_path, digests = entry
+        if digests is None:
+            digests = entry[1] = {}
+            try:
+                digests[self._digest(first_path, size)] = first_path
+            except OSError:
+                # The earlier file is gone or unreadable; only this one is looked up
+                pass
+        digest = self._digest(path, size)
+        original = digests.get(digest)
+        if original is None:
+            digests[digest] = path
+        return original
+
+
+def link_or_copy(source, destination, mode="link"):
+    """
+    Make destination a hardlink to source, or a copy when linking is not possible.
+
+    An existing destination is replaced.
+
+    Returns:
+        "link" or "copy", whichever was done
+    """
+    try:
+        os.unlink(destination)
+    except FileNotFoundError:
+        pass
+    if mode == "link":
+        try:
+            os.link(source, destination)
+            return "link"
+        except OSError:
+            # Different file systems, or links not supported
+            pass
+    shutil.copyfile(source, destination)
+    return "copy"
@@ -15,17 +15,84 @@ import os
 import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image
-from pathlib import Path
+import time
 import threading
 import queue
+import multiprocessing
+from collections import deque
+
+from image_resizer import format_bytes, process_images, scan_images
+from image_resizer_backend import DEFAULT_BACKEND, available_backends
+from image_resizer_output import PRESETS, byte_size, output_options
+from image_resizer_preview import PreviewWindow
+
+# Name of the stage timing report written to the output folder when profiling
+PROFILE_REPORT_NAME = "profile_report.json"
+
+# Minimum time in seconds between two progress updates sent to the UI
+PROGRESS_INTERVAL = 0.1
+
+# Maximum number of lines kept in the log area
+MAX_LOG_LINES = 1000
+
+# Output format choices shown in the GUI and the format they select
+FORMAT_CHOICES = {"Same as source": None, "JPEG": "JPEG", "WebP": "WEBP", "PNG": "PNG"}
+NO_PRESET = "None"
+
+
+class ProgressReporter:
+    """
+    Coalesces progress and log messages of the worker thread into periodic batches.
+    
+    At most one progress tick and one batch of log lines are queued per interval,
+    and only the last MAX_LOG_LINES lines are kept, so the work done by the UI
+    stays constant no matter how many images are processed.
+    """
+    
+    def __init__(self, progress_queue, total, interval=PROGRESS_INTERVAL):
+        self.progress_queue = progress_queue
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.lines = deque(maxlen=MAX_LOG_LINES)
+        self.dropped = 0
+        self.last_flush = 0.0
+    
+    def log(self, message):
+        """Queue a log line."""
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(message)
+        self.maybe_flush()
+    
+    def result(self, result):
+        """Count a finished image."""
+        self.done += 1
+        self.maybe_flush()
+    
+    def maybe_flush(self):
+        """Send the pending updates if the interval has passed since the last ones."""
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+    
+    def flush(self):
+        """Send the pending log lines and the current progress to the UI."""
+        if self.lines:
+            lines = list(self.lines)
+            if self.dropped:
+                lines.insert(0, f"... {self.dropped} messages not shown")
+            self.progress_queue.put(("log", lines))
+            self.lines.clear()
+            self.dropped = 0
+        self.progress_queue.put(("progress", (self.done, self.total)))
+        self.last_flush = time.monotonic()
 
 
 class ImageResizerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Image Resizer v2")
-        self.root.geometry("600x550")  # Increased height for about info
+        self.root.geometry("600x680")  # Increased height for about info and options
         self.root.resizable(True, True)
         
         # Application info
@@ -51,8 +118,23 @@ class ImageResizerApp:
         self.percentage = tk.StringVar(value="50")
         self.resize_mode = tk.StringVar(value="dimensions")
         self.maintain_aspect_ratio = tk.BooleanVar(value=True)
+        self.fast_downscale = tk.BooleanVar(value=False)
+        self.include_subfolders = tk.BooleanVar(value=False)
+        self.write_profile = tk.BooleanVar(value=False)
+        self.workers = tk.StringVar(value=str(os.cpu_count() or 1))
+        self.backend = tk.StringVar(value=DEFAULT_BACKEND)
+        self.output_format = tk.StringVar(value="Same as source")
+        self.preset = tk.StringVar(value=NO_PRESET)
+        self.quality = tk.StringVar(value="")
+        self.webp_method = tk.StringVar(value="")
+        self.max_bytes = tk.StringVar(value="")
+        self.progressive = tk.BooleanVar(value=False)
+        self.optimize = tk.BooleanVar(value=False)
+        self.strip_metadata = tk.BooleanVar(value=False)
         self.progress_queue = queue.Queue()
+        self.cancel_event = threading.Event()
         self.processing = False
+        self.preview_window = None
         
         self.create_widgets()
         self.update_progress()
@@ -122,6 +204,71 @@ class ImageResizerApp:
         percentage_entry.pack(side=tk.LEFT, padx=5)
         ttk.Label(self.percentage_frame, text="%").pack(side=tk.LEFT)
         
+        # Fast downscale option
+        self.options_frame = ttk.Frame(main_frame)
+        self.options_frame.pack(fill=tk.X, pady=5)
+        
+        fast_check = ttk.Checkbutton(self.options_frame, text="Fast downscale (reduced-scale JPEG decoding)",
+                                     variable=self.fast_downscale)
+        fast_check.pack(side=tk.LEFT)
+        
+        subfolders_check = ttk.Checkbutton(self.options_frame, text="Include subfolders",
+                                           variable=self.include_subfolders, command=self.update_preview_folder)
+        subfolders_check.pack(side=tk.LEFT, padx=(20, 0))
+        
+        profile_check = ttk.Checkbutton(self.options_frame, text="Write profile report",
+                                        variable=self.write_profile)
+        profile_check.pack(side=tk.LEFT, padx=(20, 0))
+        
+        # Parallel workers
+        workers_frame = ttk.Frame(main_frame)
+        workers_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(workers_frame, text="Workers:").pack(side=tk.LEFT)
+        workers_spinbox = ttk.Spinbox(workers_frame, from_=1, to=max(64, os.cpu_count() or 1),
+                                      textvariable=self.workers, width=4)
+        workers_spinbox.pack(side=tk.LEFT, padx=5)
+        
+        # Resize engine; vips is only offered when pyvips is installed
+        ttk.Label(workers_frame, text="Resize engine:").pack(side=tk.LEFT, padx=(20, 0))
+        ttk.Combobox(workers_frame, textvariable=self.backend, values=available_backends(),
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+        
+        # Output format and encoder settings
+        encoder_frame = ttk.LabelFrame(main_frame, text="Output")
+        encoder_frame.pack(fill=tk.X, pady=5)
+        
+        format_frame = ttk.Frame(encoder_frame)
+        format_frame.pack(fill=tk.X, padx=5, pady=2)
+        
+        ttk.Label(format_frame, text="Format:").pack(side=tk.LEFT)
+        ttk.Combobox(format_frame, textvariable=self.output_format, values=list(FORMAT_CHOICES),
+                     state="readonly", width=14).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(format_frame, text="Preset:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Combobox(format_frame, textvariable=self.preset, values=[NO_PRESET] + sorted(PRESETS),
+                     state="readonly", width=14).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(format_frame, text="Quality:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Entry(format_frame, textvariable=self.quality, width=4).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(format_frame, text="Max size:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Entry(format_frame, textvariable=self.max_bytes, width=8).pack(side=tk.LEFT, padx=5)
+        
+        encoder_options_frame = ttk.Frame(encoder_frame)
+        encoder_options_frame.pack(fill=tk.X, padx=5, pady=2)
+        
+        ttk.Checkbutton(encoder_options_frame, text="Progressive JPEG",
+                        variable=self.progressive).pack(side=tk.LEFT)
+        ttk.Checkbutton(encoder_options_frame, text="Optimize",
+                        variable=self.optimize).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Checkbutton(encoder_options_frame, text="Strip metadata",
+                        variable=self.strip_metadata).pack(side=tk.LEFT, padx=(10, 0))
+        
+        ttk.Label(encoder_options_frame, text="WebP method:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Spinbox(encoder_options_frame, from_=0, to=6, textvariable=self.webp_method,
+                    width=3).pack(side=tk.LEFT, padx=5)
+        
         # Progress bar and status
         progress_frame = ttk.Frame(main_frame)
         progress_frame.pack(fill=tk.X, pady=10)
@@ -161,7 +308,11 @@ class ImageResizerApp:
         button_frame.pack(fill=tk.X, pady=10)
         
         ttk.Button(button_frame, text="About", command=self.show_about).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Preview", command=self.open_preview).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Start Resizing", command=self.start_resizing).pack(side=tk.RIGHT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_resizing,
+                                        state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
         ttk.Button(button_frame, text="Exit", command=self.root.quit).pack(side=tk.RIGHT, padx=5)
     
     def browse_input(self):
@@ -171,6 +322,7 @@ class ImageResizerApp:
             self.input_entry.delete(0, tk.END)
             self.input_entry.insert(0, folder)
             self.log(f"Input folder set to: {folder}")
+            self.update_preview_folder()
     
     def browse_output(self):
         folder = filedialog.askdirectory(title="Select Output Folder")
@@ -181,7 +333,14 @@ class ImageResizerApp:
             self.log(f"Output folder set to: {folder}")
     
     def log(self, message):
-        self.log_text.insert(tk.END, message + "\n")
+        self.log_lines([message])
+    
+    def log_lines(self, lines):
+        """Append lines to the log area in one insert, keeping at most MAX_LOG_LINES lines"""
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
         self.log_text.see(tk.END)
     
     def update_progress(self):
@@ -198,17 +357,37 @@ class ImageResizerApp:
                         self.status_label["text"] = f"Processing: {current}/{total} images ({int(progress)}%)"
                 
                 elif message_type == "log":
-                    self.log(message)
+                    self.log_lines(message)
                 
                 elif message_type == "complete":
-                    self.progress_bar["value"] = 100
-                    self.status_label["text"] = "Complete!"
                     self.processing = False
-                    messagebox.showinfo("Complete", f"Successfully processed {message} images!")
+                    self.cancel_button["state"] = tk.DISABLED
+                    if message is None:
+                        self.progress_bar["value"] = 100
+                        self.status_label["text"] = "Complete!"
+                        messagebox.showinfo("Complete", "No images were processed.")
+                    elif message["cancelled"]:
+                        self.status_label["text"] = "Cancelled"
+                        messagebox.showinfo("Cancelled", f"Cancelled after processing {message['total']} images.")
+                    else:
+                        self.progress_bar["value"] = 100
+                        self.status_label["text"] = "Complete!"
+                        result_text = f"Successfully processed {message['succeeded']} images!"
+                        if message["input_bytes"]:
+                            result_text += (f"\nSize: {format_bytes(message['input_bytes'])} -> "
+                                            f"{format_bytes(message['output_bytes'])} "
+                                            f"({1 - message['output_bytes'] / message['input_bytes']:.1%} smaller)")
+                        if message.get("quality_searches"):
+                            trials = message["trial_encodes"] / message["quality_searches"]
+                            result_text += f"\nQuality search: {trials:.1f} trial encodes per image on average"
+                        if message["failed"]:
+                            result_text += f"\n{message['failed']} images could not be processed (see the log)."
+                        messagebox.showinfo("Complete", result_text)
                 
                 elif message_type == "error":
                     self.status_label["text"] = "Error occurred"
                     self.processing = False
+                    self.cancel_button["state"] = tk.DISABLED
                     messagebox.showerror("Error", message)
                 
                 self.progress_queue.task_done()
@@ -222,11 +401,11 @@ class ImageResizerApp:
     def toggle_resize_mode(self):
         """Toggle between dimensions and percentage resize modes"""
         if self.resize_mode.get() == "dimensions":
-            self.dimensions_frame.pack(fill=tk.X, pady=5)
+            self.dimensions_frame.pack(fill=tk.X, pady=5, before=self.options_frame)
             self.percentage_frame.pack_forget()
         else:
             self.dimensions_frame.pack_forget()
-            self.percentage_frame.pack(fill=tk.X, pady=5)
+            self.percentage_frame.pack(fill=tk.X, pady=5, before=self.options_frame)
             
     def show_about(self):
         """Show about dialog with application information"""
@@ -240,6 +419,79 @@ class ImageResizerApp:
         
         messagebox.showinfo("About Image Resizer", about_text)
     
+    def open_preview(self):
+        """Open the thumbnail grid and before/after preview, or bring it to the front"""
+        if self.preview_window is not None:
+            self.preview_window.window.lift()
+            return
+        # The preview follows every change of the resize and output settings
+        variables = [self.width, self.height, self.percentage, self.resize_mode, self.maintain_aspect_ratio,
+                     self.fast_downscale, self.backend, self.output_format, self.preset, self.quality,
+                     self.webp_method, self.max_bytes, self.progressive, self.optimize, self.strip_metadata]
+        self.preview_window = PreviewWindow(self.root, self.read_resize_settings, variables,
+                                            on_close=self.preview_closed)
+        self.update_preview_folder()
+    
+    def preview_closed(self):
+        self.preview_window = None
+    
+    def update_preview_folder(self):
+        """Show the current input folder in the preview window, if it is open"""
+        input_folder = self.input_entry.get().strip()
+        if self.preview_window is not None and os.path.isdir(input_folder):
+            self.preview_window.load_folder(input_folder, recursive=self.include_subfolders.get(),
+                                            exclude=self.output_entry.get().strip() or None)
+    
+    def read_resize_settings(self):
+        """
+        Read and validate the resize and output settings.
+        
+        Returns:
+            Dictionary of size, percentage, maintain_aspect, fast, output and backend
+            (keyword arguments of the resize core); raises ValueError when a
+            setting is invalid
+        """
+        size = None
+        percentage = None
+        if self.resize_mode.get() == "dimensions":
+            size = (int(self.width.get()), int(self.height.get()))
+            if size[0] <= 0 or size[1] <= 0:
+                raise ValueError("Width and height must be positive integers")
+        else:  # percentage mode
+            percentage = float(self.percentage.get())
+            if percentage <= 0:
+                raise ValueError("Percentage must be a positive number")
+        quality = None
+        if self.quality.get().strip():
+            quality = int(self.quality.get())
+            if not 1 <= quality <= 100:
+                raise ValueError("Quality must be between 1 and 100")
+        webp_method = None
+        if self.webp_method.get().strip():
+            webp_method = int(self.webp_method.get())
+            if not 0 <= webp_method <= 6:
+                raise ValueError("WebP method must be between 0 and 6")
+        max_bytes = None
+        if self.max_bytes.get().strip():
+            # A size such as 50000, 50KB or 1.5MB
+            max_bytes = byte_size(self.max_bytes.get())
+            if max_bytes <= 0:
+                raise ValueError("Max size must be positive")
+        return {
+            "size": size,
+            "percentage": percentage,
+            "maintain_aspect": self.maintain_aspect_ratio.get(),
+            "fast": self.fast_downscale.get(),
+            "backend": self.backend.get(),
+            # Unchecked boxes leave the preset (or Pillow's default) in place
+            "output": output_options(
+                None if self.preset.get() == NO_PRESET else self.preset.get(),
+                FORMAT_CHOICES[self.output_format.get()], quality,
+                self.progressive.get() or None, self.optimize.get() or None, webp_method,
+                self.strip_metadata.get() or None, max_bytes
+            ),
+        }
+    
     def start_resizing(self):
         """Start the image resizing process in a separate thread"""
         if self.processing:
@@ -250,25 +502,15 @@ class ImageResizerApp:
         input_folder = self.input_entry.get().strip()
         output_folder = self.output_entry.get().strip()
         
-        # Validate resize parameters based on mode
-        resize_mode = self.resize_mode.get()
-        width = None
-        height = None
-        percentage = None
-        
         try:
-            if resize_mode == "dimensions":
-                width = int(self.width.get())
-                height = int(self.height.get())
-                if width <= 0 or height <= 0:
-                    raise ValueError("Width and height must be positive integers")
-            else:  # percentage mode
-                percentage = float(self.percentage.get())
-                if percentage <= 0:
-                    raise ValueError("Percentage must be a positive number")
+            settings = self.read_resize_settings()
+            workers = int(self.workers.get())
+            if workers <= 0:
+                raise ValueError("Workers must be a positive integer")
         except ValueError as e:
             messagebox.showerror("Invalid Input", str(e))
             return
+        width, height = settings["size"] or (None, None)
             
         # Validate folders
         if not input_folder:
@@ -296,81 +538,58 @@ class ImageResizerApp:
         self.progress_bar["value"] = 0
         self.status_label["text"] = "Starting..."
         self.processing = True
+        self.cancel_event.clear()
+        self.cancel_button["state"] = tk.NORMAL
         
         # Start processing thread
         threading.Thread(
             target=self.process_images_thread,
             args=(input_folder, output_folder, width, height, 
-                  self.maintain_aspect_ratio.get(), percentage),
+                  settings["maintain_aspect"], settings["percentage"]),
+            kwargs={
+                "fast": settings["fast"],
+                "recursive": self.include_subfolders.get(),
+                "write_profile": self.write_profile.get(),
+                "workers": workers,
+                "backend": settings["backend"],
+                "output": settings["output"],
+            },
             daemon=True
         ).start()
     
-    def process_images_thread(self, input_folder, output_folder, width, height, maintain_aspect, percentage=None):
-        """Process images in a separate thread to keep the UI responsive"""
+    def cancel_resizing(self):
+        """Ask the worker thread to stop; images already being resized are finished"""
+        if self.processing:
+            self.cancel_event.set()
+            self.status_label["text"] = "Cancelling..."
+    
+    def process_images_thread(self, input_folder, output_folder, width, height, maintain_aspect, percentage=None,
+                              fast=False, recursive=False, write_profile=False, workers=None, output=None,
+                              backend=None):
+        """Process images on the shared parallel engine in a separate thread to keep the UI responsive"""
         try:
-            # Get all supported image files in the input directory
-            input_path = Path(input_folder)
-            supported_extensions = ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.bmp", "*.tiff", "*.tif", "*.webp"]
-            
-            image_files = []
-            for ext in supported_extensions:
-                image_files.extend(list(input_path.glob(ext)))
-                # Also check for uppercase extensions
-                image_files.extend(list(input_path.glob(ext.upper())))
+            # Count the images first so the progress bar can show a percentage
+            total_files = sum(1 for _ in scan_images(input_folder, recursive=recursive, exclude=output_folder))
             
-            if not image_files:
-                self.progress_queue.put(("log", f"No supported images found in {input_folder}"))
-                self.progress_queue.put(("log", f"Supported formats: JPG, PNG, GIF, BMP, TIFF, WEBP"))
-                self.progress_queue.put(("complete", 0))
+            if not total_files:
+                self.progress_queue.put(("log", [f"No supported images found in {input_folder}",
+                                                 f"Supported formats: JPG, PNG, GIF, BMP, TIFF, WEBP"]))
+                self.progress_queue.put(("complete", None))
                 return
-                
-            total_files = len(image_files)
-            self.progress_queue.put(("log", f"Found {total_files} images to process"))
             
-            # Process each image
-            for i, image_file in enumerate(image_files, 1):
-                output_path = os.path.join(output_folder, image_file.name)
-                
-                try:
-                    with Image.open(image_file) as img:
-                        original_width, original_height = img.size
-                        
-                        if percentage is not None:
-                            # Calculate new dimensions based on percentage
-                            scale_factor = percentage / 100.0
-                            new_width = int(original_width * scale_factor)
-                            new_height = int(original_height * scale_factor)
-                            resize_type = f"{percentage}% ({new_width}x{new_height})"
-                        else:
-                            # Calculate new size if maintaining aspect ratio
-                            if maintain_aspect:
-                                aspect_ratio = original_width / original_height
-                                
-                                if original_width > original_height:
-                                    new_width = width
-                                    new_height = int(width / aspect_ratio)
-                                else:
-                                    new_height = height
-                                    new_width = int(height * aspect_ratio)
-                            else:
-                                new_width, new_height = width, height
-                            
-                            resize_type = f"{new_width}x{new_height}"
-                        
-                        # Resize the image
-                        resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        
-                        # Save the resized image
-                        resized_img.save(output_path)
-                        
-                        self.progress_queue.put(("log", f"Resized: {image_file.name} -> {resize_type}"))
-                except Exception as e:
-                    self.progress_queue.put(("log", f"Error processing {image_file}: {e}"))
-                
-                # Update progress
-                self.progress_queue.put(("progress", (i, total_files)))
+            reporter = ProgressReporter(self.progress_queue, total_files)
+            reporter.log(f"Found {total_files} images to process")
+            profile_path = os.path.join(output_folder, PROFILE_REPORT_NAME) if write_profile else None
+            
+            summary = process_images(
+                input_folder, output_folder, width=width, height=height, percentage=percentage,
+                workers=workers, fast=fast, recursive=recursive, profile_path=profile_path,
+                maintain_aspect=maintain_aspect, output=output, backend=backend or DEFAULT_BACKEND,
+                log=reporter.log, on_result=reporter.result, cancel_event=self.cancel_event
+            )
+            reporter.flush()
             
-            self.progress_queue.put(("complete", total_files))
+            self.progress_queue.put(("complete", summary))
             
         except Exception as e:
             self.progress_queue.put(("error", str(e)))
@@ -383,4 +602,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Required for worker processes in frozen executables on Windows
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
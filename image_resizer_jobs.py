@@ -0,0 +1,223 @@
+"""
+Image Resizer Jobs
+
+Runs a stream of resize jobs from a JSONL file (or stdin), one JSON object per
+line, each with its own source, destination, size and format:
+
+    {"source": "in/a.jpg", "destination": "out/a.webp", "width": 800, "height": 600, "format": "webp"}
+    {"id": "b-thumb", "source": "in/b.png", "destination": "out/b_small.png", "percentage": 25}
+
+Fields left out of a job fall back to the command line options. The result of
+every job is appended to a JSONL results log as soon as it finishes, with its
+status, stage timings and input and output bytes. Jobs are read lazily and only
+a small multiple of the worker count is in flight, so memory use does not grow
+with the number of jobs. Invalid or failing jobs are logged and the run goes on.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import sys
+import json
+import math
+import time
+
+from image_resizer import WorkerPool, _run_job, add_result, new_summary
+from image_resizer_backend import DEFAULT_BACKEND
+from image_resizer_output import format_for_path, output_extension_path, output_options
+from image_resizer_strips import DEFAULT_LARGE_IMAGE_PIXELS
+
+
+# Fields a job record may have
+JOB_FIELDS = {"id", "source", "destination", "width", "height", "percentage", "keep_aspect", "fast",
+              "format", "preset", "quality", "progressive", "optimize", "webp_method", "strip_metadata", "max_bytes"}
+
+# Job record fields -> image_resizer_output.output_options keyword arguments
+_OUTPUT_FIELDS = {"preset": "preset", "format": "image_format", "quality": "quality",
+                  "progressive": "progressive", "optimize": "optimize", "webp_method": "method",
+                  "strip_metadata": "strip_metadata", "max_bytes": "max_bytes"}
+
+
+def _positive_number(record, field, kind=int):
+    value = record[field]
+    # JSON numbers such as 1e999 decode to infinity, which int() cannot convert
+    if (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0
+            or kind(value) != value):
+        raise ValueError(f"{field} must be a positive {'integer' if kind is int else 'number'}")
+    return kind(value)
+
+
+def parse_job(record, defaults=None):
+    """
+    Turn a job record into a job for image_resizer.run_jobs.
+
+    Args:
+        record: Decoded JSON object of one line
+        defaults: Optional dictionary with size, percentage, maintain_aspect, fast,
+                  large_image_pixels, output (encoder settings) and backend used
+                  for the fields the record leaves out
+
+    Returns:
+        Tuple of (input_path, output_path, options)
+
+    Raises:
+        ValueError: If the record is not a valid job
+    """
+    defaults = defaults or {}
+    if not isinstance(record, dict):
+        raise ValueError("a job must be a JSON object")
+    unknown = sorted(set(record) - JOB_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    source, destination = record.get("source"), record.get("destination")
+    if not (isinstance(source, str) and source and isinstance(destination, str) and destination):
+        raise ValueError("source and destination are required")
+
+    if "percentage" in record:
+        size, percentage = None, _positive_number(record, "percentage", float)
+    elif "width" in record or "height" in record:
+        if "width" not in record or "height" not in record:
+            raise ValueError("width and height must be given together")
+        size, percentage = (_positive_number(record, "width"), _positive_number(record, "height")), None
+    else:
+        size, percentage = defaults.get("size"), defaults.get("percentage")
+        if size is None and percentage is None:
+            raise ValueError("no size: give width and height, or percentage")
+
+    for field in ("format", "preset"):
+        if field in record and not isinstance(record[field], str):
+            raise ValueError(f"{field} must be a string")
+    for field in ("keep_aspect", "fast", "progressive", "optimize", "strip_metadata"):
+        if field in record and not isinstance(record[field], bool):
+            raise ValueError(f"{field} must be true or false")
+    if "quality" in record and not (isinstance(record["quality"], int) and 1 <= record["quality"] <= 100):
+        raise ValueError("quality must be an integer between 1 and 100")
+    if "webp_method" in record and not (isinstance(record["webp_method"], int) and 0 <= record["webp_method"] <= 6):
+        raise ValueError("webp_method must be an integer between 0 and 6")
+    if "max_bytes" in record:
+        _positive_number(record, "max_bytes")
+    output = dict(defaults.get("output") or {})
+    output.update(output_options(**{keyword: record.get(field) for field, keyword in _OUTPUT_FIELDS.items()}))
+
+    if record.get("format"):
+        # The destination gets the extension of the requested format unless it already has one
+        extension_format = format_for_path(destination)
+        if extension_format != output["format"]:
+            destination = output_extension_path(destination, output)
+
+    options = {
+        "size": size,
+        "percentage": percentage,
+        "fast": bool(record.get("fast", defaults.get("fast", False))),
+        "maintain_aspect": bool(record.get("keep_aspect", defaults.get("maintain_aspect", False))),
+        "large_image_pixels": defaults.get("large_image_pixels", DEFAULT_LARGE_IMAGE_PIXELS),
+        "output": output,
+    }
+    if defaults.get("backend", DEFAULT_BACKEND) != DEFAULT_BACKEND:
+        options["backend"] = defaults["backend"]
+    return source, destination, options
+
+
+def run_job_stream(lines, results, workers=None, defaults=None):
+    """
+    Run the jobs read from lines on a pool of worker processes.
+
+    Args:
+        lines: Iterable of JSONL lines, e.g. an open file
+        results: Text file the JSONL results log is written to
+        workers: Number of worker processes (defaults to the CPU count). With a
+                 single worker the jobs run in the current process.
+        defaults: Defaults for the job fields (see parse_job)
+
+    Returns:
+        Summary dictionary like image_resizer.run_jobs, without the list of
+        failures (they are in the results log), plus the number of invalid lines
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = new_summary(invalid=0)
+    # Line number -> (job, id) of the jobs in flight
+    in_flight = {}
+    start_time = time.perf_counter()
+
+    def log_result(entry):
+        results.write(json.dumps(entry) + "\n")
+        results.flush()
+
+    def finish(number, result):
+        job, job_id = in_flight.pop(number)
+        _, success, message, stats = result
+        add_result(summary, result, keep_failures=False)
+        entry = {"line": number, "id": job_id, "source": job[0], "destination": job[1]}
+        if success:
+            stages = {stage: round(seconds, 4) for stage, seconds in stats["stages"].items()}
+            entry.update(status="ok", message=message, seconds=round(sum(stats["stages"].values()), 4),
+                         stages=stages, input_bytes=stats.get("input_bytes", 0),
+                         output_bytes=stats.get("output_bytes", 0))
+            if "trial_encodes" in stats:
+                entry.update(quality=stats.get("quality"), trial_encodes=stats["trial_encodes"])
+        else:
+            entry.update(status="error", error=message)
+        log_result(entry)
+
+    def jobs():
+        last_directory = None
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            job_id = None
+            try:
+                record = json.loads(line)
+                job_id = record.get("id") if isinstance(record, dict) else None
+                job = parse_job(record, defaults)
+            except ValueError as e:
+                summary["total"] += 1
+                summary["failed"] += 1
+                summary["invalid"] += 1
+                log_result({"line": number, "id": job_id, "status": "invalid", "error": str(e)})
+                continue
+            in_flight[number] = (job, job_id)
+            # Consecutive jobs usually share their destination folder
+            directory = os.path.dirname(job[1])
+            if directory and directory != last_directory:
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                except OSError as e:
+                    finish(number, (job[0], False, str(e), None))
+                    continue
+                last_directory = directory
+            yield number, job
+
+    if workers == 1:
+        for number, job in jobs():
+            finish(number, _run_job(job, profile=True))
+    else:
+        def done(number, result, error):
+            finish(number, result if error is None else (in_flight[number][0][0], False, error, None))
+        with WorkerPool(workers) as pool:
+            pool.run(((number, (job, True)) for number, job in jobs()), done)
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    return summary
+
+
+def run_job_file(jobs_path, results_path="-", workers=None, defaults=None):
+    """
+    Run the jobs of a JSONL file ("-" for stdin) and write the results log to results_path ("-" for stdout).
+
+    Returns:
+        Summary dictionary from run_job_stream
+    """
+    jobs_file = sys.stdin if jobs_path == "-" else open(jobs_path, encoding="utf-8")
+    results_file = sys.stdout if results_path == "-" else open(results_path, "w", encoding="utf-8")
+    try:
+        return run_job_stream(jobs_file, results_file, workers, defaults)
+    finally:
+        if jobs_file is not sys.stdin:
+            jobs_file.close()
+        if results_file is not sys.stdout:
+            results_file.close()
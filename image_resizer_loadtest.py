@@ -0,0 +1,135 @@
+"""
+Image Resizer Load Test
+
+Sends concurrent requests for random variants of the images in a folder to a
+running image_resizer_server.py and reports requests/sec, latency percentiles
+and the cache hit ratio. Requests use a fixed random seed, so runs against the
+same folder are comparable.
+
+Usage:
+    python image_resizer_server.py ./images --quiet &
+    python image_resizer_loadtest.py ./images --requests 2000 --concurrency 16
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+from image_resizer import scan_images
+
+
+# Variants requested by default, as query strings
+DEFAULT_VARIANTS = ["w=150&h=150", "w=800", "w=800&h=600", "p=25", "p=50&f=webp"]
+
+
+def _percentile(values, fraction):
+    """Return the value at the given fraction (0-1) of the sorted values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_load_test(url, paths, variants, requests=1000, concurrency=8, seed=0):
+    """
+    Send requests for random (path, variant) pairs from concurrency threads.
+
+    Each thread keeps one HTTP connection open.
+
+    Returns:
+        Dictionary of metrics
+    """
+    rng = random.Random(seed)
+    targets = [f"/img/{quote(path.replace(chr(92), '/'))}?{rng.choice(variants)}"
+               for path in (rng.choice(paths) for _ in range(requests))]
+    address = urlsplit(url)
+    lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+    cache = Counter()
+    next_index = 0
+
+    def worker():
+        nonlocal next_index
+        connection = http.client.HTTPConnection(address.hostname, address.port or 80, timeout=60)
+        while True:
+            with lock:
+                if next_index >= len(targets):
+                    break
+                target = targets[next_index]
+                next_index += 1
+            start_time = time.perf_counter()
+            try:
+                connection.request("GET", target)
+                response = connection.getresponse()
+                response.read()
+                status, cache_status = response.status, response.getheader("X-Cache")
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(address.hostname, address.port or 80, timeout=60)
+                status, cache_status = "connection error", None
+            elapsed = time.perf_counter() - start_time
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+                if cache_status:
+                    cache[cache_status] += 1
+        connection.close()
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    served = sum(cache.values())
+    return {
+        "requests": len(targets),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(targets) / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "cache": dict(cache),
+        # Coalesced requests shared a render another request started, so they count as hits
+        "hit_ratio": round((served - cache["miss"]) / served, 4) if served else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running Image Resizer server.")
+    parser.add_argument("folder", help="Folder the server serves, used to list the images to request")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="Server address (default: %(default)s)")
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="Number of requests (default: %(default)s)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8,
+                        help="Number of concurrent connections (default: %(default)s)")
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS, metavar="QUERY",
+                        help="Query strings to choose from (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the request sequence")
+    args = parser.parse_args()
+
+    paths = [relative_path for _, relative_path in scan_images(args.folder, recursive=True)]
+    if not paths:
+        print(f"Error: No supported images found in {args.folder}", file=sys.stderr)
+        sys.exit(1)
+    report = run_load_test(args.url, paths, args.variants, args.requests, args.concurrency, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Image Resizer Manifest
+
+Keeps track of which images have already been resized so that incremental runs
+can skip sources whose output is still up to date. The manifest is a small SQLite
+database stored in the output folder, indexed by source path, so lookups stay fast
+and only changed rows are written no matter how many images the folder holds.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import json
+import sqlite3
+
+
+MANIFEST_FILENAME = ".image_resizer_manifest.db"
+
+# Number of recorded entries between commits, so an interrupted run keeps most of its progress
+COMMIT_INTERVAL = 500
+
+
+def params_key(options):
+    """Return a stable string describing the resize parameters in options."""
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+def _join_paths(paths):
+    """Return the absolute paths as a single newline-separated string."""
+    return "\n".join(os.path.abspath(path) for path in paths)
+
+
+class ResizeManifest:
+    """
+    Manifest of resized images stored in the output folder.
+
+    Each entry records the source path, its size and modification time, the resize
+    parameters used and the output paths. An entry is up to date when all of these
+    still match and every output file still exists.
+    """
+
+    def __init__(self, output_folder, filename=MANIFEST_FILENAME):
+        self.path = os.path.join(output_folder, filename)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " source TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " params TEXT NOT NULL,"
+            " outputs TEXT NOT NULL)"
+        )
+        self.uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_up_to_date(self, source_path, source_stat, params, output_paths):
+        """
+        Check whether source_path was already resized with the same parameters.
+
+        Args:
+            source_path: Path to the source image
+            source_stat: os.stat_result of the source image
+            params: Parameter key from params_key()
+            output_paths: Paths where the resized images are expected
+
+        Returns:
+            True if the existing output can be kept, False if it must be rebuilt
+        """
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, params, outputs FROM entries WHERE source = ?",
+            (os.path.abspath(source_path),)
+        ).fetchone()
+        if row is None:
+            return False
+        return (row == (source_stat.st_size, source_stat.st_mtime_ns, params, _join_paths(output_paths))
+                and all(os.path.exists(path) for path in output_paths))
+
+    def record(self, source_path, source_stat, params, output_paths):
+        """Record that source_path was resized to output_paths with the given parameters."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries (source, size, mtime_ns, params, outputs) VALUES (?, ?, ?, ?, ?)",
+            (os.path.abspath(source_path), source_stat.st_size, source_stat.st_mtime_ns,
+             params, _join_paths(output_paths))
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Write pending entries to disk."""
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        """Commit pending entries and close the database."""
+        self.commit()
+        self.connection.close()
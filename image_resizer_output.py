@@ -0,0 +1,280 @@
+"""
+Image Resizer Output
+
+Output format and encoder settings. The settings of a run are kept in a small
+dictionary (format, quality, progressive, optimize, WebP method, PNG compression
+level, metadata stripping, byte budget) that can be built from a named preset
+plus explicit overrides, and are translated into Pillow save arguments for each
+image.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+import os
+import math
+import importlib
+
+from PIL import Image
+
+
+# Output formats that can be chosen explicitly, with the extension used for them
+OUTPUT_FORMATS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+
+# File extensions of the supported formats -> Pillow format names
+EXTENSION_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".gif": "GIF", ".bmp": "BMP",
+                     ".tiff": "TIFF", ".tif": "TIFF", ".webp": "WEBP"}
+
+# Pillow plugin of each supported format. Only the plugins of the formats in use
+# are imported; Image.registered_extensions() and an Image.open() of a format
+# Pillow has not loaded yet import all of its 40-odd plugins, which costs more
+# than the rest of the startup of a single-image run.
+_FORMAT_PLUGINS = {"JPEG": "JpegImagePlugin", "PNG": "PngImagePlugin", "GIF": "GifImagePlugin",
+                   "BMP": "BmpImagePlugin", "TIFF": "TiffImagePlugin", "WEBP": "WebPImagePlugin"}
+
+# Named encoder presets; explicit settings override the preset values
+PRESETS = {
+    # Cheapest encoder settings: no extra JPEG passes, fastest WebP method, light PNG compression
+    "fast-encode": {"optimize": False, "progressive": False, "method": 0, "compress_level": 1},
+    # Fewest bytes at a quality that is still fine for photos, at the cost of encode time
+    "smallest-bytes": {"quality": 75, "optimize": True, "progressive": True, "method": 6,
+                       "compress_level": 9, "strip_metadata": True},
+}
+
+# Image.info keys holding metadata rather than pixel data
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "photoshop", "comment")
+
+# Formats whose quality is searched to fit a byte budget, and the highest quality
+# tried when no quality is set (higher JPEG qualities add bytes but no visible detail)
+QUALITY_SEARCH_FORMATS = ("JPEG", "WEBP")
+DEFAULT_MAX_QUALITY = 95
+
+# Bits per pixel of photos encoded at a range of qualities (geometric mean over
+# photos and the benchmark corpus at 800 pixels). Only the shape of the curve
+# matters: the first trial encode corrects it for the image at hand.
+_BITS_PER_PIXEL = {
+    "JPEG": ((1, 0.18), (5, 0.22), (10, 0.31), (20, 0.43), (30, 0.54), (40, 0.62), (50, 0.70), (60, 0.79),
+             (70, 0.91), (75, 1.00), (80, 1.15), (85, 1.31), (90, 1.54), (95, 2.09), (100, 4.32)),
+    "WEBP": ((1, 0.21), (5, 0.23), (10, 0.27), (20, 0.34), (30, 0.40), (40, 0.45), (50, 0.50), (60, 0.55),
+             (70, 0.60), (75, 0.63), (80, 0.72), (85, 0.83), (90, 1.02), (95, 1.33), (100, 1.86)),
+}
+
+# Modes each output format can store directly
+_JPEG_MODES = ("RGB", "L", "CMYK")
+_WEBP_MODES = ("RGB", "RGBA")
+
+
+def output_options(preset=None, image_format=None, quality=None, progressive=None, optimize=None,
+                   method=None, strip_metadata=None, max_bytes=None):
+    """
+    Combine a preset with explicit encoder settings.
+
+    Args:
+        preset: Optional name of a preset in PRESETS
+        image_format: Target format ("JPEG", "WEBP" or "PNG"), or None to keep the source format
+        quality: JPEG and WebP quality (1-100)
+        progressive: Write progressive JPEGs
+        optimize: Optimize JPEG Huffman tables and PNG compression
+        method: WebP method (0 fastest to 6 smallest)
+        strip_metadata: Drop EXIF, ICC profile, XMP and comments instead of carrying them over
+        max_bytes: Byte budget per output file; JPEG and WebP images get the highest
+                   quality (up to quality, or DEFAULT_MAX_QUALITY) that fits it
+                   (see encode_within)
+
+    Returns:
+        Dictionary of the settings that are set; empty when everything is left at
+        Pillow's defaults
+    """
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"unknown preset: {preset}")
+    options = dict(PRESETS.get(preset, {}))
+    explicit = {"format": image_format.upper() if image_format else None, "quality": quality,
+                "progressive": progressive, "optimize": optimize, "method": method,
+                "strip_metadata": strip_metadata, "max_bytes": max_bytes}
+    options.update((key, value) for key, value in explicit.items() if value is not None)
+    if options.get("format") is not None and options["format"] not in OUTPUT_FORMATS:
+        raise ValueError(f"unsupported output format: {options['format']}")
+    if options.get("max_bytes") is not None and options["max_bytes"] <= 0:
+        raise ValueError("the byte budget must be positive")
+    return options
+
+
+def byte_size(text):
+    """Parse a byte count such as "50000", "50KB" or "1.5MB" (1 KB = 1000 bytes)."""
+    text = text.strip().upper()
+    for suffix, factor in (("KB", 1000), ("MB", 1000 ** 2), ("K", 1000), ("M", 1000 ** 2), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def format_for_path(path):
+    """
+    Return the Pillow format name for the extension of path, or None if Pillow does not know it.
+
+    The Pillow plugin of the format is imported, so the file can then be opened
+    or saved without Pillow loading every other plugin. Extensions of other
+    formats (e.g. ".jfif" for a job destination) are looked up in all plugins.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    image_format = EXTENSION_FORMATS.get(extension)
+    if image_format is None:
+        return Image.registered_extensions().get(extension)
+    importlib.import_module("PIL." + _FORMAT_PLUGINS[image_format])
+    return image_format
+
+
+def output_extension_path(path, output=None):
+    """Return path with the extension of the target format, or unchanged when the format is kept."""
+    image_format = (output or {}).get("format")
+    if image_format is None:
+        return path
+    return os.path.splitext(path)[0] + OUTPUT_FORMATS[image_format]
+
+
+def _flatten(img, background=(255, 255, 255)):
+    """Composite an image with transparency onto a solid background."""
+    img = img.convert("RGBA")
+    flattened = Image.new("RGB", img.size, background)
+    flattened.paste(img, mask=img.getchannel("A"))
+    flattened.info = {key: value for key, value in img.info.items() if key != "transparency"}
+    return flattened
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def prepare_image(img, image_format, output=None):
+    """
+    Prepare a resized image for saving with the given output settings.
+
+    Converts the image to a mode the target format can store (images with
+    transparency are flattened onto white for JPEG) and builds the Pillow save
+    arguments.
+
+    Returns:
+        Tuple of (image, save keyword arguments)
+    """
+    output = output or {}
+    if image_format == "JPEG" and img.mode not in _JPEG_MODES:
+        img = _flatten(img) if _has_alpha(img) else img.convert("RGB")
+    elif image_format == "WEBP" and img.mode not in _WEBP_MODES:
+        img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+    elif image_format == "PNG" and img.mode == "CMYK":
+        img = img.convert("RGB")
+
+    save_options = {}
+    if image_format in ("JPEG", "WEBP") and output.get("quality") is not None:
+        save_options["quality"] = output["quality"]
+    if image_format == "JPEG":
+        for key in ("progressive", "optimize"):
+            if output.get(key):
+                save_options[key] = True
+    elif image_format == "WEBP" and output.get("method") is not None:
+        save_options["method"] = output["method"]
+    elif image_format == "PNG":
+        if output.get("optimize"):
+            save_options["optimize"] = True
+        elif output.get("compress_level") is not None:
+            save_options["compress_level"] = output["compress_level"]
+
+    if output.get("strip_metadata"):
+        if any(key in img.info for key in METADATA_KEYS):
+            img = img.copy()
+            for key in METADATA_KEYS:
+                img.info.pop(key, None)
+    elif image_format in ("JPEG", "WEBP", "PNG"):
+        # Pillow only writes these when asked to, so carry them over explicitly
+        for key in ("exif", "icc_profile"):
+            if img.info.get(key):
+                save_options[key] = img.info[key]
+    return img, save_options
+
+
+def _model_bits(image_format, quality):
+    """Return the bits per pixel _BITS_PER_PIXEL gives for quality, interpolating log(bits)."""
+    points = _BITS_PER_PIXEL[image_format]
+    for (q0, b0), (q1, b1) in zip(points, points[1:]):
+        if quality <= q1:
+            break
+    return b0 * (b1 / b0) ** ((quality - q0) / (q1 - q0))
+
+
+def _model_quality(image_format, bits):
+    """Return the quality at which _BITS_PER_PIXEL gives bits per pixel."""
+    points = _BITS_PER_PIXEL[image_format]
+    if bits <= points[0][1]:
+        return points[0][0]
+    for (q0, b0), (q1, b1) in zip(points, points[1:]):
+        if bits <= b1:
+            return q0 + (q1 - q0) * math.log(bits / b0) / math.log(b1 / b0)
+    return points[-1][0]
+
+
+def encode_within(img, image_format, save_options, max_bytes):
+    """
+    Encode a prepared image (see prepare_image) in memory within a byte budget.
+
+    JPEG and WebP images get the highest quality up to save_options["quality"]
+    (or DEFAULT_MAX_QUALITY) that fits. The first trial encode uses the quality
+    _BITS_PER_PIXEL predicts for the budget; the next ones correct the
+    prediction by the sizes measured so far and keep the highest quality that
+    fits and the lowest that does not, until they are neighbours. Every trial
+    encodes the same pixels.
+
+    Returns:
+        Tuple of (encoded bytes, quality or None for other formats, number of encodes)
+
+    Raises:
+        ValueError: If the image does not fit the budget, even at quality 1
+    """
+    save_options = dict(save_options)
+
+    def encode(**options):
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format, **save_options, **options)
+        return buffer.getvalue()
+
+    if image_format not in QUALITY_SEARCH_FORMATS:
+        data = encode()
+        if len(data) > max_bytes:
+            raise ValueError(f"{image_format} output is {len(data)} bytes, over the budget of {max_bytes} "
+                             f"(only JPEG and WebP quality can be lowered to fit)")
+        return data, None, 1
+
+    ceiling = save_options.pop("quality", DEFAULT_MAX_QUALITY)
+    target_bits = max_bytes * 8 / (img.width * img.height)
+    # Highest quality known to fit (0: none yet) and lowest known not to fit, with their sizes
+    low, high = 0, ceiling + 1
+    sizes = {}
+    best = None
+    trials = 0
+    quality = min(ceiling, max(1, round(_model_quality(image_format, target_bits))))
+    while True:
+        data = encode(quality=quality)
+        trials += 1
+        sizes[quality] = len(data)
+        if len(data) <= max_bytes:
+            low, best = quality, data
+        else:
+            high = quality
+        if high - low <= 1:
+            break
+        if low and high <= ceiling:
+            # Both sides known: interpolate log(size) between them
+            log_low, log_high = math.log(sizes[low]), math.log(sizes[high])
+            estimate = low + (high - low) * (math.log(max_bytes) - log_low) / (log_high - log_low)
+        else:
+            # Scale the model by how far off it was for this image
+            scale = len(data) * 8 / (img.width * img.height) / _model_bits(image_format, quality)
+            estimate = _model_quality(image_format, target_bits / scale)
+        quality = min(high - 1, max(low + 1, round(estimate)))
+    if best is None:
+        raise ValueError(f"{image_format} output is {sizes[1]} bytes even at quality 1, over the budget of "
+                         f"{max_bytes}")
+    return best, low, trials
@@ -0,0 +1,291 @@
+"""
+Image Resizer Pipeline
+
+Overlaps file I/O with resizing for folders on slow or network file systems.
+Jobs flow through three stages that run at the same time:
+
+- read-ahead: threads read the next source files into memory
+- resize: worker processes decode, resize and encode from memory
+- write-behind: threads write the encoded images
+
+Each stage has its own concurrency, and the bytes held between the stages are
+kept under a memory ceiling, so the wall time approaches the slower of I/O and
+CPU instead of their sum.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from image_resizer import WorkerPool, _resize_file, add_result, new_summary, searches_quality, write_file
+from image_resizer_profile import NULL_TIMER, StageTimer
+
+
+# Default number of reader and writer threads
+DEFAULT_READERS = 4
+DEFAULT_WRITERS = 4
+
+# Default ceiling for the source and encoded bytes held in memory, in MB
+DEFAULT_BUFFER_MB = 256
+
+
+class MemoryBudget:
+    """
+    Counts the bytes held in memory by the pipeline.
+
+    Readers wait in acquire() while the ceiling is reached; a single file larger
+    than the ceiling is still let through when nothing else is held. Encoded
+    outputs are already in memory when they arrive and are only counted
+    (reserve()), so the pipeline hands a file to a worker only when the outputs
+    expected from the files being resized fit as well (see run_pipelined_jobs).
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        """Wait until size bytes fit under the ceiling and reserve them; False once closed."""
+        with self.condition:
+            while self.used and self.used + size > self.limit and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return False
+            self.reserve(size)
+            return True
+
+    def reserve(self, size):
+        """Reserve size bytes without waiting, for data that is already in memory."""
+        with self.condition:
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    def close(self):
+        """Make waiting and later acquire() calls return False."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class FileSource:
+    """Reads source images from the file system."""
+
+    def size(self, path):
+        return os.path.getsize(path)
+
+    def read(self, path):
+        with open(path, "rb") as source_file:
+            return source_file.read()
+
+
+class FileDestination:
+    """Writes encoded images to the file system, creating folders as needed."""
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_file(data, path)
+
+
+def _read_source(path, budget, source):
+    """
+    Read-ahead stage: read a source file into memory once it fits in the budget.
+
+    Returns:
+        Tuple of (data or None when the budget was closed, reserved bytes, seconds spent reading)
+    """
+    reserved = source.size(path)
+    if not budget.acquire(reserved):
+        return None, 0, 0.0
+    start_time = time.perf_counter()
+    try:
+        data = source.read(path)
+    except BaseException:
+        budget.release(reserved)
+        raise
+    return data, reserved, time.perf_counter() - start_time
+
+
+def _render_job(job, data, profile=False):
+    """
+    Resize stage (worker process): resize one file from memory and return the encoded outputs.
+
+    Returns:
+        Tuple of (input_path, success, message, stats, outputs) where outputs is a
+        list of (output path, encoded bytes)
+    """
+    input_path, output_path, options = job
+    timer = StageTimer() if profile or searches_quality(options) else NULL_TIMER
+    outputs = []
+    try:
+        resize_type = _resize_file(input_path, output_path, timer=timer, source=data,
+                                   sink=lambda path, encoded: outputs.append((path, encoded)), **options)
+        stats = timer.record
+        if stats is None:
+            stats = {"input_bytes": len(data), "output_bytes": sum(len(encoded) for _, encoded in outputs)}
+        return input_path, True, resize_type, stats, outputs
+    except Exception as e:
+        return input_path, False, str(e), None, []
+
+
+def _write_outputs(outputs, destination):
+    """Write-behind stage: write the encoded outputs of one job and return the seconds spent."""
+    start_time = time.perf_counter()
+    for path, data in outputs:
+        destination.write(path, data)
+    return time.perf_counter() - start_time
+
+
+def run_pipelined_jobs(jobs, workers=None, readers=DEFAULT_READERS, writers=DEFAULT_WRITERS,
+                       max_buffer_bytes=DEFAULT_BUFFER_MB * 1024 * 1024, on_result=None, profile=None,
+                       cancel_event=None, source=None, destination=None):
+    """
+    Run resize jobs with read-ahead and write-behind stages around the worker processes.
+
+    Takes the same jobs and returns the same summary as image_resizer.run_jobs.
+    A job is reported once its outputs are written. The resize stage always runs
+    in worker processes, even with a single worker, so it overlaps with the I/O.
+
+    Args:
+        jobs: Iterable of (input_path, output_path, options) tuples
+        workers: Number of worker processes (defaults to the CPU count)
+        readers: Number of threads reading source files
+        writers: Number of threads writing encoded images
+        max_buffer_bytes: Ceiling for the source and encoded bytes held in memory
+        on_result: Optional callback called with (input_path, success, message, stats)
+                   for every finished job
+        profile: Optional RunProfile; read time counts as the open stage and
+                 write time as the write stage
+        cancel_event: Optional threading.Event; once set, no new files are read,
+                      files read but not resized are dropped and the jobs being
+                      resized are finished and written
+        source: Object with size(path) and read(path) methods giving the source
+                files (default: FileSource, the file system)
+        destination: Object with a write(path, data) method storing the outputs
+                     (default: FileDestination, the file system)
+
+    Returns:
+        Summary dictionary as from image_resizer.run_jobs, plus peak_buffer_bytes
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = new_summary()
+    source = source or FileSource()
+    destination = destination or FileDestination()
+    budget = MemoryBudget(max_buffer_bytes)
+    start_time = time.perf_counter()
+
+    def record(result):
+        add_result(summary, result, profile)
+        if on_result is not None:
+            on_result(result)
+
+    def add_time(stats, stage, seconds):
+        if profile is not None and stats is not None:
+            stats["stages"][stage] = stats["stages"].get(stage, 0.0) + seconds
+
+    jobs = iter(jobs)
+    exhausted = False
+    # In-flight futures of the read and write stages, mapped to what is needed when they finish
+    reads, writes = {}, {}
+    # Files read but not yet handed to a worker: (job, data, reserved bytes, read seconds)
+    ready = deque()
+    # Largest encoded outputs of a job so far
+    largest_output = 0
+
+    def may_render():
+        """Return True if the outputs expected from the renders in flight and one more fit the budget."""
+        if not (len(render_pool) or writes):
+            # Nothing else can release memory, so the next file always goes ahead
+            return True
+        # Each render may bring outputs as large as the largest so far
+        return budget.used + largest_output * (len(render_pool) + 1) <= budget.limit
+
+    with ThreadPoolExecutor(max_workers=readers) as read_pool, \
+            WorkerPool(workers, _render_job) as render_pool, \
+            ThreadPoolExecutor(max_workers=writers) as write_pool:
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set() and not summary["cancelled"]:
+                    summary["cancelled"] = exhausted = True
+                    budget.close()
+                    while ready:
+                        budget.release(ready.popleft()[2])
+
+                # Read ahead a couple of files per reader beyond those waiting for a worker
+                while not exhausted and len(reads) + len(ready) < readers * 2:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    reads[read_pool.submit(_read_source, job[0], budget, source)] = job
+                while ready and len(render_pool) < workers * 2 and may_render():
+                    job, data, reserved, read_time = ready.popleft()
+                    render_pool.submit((job[0], reserved, read_time), job, data, profile is not None)
+
+                if not (reads or len(render_pool) or writes):
+                    break
+                # Wake up regularly so a cancellation is noticed promptly
+                done, _ = wait(list(reads) + render_pool.futures + list(writes), timeout=0.2,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in reads:
+                        job = reads.pop(future)
+                        try:
+                            data, reserved, read_time = future.result()
+                        except OSError as e:
+                            record((job[0], False, str(e), None))
+                            continue
+                        if data is None:
+                            continue
+                        if summary["cancelled"]:
+                            budget.release(reserved)
+                            continue
+                        ready.append((job, data, reserved, read_time))
+                    elif future in writes:
+                        input_path, message, stats, size = writes.pop(future)
+                        budget.release(size)
+                        try:
+                            add_time(stats, "write", future.result())
+                        except OSError as e:
+                            record((input_path, False, str(e), None))
+                            continue
+                        record((input_path, True, message, stats))
+                for (input_path, reserved, read_time), result, error in render_pool.collect(timeout=0):
+                    if error is not None:
+                        budget.release(reserved)
+                        record((input_path, False, error, None))
+                        continue
+                    input_path, success, message, stats, outputs = result
+                    size = sum(len(data) for _, data in outputs)
+                    # Outputs are counted before the source is released, so the peak is not missed
+                    budget.reserve(size)
+                    budget.release(reserved)
+                    if not success:
+                        record((input_path, False, message, stats))
+                        continue
+                    largest_output = max(largest_output, size)
+                    add_time(stats, "open", read_time)
+                    write_future = write_pool.submit(_write_outputs, outputs, destination)
+                    writes[write_future] = (input_path, message, stats, size)
+        finally:
+            # Release readers still waiting for memory, so the thread pool can shut down
+            budget.close()
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    summary["peak_buffer_bytes"] = budget.peak
+    return summary
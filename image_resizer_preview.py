@@ -0,0 +1,472 @@
+"""
+Image Resizer Preview
+
+Preview window of the GUI: a scrollable grid of thumbnails of the input folder
+and a before/after preview of the current resize settings on the selected image.
+
+Only the tiles in view exist on the canvas, so a folder of 10,000 images costs
+no more window resources than one of 20. Their thumbnails are made on a
+background thread pool with reduced-scale decoding (JPEG images are decoded at
+1/2 to 1/8 of their size), and kept as small JPEG files in an LRU cache in
+memory and on disk, keyed by the path, modification time and size of the
+source, so scrolling back or reopening a folder does not decode anything again.
+Requests for tiles that were scrolled out of view before a thread picked them
+up are dropped.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+import os
+import queue
+import hashlib
+import threading
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from image_resizer import _resize_file, encode_image, format_bytes, resize_pixels, scan_images
+from image_resizer_backend import open_source
+from image_resizer_cache import DiskCache, MemoryCache
+from image_resizer_output import output_extension_path
+
+# Largest width and height of a thumbnail, and the encoder settings they are cached with
+THUMBNAIL_SIZE = 128
+THUMBNAIL_OUTPUT = {"quality": 85, "strip_metadata": True}
+
+# Threads making thumbnails; Pillow releases the GIL while decoding and resizing
+THUMBNAIL_THREADS = min(4, os.cpu_count() or 1)
+
+# Bounds of the thumbnail caches (encoded thumbnails take about 5 KB each)
+MEMORY_CACHE_MB = 32
+DISK_CACHE_MB = 256
+
+# Size of the tiles in the grid, including the file name below the thumbnail
+TILE_WIDTH = THUMBNAIL_SIZE + 16
+TILE_HEIGHT = THUMBNAIL_SIZE + 32
+
+# Largest width and height of the before and after images
+PREVIEW_SIZE = 320
+
+# Milliseconds to wait after a settings change before rendering the preview again,
+# and between two checks for finished thumbnails and previews
+PREVIEW_DELAY_MS = 300
+POLL_INTERVAL_MS = 50
+
+
+def default_cache_folder():
+    """Return the folder of the on-disk thumbnail cache for the current user."""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "image_resizer", "thumbnails")
+
+
+def _fit_size(size, box):
+    """Return size scaled down to fit in box x box pixels with the same aspect ratio (never enlarged)."""
+    scale = min(1.0, box / size[0], box / size[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _scaled_to_fit(img, box):
+    """
+    Resize an opened image to fit in box x box pixels with the resize core's fast
+    path, which asks the decoder for a reduced scale first (see Image.draft).
+
+    Returns:
+        An RGB image, or RGBA when the source has transparency; 16-bit samples
+        are scaled to 8 bits so they can be shown
+    """
+    resized = resize_pixels(img, _fit_size(img.size, box), fast=True)
+    if resized.mode.startswith("I;16"):
+        resized = resized.convert("I").point(lambda value: value / 257).convert("L")
+    has_alpha = resized.mode in ("RGBA", "LA", "PA") or "transparency" in resized.info
+    return resized.convert("RGBA" if has_alpha else "RGB")
+
+
+def make_thumbnail(path, size=THUMBNAIL_SIZE):
+    """
+    Make a thumbnail of the image at path that fits in size x size pixels.
+
+    Returns:
+        The thumbnail encoded as JPEG bytes (transparency is flattened onto white)
+    """
+    with open_source(path) as img:
+        return encode_image(_scaled_to_fit(img, size), "thumbnail.jpg", output=THUMBNAIL_OUTPUT)
+
+
+class ThumbnailLoader:
+    """
+    Makes thumbnails on a thread pool and posts them to a queue.
+
+    Every finished request puts ("thumbnail", path, image, error) on the results
+    queue: a small decoded PIL image, or None and the error message.
+    """
+
+    def __init__(self, results, cache_folder=None, threads=THUMBNAIL_THREADS):
+        self.results = results
+        self.cache_folder = cache_folder or default_cache_folder()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.memory_cache = MemoryCache(MEMORY_CACHE_MB * 1_000_000)
+        self.disk_cache = None
+        # Path -> Future of the requests not finished yet
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _get_disk_cache(self):
+        # Created on first use: reading the cache folder takes a while when it is full
+        with self.lock:
+            if self.disk_cache is None:
+                try:
+                    self.disk_cache = DiskCache(self.cache_folder, DISK_CACHE_MB * 1_000_000)
+                except OSError:
+                    self.disk_cache = False
+            return self.disk_cache
+
+    def request(self, path):
+        """Make the thumbnail of path, unless it is already being made."""
+        with self.lock:
+            if path not in self.pending:
+                self.pending[path] = self.executor.submit(self._load, path)
+
+    def keep_only(self, paths):
+        """Drop the requests for paths not in paths that no thread has picked up yet."""
+        with self.lock:
+            for path, future in list(self.pending.items()):
+                if path not in paths and future.cancel():
+                    del self.pending[path]
+
+    def _load(self, path):
+        try:
+            stat = os.stat(path)
+            key = hashlib.sha1(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\0{THUMBNAIL_SIZE}"
+                               .encode("utf-8", "surrogateescape")).hexdigest()
+            data = self.memory_cache.get(key)
+            if data is None:
+                disk_cache = self._get_disk_cache()
+                data = disk_cache.get(key + ".jpg") if disk_cache else None
+                if data is None:
+                    data = make_thumbnail(path)
+                    if disk_cache:
+                        disk_cache.put(key + ".jpg", data)
+                self.memory_cache.put(key, data)
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            self.results.put(("thumbnail", path, image, None))
+        except Exception as e:
+            self.results.put(("thumbnail", path, None, str(e)))
+        finally:
+            with self.lock:
+                self.pending.pop(path, None)
+
+    def close(self):
+        """Drop the waiting requests and stop the threads once the running ones finish."""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+        self.executor.shutdown(wait=False)
+
+
+def render_preview(path, options, box=PREVIEW_SIZE):
+    """
+    Resize the image at path in memory exactly as a run with options would.
+
+    Args:
+        path: Path of the source image
+        options: Keyword arguments for image_resizer._resize_file (size,
+                 percentage, maintain_aspect, fast, output, backend)
+        box: Largest width and height of the returned images
+
+    Returns:
+        Dictionary with the "before" image (the source scaled to fit in box),
+        the "after" image (the encoded output decoded again; its centre at 100%
+        when it is larger than box) and a caption for each
+    """
+    with open_source(path) as img:
+        source_size, source_format = img.size, img.format
+        before = _scaled_to_fit(img, box)
+
+    outputs = []
+    _resize_file(path, output_extension_path(path, options.get("output")),
+                 sink=lambda output_path, data: outputs.append(data), **options)
+    data = outputs[0]
+    with Image.open(io.BytesIO(data)) as output_img:
+        output_size, output_format = output_img.size, output_img.format
+        if output_img.width > box or output_img.height > box:
+            left = max(0, (output_img.width - box) // 2)
+            top = max(0, (output_img.height - box) // 2)
+            after = output_img.crop((left, top, left + min(box, output_img.width),
+                                     top + min(box, output_img.height)))
+            detail = ", centre at 100%"
+        else:
+            after = output_img.copy()
+            detail = ""
+    after = after.convert("RGBA" if after.mode in ("RGBA", "LA", "PA", "P") else "RGB")
+    return {
+        "before": before,
+        "before_caption": f"Before: {source_size[0]}x{source_size[1]} {source_format}, "
+                          f"{format_bytes(os.path.getsize(path))}",
+        "after": after,
+        "after_caption": f"After: {output_size[0]}x{output_size[1]} {output_format}, "
+                         f"{format_bytes(len(data))}{detail}",
+    }
+
+
+class PreviewWindow:
+    """
+    Window with the thumbnail grid of a folder and a before/after preview.
+
+    settings is a function returning the _resize_file keyword arguments of the
+    current settings, or raising ValueError when they are invalid; the preview
+    follows every change of the given Tk variables.
+    """
+
+    def __init__(self, root, settings, variables, on_close=None):
+        self.settings = settings
+        self.on_close = on_close
+        self.window = tk.Toplevel(root)
+        self.window.title("Image Resizer - Preview")
+        self.window.geometry("720x720")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Thumbnails, scanned folders and previews from the background threads
+        self.messages = queue.Queue()
+        self.loader = ThumbnailLoader(self.messages)
+        self.preview_executor = ThreadPoolExecutor(max_workers=1)
+        self.paths = []
+        self.indexes = {}
+        # Index -> (frame item, image item) and PhotoImage of the tiles on the canvas
+        self.tiles = {}
+        self.photos = {}
+        self.columns = 1
+        self.selected = None
+        # Bumped for every folder and preview request, so stale results are dropped
+        self.folder_generation = 0
+        self.preview_generation = 0
+        self.preview_job = None
+        self.refresh_job = None
+        self.closed = False
+
+        self.create_widgets()
+        self.traces = [(variable, variable.trace_add("write", self.schedule_preview)) for variable in variables]
+        self.poll()
+
+    def create_widgets(self):
+        self.folder_label = ttk.Label(self.window, text="No folder", padding=(10, 5))
+        self.folder_label.pack(fill=tk.X)
+
+        grid_frame = ttk.Frame(self.window)
+        grid_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.canvas = tk.Canvas(grid_frame, background="white", highlightthickness=0,
+                                yscrollincrement=TILE_HEIGHT // 4)
+        scrollbar = ttk.Scrollbar(grid_frame, command=self.scroll)
+        self.canvas.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
+        self.canvas.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+        self.canvas.bind("<Configure>", lambda event: self.layout())
+        self.canvas.bind("<Button-1>", self.select_tile)
+        # Windows and macOS send MouseWheel (to the focused window), X11 sends buttons 4 and 5
+        self.window.bind("<MouseWheel>", lambda event: self.scroll("scroll", -2 if event.delta > 0 else 2, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.scroll("scroll", -2, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll("scroll", 2, "units"))
+
+        preview_frame = ttk.LabelFrame(self.window, text="Before / after (click a thumbnail)")
+        preview_frame.pack(fill=tk.X, padx=10, pady=10)
+        self.preview_labels = {}
+        for column, name in enumerate(("before", "after")):
+            image_label = ttk.Label(preview_frame, anchor=tk.CENTER)
+            image_label.grid(row=0, column=column, padx=5, pady=5)
+            caption_label = ttk.Label(preview_frame, text="", anchor=tk.CENTER)
+            caption_label.grid(row=1, column=column, padx=5)
+            preview_frame.columnconfigure(column, weight=1, minsize=PREVIEW_SIZE)
+            preview_frame.rowconfigure(0, minsize=PREVIEW_SIZE)
+            self.preview_labels[name] = (image_label, caption_label)
+        self.preview_status = ttk.Label(preview_frame, text="")
+        self.preview_status.grid(row=2, column=0, columnspan=2, pady=(0, 5))
+
+    def load_folder(self, folder, recursive=False, exclude=None):
+        """Show the images of folder; the folder is scanned on a background thread."""
+        self.folder_generation += 1
+        generation = self.folder_generation
+        self.folder_label["text"] = f"Scanning {folder}..."
+        self.set_paths([])
+
+        def scan():
+            try:
+                paths = [path for path, _ in scan_images(folder, recursive=recursive, exclude=exclude)]
+                self.messages.put(("folder", generation, (folder, paths, None)))
+            except OSError as e:
+                self.messages.put(("folder", generation, (folder, [], str(e))))
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def set_paths(self, paths):
+        self.paths = paths
+        self.indexes = {path: index for index, path in enumerate(paths)}
+        self.selected = None
+        self.canvas.delete("all")
+        self.tiles.clear()
+        self.photos.clear()
+        self.canvas.yview_moveto(0)
+        self.layout()
+
+    def layout(self):
+        """Fit the grid to the window width and show the tiles in view."""
+        columns = max(1, self.canvas.winfo_width() // TILE_WIDTH)
+        if columns != self.columns:
+            # Tiles change position when the column count changes
+            self.columns = columns
+            self.canvas.delete("tile")
+            self.tiles.clear()
+            self.photos.clear()
+        rows = -(-len(self.paths) // self.columns)
+        self.canvas.config(scrollregion=(0, 0, self.columns * TILE_WIDTH, max(1, rows * TILE_HEIGHT)))
+        self.refresh()
+
+    def scroll(self, *args):
+        self.canvas.yview(*args)
+        # Wait for the scrolling to settle before requesting thumbnails
+        if self.refresh_job is None:
+            self.refresh_job = self.window.after(POLL_INTERVAL_MS, self.refresh)
+
+    def refresh(self):
+        """Create the tiles in view (plus one row on each side), delete the others and request thumbnails."""
+        self.refresh_job = None
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // TILE_HEIGHT) - 1)
+        last_row = int((top + self.canvas.winfo_height()) // TILE_HEIGHT) + 1
+        visible = range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+        for index in [index for index in self.tiles if index not in visible]:
+            self.canvas.delete(f"tile{index}")
+            del self.tiles[index]
+            self.photos.pop(index, None)
+        for index in visible:
+            if index not in self.tiles:
+                self.create_tile(index)
+        visible_paths = {self.paths[index] for index in visible}
+        self.loader.keep_only(visible_paths)
+        for index in visible:
+            if index not in self.photos:
+                self.loader.request(self.paths[index])
+
+    def create_tile(self, index):
+        row, column = divmod(index, self.columns)
+        x, y = column * TILE_WIDTH, row * TILE_HEIGHT
+        tags = ("tile", f"tile{index}")
+        path = self.paths[index]
+        frame = self.canvas.create_rectangle(x + 4, y + 4, x + TILE_WIDTH - 4, y + THUMBNAIL_SIZE + 12,
+                                             outline="#3b82f6" if path == self.selected else "#dddddd",
+                                             width=2 if path == self.selected else 1, tags=tags)
+        name = os.path.basename(path)
+        if len(name) > 20:
+            name = name[:9] + "..." + name[-8:]
+        self.canvas.create_text(x + TILE_WIDTH // 2, y + THUMBNAIL_SIZE + 22, text=name, tags=tags)
+        image = self.canvas.create_image(x + TILE_WIDTH // 2, y + THUMBNAIL_SIZE // 2 + 8, tags=tags)
+        self.tiles[index] = (frame, image)
+
+    def show_thumbnail(self, path, image, error):
+        index = self.indexes.get(path)
+        if index not in self.tiles:
+            return
+        _, image_item = self.tiles[index]
+        if image is None:
+            self.canvas.itemconfig(image_item, state=tk.HIDDEN)
+            x, y = self.canvas.coords(image_item)
+            self.canvas.create_text(x, y, text="Unreadable", fill="#b91c1c", tags=("tile", f"tile{index}"))
+            self.photos[index] = None
+            return
+        self.photos[index] = ImageTk.PhotoImage(image)
+        self.canvas.itemconfig(image_item, image=self.photos[index])
+
+    def select_tile(self, event):
+        column = int(self.canvas.canvasx(event.x) // TILE_WIDTH)
+        index = int(self.canvas.canvasy(event.y) // TILE_HEIGHT) * self.columns + column
+        if column >= self.columns or index >= len(self.paths):
+            return
+        for tile_index, (frame, _) in self.tiles.items():
+            selected = tile_index == index
+            self.canvas.itemconfig(frame, outline="#3b82f6" if selected else "#dddddd", width=2 if selected else 1)
+        self.selected = self.paths[index]
+        self.schedule_preview()
+
+    def schedule_preview(self, *args):
+        """Render the preview again once the settings have not changed for PREVIEW_DELAY_MS."""
+        if self.preview_job is not None:
+            self.window.after_cancel(self.preview_job)
+        self.preview_job = self.window.after(PREVIEW_DELAY_MS, self.start_preview)
+
+    def start_preview(self):
+        self.preview_job = None
+        if self.selected is None:
+            return
+        try:
+            options = self.settings()
+        except ValueError as e:
+            self.preview_status["text"] = f"Invalid settings: {e}"
+            return
+        self.preview_generation += 1
+        generation = self.preview_generation
+        path = self.selected
+        self.preview_status["text"] = f"Rendering {os.path.basename(path)}..."
+
+        def render():
+            # A newer request supersedes this one before it starts
+            if generation != self.preview_generation:
+                return
+            try:
+                self.messages.put(("preview", generation, (render_preview(path, options), None)))
+            except Exception as e:
+                self.messages.put(("preview", generation, (None, str(e))))
+
+        self.preview_executor.submit(render)
+
+    def show_preview(self, preview, error):
+        if error is not None:
+            self.preview_status["text"] = f"Error: {error}"
+            return
+        self.preview_status["text"] = ""
+        # The labels keep a reference to their PhotoImage so it is not freed
+        for name in ("before", "after"):
+            image_label, caption_label = self.preview_labels[name]
+            image_label.photo = ImageTk.PhotoImage(preview[name])
+            image_label.config(image=image_label.photo)
+            caption_label["text"] = preview[f"{name}_caption"]
+
+    def poll(self):
+        """Show the results of the background threads."""
+        if self.closed:
+            return
+        try:
+            while True:
+                message = self.messages.get_nowait()
+                if message[0] == "thumbnail":
+                    self.show_thumbnail(*message[1:])
+                elif message[0] == "folder" and message[1] == self.folder_generation:
+                    folder, paths, error = message[2]
+                    if error is not None:
+                        self.folder_label["text"] = f"Cannot read {folder}: {error}"
+                    else:
+                        self.folder_label["text"] = f"{folder}: {len(paths)} images"
+                    self.set_paths(paths)
+                elif message[0] == "preview" and message[1] == self.preview_generation:
+                    self.show_preview(*message[2])
+        except queue.Empty:
+            pass
+        self.window.after(POLL_INTERVAL_MS, self.poll)
+
+    def close(self):
+        self.closed = True
+        for job in (self.preview_job, self.refresh_job):
+            if job is not None:
+                self.window.after_cancel(job)
+        for variable, trace in self.traces:
+            variable.trace_remove("write", trace)
+        self.loader.close()
+        self.preview_executor.shutdown(wait=False)
+        self.window.destroy()
+        if self.on_close is not None:
+            self.on_close()
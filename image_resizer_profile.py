@@ -0,0 +1,156 @@
+"""
+Image Resizer Profile
+
+Opt-in per-stage timing of the resize pipeline. A StageTimer measures the open,
+decode, resize, encode and write stages of one image together with its byte and
+pixel counts, and a RunProfile aggregates those records into a JSON report with
+per-format and per-stage totals, percentiles and the slowest files.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import json
+import time
+import heapq
+from array import array
+from contextlib import contextmanager
+
+
+# Pipeline stages in the order they run for each image
+STAGES = ("open", "decode", "resize", "encode", "write")
+
+# Number of slowest files listed in the report
+DEFAULT_SLOWEST = 20
+
+
+class StageTimer:
+    """Times the stages of a single image and collects its statistics in record."""
+
+    def __init__(self):
+        self.record = {"stages": {}}
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding the time spent inside it to the named stage."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self.record["stages"]
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start_time
+
+    def set(self, key, value):
+        """Store a statistic such as input_bytes or output_pixels."""
+        self.record[key] = value
+
+    def add(self, key, value):
+        """Add to a numeric statistic, e.g. the output bytes of several renditions."""
+        self.record[key] = self.record.get(key, 0) + value
+
+
+class _NullTimer:
+    """Stand-in for StageTimer when profiling is off; every call is a no-op."""
+
+    record = None
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def _percentiles(values):
+    """Return the p50, p90 and p99 of values in milliseconds."""
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{int(fraction * 100)}_ms": round(ordered[int(round(fraction * last))] * 1000, 3)
+            for fraction in (0.50, 0.90, 0.99)}
+
+
+class RunProfile:
+    """
+    Aggregates StageTimer records of a run into a summary report.
+
+    Only the per-stage durations and the slowest files are kept, so memory stays
+    small even for very large batches.
+    """
+
+    def __init__(self, slowest=DEFAULT_SLOWEST):
+        self.slowest_count = slowest
+        self.stage_durations = {stage: array("d") for stage in STAGES}
+        self.formats = {}
+        self.slowest = []
+        self.images = 0
+        self.start_time = time.perf_counter()
+
+    def add(self, input_path, record):
+        """Add the record of one finished image."""
+        if not record:
+            return
+        self.images += 1
+        stages = record["stages"]
+        total = sum(stages.values())
+        for stage, duration in stages.items():
+            self.stage_durations.setdefault(stage, array("d")).append(duration)
+
+        totals = self.formats.setdefault(record.get("format") or "unknown", {
+            "images": 0, "seconds": 0.0, "input_bytes": 0, "output_bytes": 0,
+            "input_pixels": 0, "output_pixels": 0, "stages": {},
+        })
+        totals["images"] += 1
+        totals["seconds"] += total
+        for key in ("input_bytes", "output_bytes", "input_pixels", "output_pixels"):
+            totals[key] += record.get(key, 0)
+        for stage, duration in stages.items():
+            totals["stages"][stage] = totals["stages"].get(stage, 0.0) + duration
+
+        entry = (total, input_path, record)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        elif total > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def report(self):
+        """Return the summary report as a dictionary."""
+        stages = {}
+        for stage, durations in self.stage_durations.items():
+            if durations:
+                stages[stage] = {"total_s": round(sum(durations), 3), **_percentiles(durations)}
+
+        formats = {}
+        for image_format, totals in self.formats.items():
+            formats[image_format] = {
+                **totals,
+                "seconds": round(totals["seconds"], 3),
+                "stages": {stage: round(seconds, 3) for stage, seconds in totals["stages"].items()},
+            }
+
+        slowest = [
+            {"path": input_path, "seconds": round(total, 3), **record,
+             "stages": {stage: round(seconds, 4) for stage, seconds in record["stages"].items()}}
+            for total, input_path, record in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)
+        ]
+        return {
+            "images": self.images,
+            "wall_time_s": round(time.perf_counter() - self.start_time, 3),
+            "stages": stages,
+            "formats": formats,
+            "slowest": slowest,
+        }
+
+    def write(self, report_path):
+        """Write the summary report to report_path as JSON."""
+        with open(report_path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
@@ -0,0 +1,346 @@
+"""
+Image Resizer Server
+
+Small local HTTP server that resizes images on request instead of pre-rendering
+every size:
+
+    GET /img/<path>?w=800&h=600     resize to 800x600
+    GET /img/<path>?w=800           resize to a width of 800, keeping the aspect ratio
+    GET /img/<path>?p=50            resize to 50%
+    ...&f=webp&q=80                 optionally convert the format and set the quality
+
+Images are rendered on a pool of worker processes. Rendered variants are kept in
+a size-bounded LRU cache in memory and on disk, responses carry an ETag so
+clients can revalidate with If-None-Match, and concurrent requests for the same
+variant share a single render.
+
+Usage:
+    python image_resizer_server.py ./images --port 8080
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import json
+import math
+import hashlib
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from PIL import Image, UnidentifiedImageError
+
+from image_resizer import SUPPORTED_EXTENSIONS, compute_new_size, encode_image, resize_pixels
+from image_resizer_cache import DiskCache, MemoryCache
+from image_resizer_manifest import params_key
+from image_resizer_backend import open_source
+from image_resizer_output import OUTPUT_FORMATS, PRESETS, format_for_path, output_extension_path, output_options
+
+
+DEFAULT_PORT = 8080
+DEFAULT_MEMORY_CACHE_MB = 64
+DEFAULT_DISK_CACHE_MB = 1024
+
+# Largest output accepted from a request, to keep a single request from using
+# unbounded memory
+MAX_OUTPUT_PIXELS = 50_000_000
+
+# Cache-Control max-age of rendered images; clients revalidate with the ETag afterwards
+MAX_AGE = 3600
+
+
+def _content_type(path):
+    """Return the MIME type of the image format matching the extension of path."""
+    image_format = format_for_path(path)
+    return Image.MIME.get(image_format, "application/octet-stream")
+
+
+def render_variant(source_path, width=None, height=None, percentage=None, fast=False,
+                   maintain_aspect=False, output=None):
+    """
+    Resize an image in memory and encode it (worker entry point).
+
+    With only one of width and height, the other follows the aspect ratio.
+
+    Returns:
+        The encoded image as bytes
+    """
+    with open_source(source_path) as img:
+        if percentage is None and (width is None or height is None):
+            scale = width / img.width if width is not None else height / img.height
+            width, height = max(1, round(img.width * scale)), max(1, round(img.height * scale))
+        new_size, _ = compute_new_size(img.size, size=(width, height), percentage=percentage,
+                                       maintain_aspect=maintain_aspect)
+        if new_size[0] <= 0 or new_size[1] <= 0 or new_size[0] * new_size[1] > MAX_OUTPUT_PIXELS:
+            raise ValueError(f"invalid output size {new_size[0]}x{new_size[1]}")
+        resized_img = resize_pixels(img, new_size, fast=fast)
+        return encode_image(resized_img, output_extension_path(source_path, output), output=output)
+
+
+class ResizeService:
+    """
+    Renders and caches image variants below a root folder.
+
+    get() looks a variant up in the memory cache, then the disk cache, and
+    renders it on the process pool otherwise. Concurrent misses for the same
+    variant wait for the same render.
+    """
+
+    def __init__(self, root, workers=None, memory_cache_bytes=DEFAULT_MEMORY_CACHE_MB * 1_000_000,
+                 disk_cache_folder=None, disk_cache_bytes=DEFAULT_DISK_CACHE_MB * 1_000_000, fast=False,
+                 maintain_aspect=False, output=None):
+        self.root = os.path.realpath(root)
+        self.fast = fast
+        self.maintain_aspect = maintain_aspect
+        self.output = output or {}
+        self.executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.memory_cache = MemoryCache(memory_cache_bytes)
+        self.disk_cache = DiskCache(disk_cache_folder, disk_cache_bytes) if disk_cache_folder else None
+        # ETag -> Future of renders in progress
+        self.rendering = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "memory_hits": 0, "disk_hits": 0, "coalesced": 0, "renders": 0,
+                      "not_modified": 0, "errors": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def resolve(self, relative_path):
+        """Return the absolute path of a source image, refusing paths outside the root."""
+        path = os.path.realpath(os.path.join(self.root, relative_path))
+        if os.path.commonpath([path, self.root]) != self.root or not os.path.isfile(path):
+            raise FileNotFoundError(relative_path)
+        if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            raise FileNotFoundError(relative_path)
+        return path
+
+    def variant(self, relative_path, query):
+        """
+        Parse a request into a variant.
+
+        Returns:
+            Tuple of (source path, render keyword arguments, ETag, cache file name)
+        """
+        source_path = self.resolve(relative_path)
+
+        def number(name, convert, maximum):
+            values = query.get(name)
+            if not values:
+                return None
+            value = convert(values[-1])
+            # float() accepts "inf" and "nan", which are outside any range
+            if not 0 < value <= maximum:
+                raise ValueError(f"{name} must be a positive number of at most {maximum:g}")
+            return value
+
+        # Larger sides or percentages cannot give an output of at most MAX_OUTPUT_PIXELS
+        # (even from a 1x1 source); the output size itself is checked when rendering
+        width, height = number("w", int, MAX_OUTPUT_PIXELS), number("h", int, MAX_OUTPUT_PIXELS)
+        percentage = number("p", float, 100 * math.sqrt(MAX_OUTPUT_PIXELS))
+        if percentage is not None and (width is not None or height is not None):
+            raise ValueError("use either w and h or p")
+        if percentage is None and width is None and height is None:
+            raise ValueError("missing w, h or p")
+        output = dict(self.output)
+        if query.get("f"):
+            output["format"] = query["f"][-1].upper()
+            if output["format"] not in OUTPUT_FORMATS:
+                raise ValueError(f"unsupported format: {query['f'][-1]}")
+        quality = number("q", int, 100)
+        if quality is not None:
+            output["quality"] = quality
+
+        options = {"width": width, "height": height, "percentage": percentage, "fast": self.fast,
+                   "maintain_aspect": self.maintain_aspect, "output": output}
+        stat = os.stat(source_path)
+        key = params_key([os.path.relpath(source_path, self.root), stat.st_size, stat.st_mtime_ns, options])
+        etag = hashlib.sha1(key.encode()).hexdigest()
+        cache_name = etag + os.path.splitext(output_extension_path(source_path, output))[1]
+        return source_path, options, etag, cache_name
+
+    def get(self, source_path, options, etag, cache_name):
+        """
+        Return the rendered variant.
+
+        Returns:
+            Tuple of (data, cache status) where the status is "memory", "disk",
+            "coalesced" or "miss"
+        """
+        data = self.memory_cache.get(etag)
+        if data is not None:
+            self.count("memory_hits")
+            return data, "memory"
+        if self.disk_cache is not None:
+            data = self.disk_cache.get(cache_name)
+            if data is not None:
+                self.memory_cache.put(etag, data)
+                self.count("disk_hits")
+                return data, "disk"
+
+        with self.lock:
+            future = self.rendering.get(etag)
+            owner = future is None
+            if owner:
+                future = self.executor.submit(render_variant, source_path, **options)
+                self.rendering[etag] = future
+                self.stats["renders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result(), "coalesced"
+
+        try:
+            data = future.result()
+            self.memory_cache.put(etag, data)
+            if self.disk_cache is not None:
+                self.disk_cache.put(cache_name, data)
+        finally:
+            with self.lock:
+                del self.rendering[etag]
+        return data, "miss"
+
+    def report(self):
+        """Return the request counters and cache sizes."""
+        with self.lock:
+            stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"] + stats["not_modified"]
+        stats["hit_ratio"] = round(hits / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["memory_cache_bytes"] = self.memory_cache.size
+        stats["disk_cache_bytes"] = self.disk_cache.size if self.disk_cache is not None else 0
+        return stats
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class ResizeRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /img/<path> from the server's ResizeService and GET /stats as JSON."""
+
+    server_version = "ImageResizer/2"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        service = self.server.service
+        if url.path == "/stats":
+            self.send_body(HTTPStatus.OK, json.dumps(service.report()).encode(), "application/json")
+            return
+        if not url.path.startswith("/img/"):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        service.count("requests")
+        try:
+            source_path, options, etag, cache_name = service.variant(unquote(url.path[len("/img/"):]),
+                                                                     parse_qs(url.query))
+            if f'"{etag}"' in self.headers.get("If-None-Match", ""):
+                service.count("not_modified")
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_cache_headers(etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data, cache_status = service.get(source_path, options, etag, cache_name)
+        except FileNotFoundError:
+            service.count("errors")
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        except UnidentifiedImageError as e:
+            service.count("errors")
+            self.send_error(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+            return
+        except ValueError as e:
+            service.count("errors")
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except Exception as e:
+            service.count("errors")
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+            return
+        self.send_body(HTTPStatus.OK, data, _content_type(cache_name), etag, cache_status)
+
+    def send_cache_headers(self, etag):
+        self.send_header("ETag", f'"{etag}"')
+        self.send_header("Cache-Control", f"max-age={MAX_AGE}")
+
+    def send_body(self, status, data, content_type, etag=None, cache_status=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if etag is not None:
+            self.send_cache_headers(etag)
+        if cache_status is not None:
+            self.send_header("X-Cache", cache_status)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def serve(root, host="127.0.0.1", port=DEFAULT_PORT, quiet=False, **service_options):
+    """Serve resized images from root until interrupted."""
+    service = ResizeService(root, **service_options)
+    server = ThreadingHTTPServer((host, port), ResizeRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    print(f"Serving resized images from {service.root} on http://{host}:{server.server_port}/img/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve resized images from a folder over HTTP.")
+    parser.add_argument("root", help="Folder containing the source images")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of render processes (default: number of CPUs)")
+    parser.add_argument("--memory-cache", type=float, default=DEFAULT_MEMORY_CACHE_MB, metavar="MB",
+                        help="Size of the in-memory cache of rendered images (default: %(default)g MB)")
+    parser.add_argument("--disk-cache", type=float, default=DEFAULT_DISK_CACHE_MB, metavar="MB",
+                        help="Size of the on-disk cache of rendered images (default: %(default)g MB, 0 disables)")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "image_resizer_cache"),
+                        help="Folder of the on-disk cache (default: %(default)s)")
+    parser.add_argument("-f", "--fast", action="store_true", help="Use the fast downscale path")
+    parser.add_argument("-k", "--keep-aspect", action="store_true",
+                        help="With both w and h, keep the aspect ratio of each image")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Encoder preset for rendered images")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"Error: Folder '{args.root}' does not exist")
+        return
+    if args.workers <= 0:
+        print("Error: Workers must be a positive integer")
+        return
+
+    serve(args.root, host=args.host, port=args.port, quiet=args.quiet, workers=args.workers,
+          memory_cache_bytes=int(args.memory_cache * 1_000_000),
+          disk_cache_folder=args.cache_dir if args.disk_cache > 0 else None,
+          disk_cache_bytes=int(args.disk_cache * 1_000_000), fast=args.fast,
+          maintain_aspect=args.keep_aspect, output=output_options(args.preset))
+
+
+if __name__ == "__main__":
+    # Required for worker processes in frozen executables on Windows
+    multiprocessing.freeze_support()
+    main()
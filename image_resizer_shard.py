@@ -0,0 +1,237 @@
+"""
+Image Resizer Shard
+
+Splits a batch across machines that share a filesystem. Every image belongs to
+exactly one of COUNT shards, chosen by a hash of its path relative to the input
+folder, so each machine started with --shard INDEX/COUNT takes a disjoint slice
+of the same input set without any coordination. The hash spreads the images
+evenly, and an image stays in the same shard when other files are added or
+removed, so repeated and incremental runs give every machine the same work.
+
+Each shard writes a summary into the output folder; this script merges them
+into one report of totals, failures and throughput.
+
+Usage:
+    python image_resizer.py ./in ./out -p 50 --shard 1/3     (on each machine, 1/3 to 3/3)
+    python image_resizer_shard.py ./out --output report.json
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import hashlib
+import argparse
+
+from image_resizer import format_bytes
+
+
+# File names of the shard summaries in the output folder (see summary_path)
+SUMMARY_PATTERN = ".image_resizer_shard_*_of_*.json"
+
+
+def parse_shard(spec):
+    """
+    Parse an INDEX/COUNT shard argument, with INDEX from 1 to COUNT.
+
+    Returns:
+        Tuple of (index, count)
+    """
+    index, separator, count = spec.partition("/")
+    try:
+        if not separator:
+            raise ValueError
+        index, count = int(index), int(count)
+        if not 1 <= index <= count:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard '{spec}' (expected INDEX/COUNT with INDEX from 1 to COUNT, e.g. 2/8)")
+    return index, count
+
+
+def shard_of(relative_path, count):
+    """Return the shard (1 to count) the image at relative_path belongs to."""
+    # Forward slashes, so Windows and POSIX machines agree on the shard of every file
+    key = relative_path.replace(os.sep, "/").encode("utf-8", "surrogateescape")
+    return int.from_bytes(hashlib.md5(key).digest()[:8], "big") % count + 1
+
+
+def select_shard(images, index, count):
+    """Yield the (path, relative_path) tuples of images that belong to the given shard."""
+    for path, relative_path in images:
+        if shard_of(relative_path, count) == index:
+            yield path, relative_path
+
+
+def summary_path(output_folder, index, count):
+    """Return the path of the summary of a shard in the output folder."""
+    return os.path.join(output_folder, f".image_resizer_shard_{index}_of_{count}.json")
+
+
+def manifest_filename(index, count):
+    """Return the manifest file name of a shard, so that machines never write to the same database."""
+    return f".image_resizer_manifest_{index}_of_{count}.db"
+
+
+def write_summary(output_folder, index, count, summary, input_folder, params):
+    """
+    Write the summary of a shard's run to the output folder.
+
+    The file is written under a temporary name and then renamed, so a merge
+    running at the same time never reads half of it.
+
+    Args:
+        output_folder: Output folder shared by the shards
+        index: Shard index (1 to count)
+        count: Number of shards
+        summary: Summary dictionary from image_resizer.process_images
+        input_folder: Input folder of the run
+        params: Parameter key of the resize options, used to find shards run
+                with different settings
+
+    Returns:
+        Path of the summary file
+    """
+    finished = time.time()
+    record = dict(summary)
+    record["failures"] = [{"path": path, "error": error} for path, error in summary["failures"]]
+    record.update(shard={"index": index, "count": count}, host=socket.gethostname(),
+                  input_folder=os.path.abspath(input_folder), params=params,
+                  started=finished - summary["elapsed"], finished=finished)
+    path = summary_path(output_folder, index, count)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    os.replace(temporary_path, path)
+    return path
+
+
+def load_summaries(paths):
+    """Load shard summaries from files and from the output folders given in paths."""
+    summaries = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(glob.escape(path), SUMMARY_PATTERN)))
+        else:
+            files = [path]
+        for file_path in files:
+            with open(file_path, encoding="utf-8") as f:
+                summary = json.load(f)
+            summary["path"] = file_path
+            summaries.append(summary)
+    return summaries
+
+
+def merge_summaries(summaries):
+    """
+    Combine shard summaries into one report.
+
+    Throughput is measured over the wall-clock span from the first shard's
+    start to the last shard's finish. The report lists the shards that are
+    missing, were cancelled or were run with a different shard count or
+    different settings than the latest one (e.g. left over from an earlier
+    run); "complete" is True when there are none of those.
+    """
+    if not summaries:
+        raise ValueError("no shard summaries found")
+    latest = max(summaries, key=lambda summary: summary["finished"])
+    count = latest["shard"]["count"]
+    params = latest["params"]
+    totals = dict.fromkeys(("total", "succeeded", "failed", "skipped", "input_bytes", "output_bytes",
+                            "duplicates", "quality_searches", "trial_encodes"), 0)
+    failures, shards, mismatched = [], [], []
+    seen = set()
+    for summary in sorted(summaries, key=lambda summary: summary["shard"]["index"]):
+        index = summary["shard"]["index"]
+        if summary["shard"]["count"] != count or summary["params"] != params or index in seen:
+            mismatched.append(summary["path"])
+            continue
+        seen.add(index)
+        for key in totals:
+            totals[key] += summary.get(key, 0)
+        failures.extend(dict(failure, shard=index) for failure in summary["failures"])
+        elapsed = summary["elapsed"]
+        shards.append({"index": index, "host": summary["host"], "total": summary["total"],
+                       "failed": summary["failed"], "skipped": summary["skipped"],
+                       "elapsed": round(elapsed, 3), "cancelled": summary["cancelled"],
+                       "images_per_second": round(summary["total"] / elapsed, 2) if elapsed > 0 else None})
+
+    accepted = [summary for summary in summaries if summary["path"] not in mismatched]
+    wall_clock = max(summary["finished"] for summary in accepted) - min(summary["started"] for summary in accepted)
+    # Images each shard handled (resized, failed or up to date), to judge how evenly the work spread
+    handled = [shard["total"] + shard["skipped"] for shard in shards]
+    report = dict(totals)
+    for key in ("duplicates", "quality_searches", "trial_encodes"):
+        if not report[key]:
+            del report[key]
+    report.update(
+        shard_count=count,
+        complete=len(seen) == count and not mismatched and not any(shard["cancelled"] for shard in shards),
+        missing=[index for index in range(1, count + 1) if index not in seen],
+        mismatched=mismatched,
+        wall_clock=round(wall_clock, 3),
+        images_per_second=round(report["total"] / wall_clock, 2) if wall_clock > 0 else None,
+        input_mb_per_second=round(report["input_bytes"] / 1e6 / wall_clock, 2) if wall_clock > 0 else None,
+        imbalance=round(max(handled) / (sum(handled) / len(handled)), 3) if sum(handled) else None,
+        shards=shards,
+        failures=failures,
+    )
+    return report
+
+
+def print_report(report, log=print):
+    """Print a readable version of a merged report."""
+    log(f"Merged {len(report['shards'])} of {report['shard_count']} shards: {report['total']} images in "
+        f"{report['wall_clock']:.2f}s ({report['images_per_second'] or 0:.1f} images/s)")
+    log(f"Succeeded: {report['succeeded']}, Failed: {report['failed']}, Skipped: {report['skipped']}")
+    if report["input_bytes"]:
+        log(f"Size: {format_bytes(report['input_bytes'])} -> {format_bytes(report['output_bytes'])}")
+    for shard in report["shards"]:
+        log(f"  Shard {shard['index']} on {shard['host']}: {shard['total']} images in {shard['elapsed']:.2f}s"
+            f"{' (cancelled)' if shard['cancelled'] else ''}")
+    if report.get("quality_searches"):
+        log(f"Quality search: {report['trial_encodes'] / report['quality_searches']:.1f} trial encodes per "
+            f"output on average")
+    if report["imbalance"] is not None:
+        log(f"Largest shard: {report['imbalance']:.2f}x the average")
+    if report["missing"]:
+        log(f"Missing shards: {', '.join(str(index) for index in report['missing'])}")
+    for path in report["mismatched"]:
+        log(f"Left out (other shard count, settings or a repeated shard): {path}")
+    for failure in report["failures"]:
+        log(f"  Failed (shard {failure['shard']}): {failure['path']}: {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the summaries of a sharded Image Resizer run.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="Output folder of the sharded run, or shard summary files")
+    parser.add_argument("--output", metavar="REPORT", help="Also write the merged report to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        report = merge_summaries(load_summaries(args.paths))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Merged report written to {args.output}")
+    # A missing shard means part of the input was not processed
+    if not report["complete"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Image Resizer Strips
+
+Bounded-memory resizing of very large TIFF and PNG images. Instead of decoding the
+whole raster, the source is read a strip of rows at a time and each strip is
+resized into the output as soon as the rows it needs are available. Memory use
+follows the strip size (plus the output image) rather than the source size.
+
+TIFF strips and tiles are independently compressed by design, so each group of
+them is wrapped in a small in-memory TIFF and decoded by Pillow. PNG rows are
+decompressed incrementally and each strip is wrapped in a small in-memory PNG,
+preceded by the last decoded row of the previous strip so that Pillow can undo
+the row filters.
+
+Output matches the in-memory path within 1 level (out of 255) per channel,
+because every output row is resampled from the same source rows with the same
+filter weights. The only exception is the color of nearly transparent pixels in
+images with an alpha channel, which can differ by a few more levels where the
+alpha is too small for the difference to be visible.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import io
+import math
+import zlib
+import struct
+
+from PIL import Image
+
+from image_resizer_profile import NULL_TIMER
+
+
+# Images with at least this many pixels are resized strip by strip
+DEFAULT_LARGE_IMAGE_PIXELS = 100_000_000
+
+# Approximate number of decoded bytes per strip
+STRIP_BYTES = 4 * 1024 * 1024
+
+# Half-width of the LANCZOS filter in source pixels at a scale of 1
+LANCZOS_SUPPORT = 3
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Bytes per pixel of 8-bit PNG color types: grayscale, RGB, palette, grayscale+alpha, RGBA
+PNG_BYTES_PER_PIXEL = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# PNG chunks copied into every strip so it decodes to the same mode as the source
+PNG_COPIED_CHUNKS = (b"PLTE", b"tRNS")
+
+# TIFF tags needed to decode strips and tiles on their own
+TIFF_DECODING_TAGS = (
+    256,  # ImageWidth
+    258,  # BitsPerSample
+    259,  # Compression
+    262,  # PhotometricInterpretation
+    266,  # FillOrder
+    277,  # SamplesPerPixel
+    278,  # RowsPerStrip
+    284,  # PlanarConfiguration
+    317,  # Predictor
+    320,  # ColorMap
+    322,  # TileWidth
+    323,  # TileLength
+    338,  # ExtraSamples
+    339,  # SampleFormat
+    347,  # JPEGTables
+    529,  # YCbCrCoefficients
+    530,  # YCbCrSubSampling
+    532,  # ReferenceBlackWhite
+)
+IMAGE_LENGTH = 257
+ORIENTATION = 274
+STRIP_OFFSETS, STRIP_BYTE_COUNTS = 273, 279
+TILE_OFFSETS, TILE_BYTE_COUNTS = 324, 325
+
+
+def _png_chunk(chunk_type, data):
+    """Return a complete PNG chunk."""
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+class PngStripReader:
+    """Reads a non-interlaced 8-bit PNG a strip of rows at a time."""
+
+    def __init__(self, fp, size, color_type, copied_chunks):
+        self.fp = fp
+        self.size = size
+        self.color_type = color_type
+        self.copied_chunks = copied_chunks
+        self.stride = 1 + size[0] * PNG_BYTES_PER_PIXEL[color_type]
+        self.strip_rows = max(1, STRIP_BYTES // self.stride)
+
+    @classmethod
+    def open(cls, fp):
+        """Return a reader for fp (positioned after the signature), or None if unsupported."""
+        length, chunk_type = struct.unpack(">I4s", fp.read(8))
+        if chunk_type != b"IHDR":
+            return None
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", fp.read(length))
+        fp.read(4)
+        if bit_depth != 8 or interlace != 0 or color_type not in PNG_BYTES_PER_PIXEL:
+            return None
+
+        # Collect the chunks every strip needs, up to the first image data chunk
+        copied_chunks = []
+        while True:
+            position = fp.tell()
+            length, chunk_type = struct.unpack(">I4s", fp.read(8))
+            if chunk_type == b"IDAT":
+                fp.seek(position)
+                break
+            data = fp.read(length)
+            fp.read(4)
+            if chunk_type in PNG_COPIED_CHUNKS:
+                copied_chunks.append(_png_chunk(chunk_type, data))
+            elif chunk_type == b"IEND":
+                return None
+        return cls(fp, (width, height), color_type, copied_chunks)
+
+    def _compressed_data(self):
+        """Yield the contents of the image data chunks."""
+        while True:
+            length, chunk_type = struct.unpack(">I4s", self.fp.read(8))
+            if chunk_type == b"IEND":
+                return
+            data = self.fp.read(length)
+            self.fp.read(4)
+            if chunk_type == b"IDAT":
+                yield data
+
+    def _decode(self, filtered_rows, previous_row):
+        """Decode filtered rows, using previous_row (unfiltered) as the row above them."""
+        rows = len(filtered_rows) // self.stride
+        if previous_row is not None:
+            filtered_rows = b"\x00" + previous_row + filtered_rows
+            rows += 1
+        header = struct.pack(">IIBBBBB", self.size[0], rows, 8, self.color_type, 0, 0, 0)
+        png = (PNG_SIGNATURE + _png_chunk(b"IHDR", header) + b"".join(self.copied_chunks)
+               + _png_chunk(b"IDAT", zlib.compress(filtered_rows, 0)) + _png_chunk(b"IEND", b""))
+        strip = Image.open(io.BytesIO(png))
+        strip.load()
+        if previous_row is not None:
+            return strip.crop((0, 1, strip.width, strip.height))
+        return strip
+
+    def strips(self):
+        """Yield (y, image) for consecutive strips from top to bottom."""
+        decompressor = zlib.decompressobj()
+        pending = bytearray()
+        previous_row = None
+        y = 0
+        strip_length = self.strip_rows * self.stride
+        for data in self._compressed_data():
+            while data:
+                # Limit the output so highly compressible data cannot expand beyond a strip
+                pending += decompressor.decompress(data, strip_length)
+                data = decompressor.unconsumed_tail
+                while len(pending) >= strip_length:
+                    strip = self._decode(bytes(pending[:strip_length]), previous_row)
+                    del pending[:strip_length]
+                    yield y, strip
+                    y += strip.height
+                    previous_row = strip.crop((0, strip.height - 1, strip.width, strip.height)).tobytes()
+        pending += decompressor.flush()
+        rows = min(len(pending) // self.stride, self.size[1] - y)
+        if rows > 0:
+            yield y, self._decode(bytes(pending[:rows * self.stride]), previous_row)
+
+
+class TiffStripReader:
+    """Reads a strip- or tile-organized TIFF a group of strips (or a row of tiles) at a time."""
+
+    def __init__(self, fp, ifd):
+        self.fp = fp
+        self.ifd = ifd
+        self.size = (ifd[256], ifd[IMAGE_LENGTH])
+        self.tiled = TILE_OFFSETS in ifd
+        if self.tiled:
+            self.offsets, self.byte_counts = ifd[TILE_OFFSETS], ifd[TILE_BYTE_COUNTS]
+            self.block_rows = ifd[323]
+            self.blocks_per_row = math.ceil(self.size[0] / ifd[322])
+        else:
+            self.offsets, self.byte_counts = ifd[STRIP_OFFSETS], ifd[STRIP_BYTE_COUNTS]
+            self.block_rows = min(ifd.get(278, self.size[1]), self.size[1])
+            self.blocks_per_row = 1
+        bits_per_pixel = sum(ifd.get(258, (1,)))
+        rows_per_strip = max(1, STRIP_BYTES * 8 // max(1, self.size[0] * bits_per_pixel))
+        self.blocks_per_strip = max(1, rows_per_strip // self.block_rows)
+
+    @classmethod
+    def open(cls, fp, header):
+        """Return a reader for the first image in fp, or None if unsupported."""
+        # Imported here so runs without TIFF files do not load the TIFF plugin
+        from PIL import TiffImagePlugin
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(header)
+        fp.seek(ifd.next)
+        ifd.load(fp)
+        if ifd.get(284, 1) != 1 or ifd.get(ORIENTATION, 1) != 1:
+            # Separate color planes and rotated images go through the in-memory path
+            return None
+        if not ((STRIP_OFFSETS in ifd and STRIP_BYTE_COUNTS in ifd)
+                or (TILE_OFFSETS in ifd and TILE_BYTE_COUNTS in ifd)):
+            return None
+        return cls(fp, ifd)
+
+    def _decode(self, first_block, block_count, rows):
+        """Decode block_count consecutive strips, or rows of tiles, holding the given number of image rows."""
+        from PIL import TiffImagePlugin
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=self.ifd.prefix)
+        for tag in TIFF_DECODING_TAGS:
+            if tag in self.ifd:
+                ifd[tag] = self.ifd[tag]
+                ifd.tagtype[tag] = self.ifd.tagtype[tag]
+        ifd[IMAGE_LENGTH] = rows
+
+        chunks = []
+        relative_offsets = []
+        position = 0
+        for index in range(first_block * self.blocks_per_row, (first_block + block_count) * self.blocks_per_row):
+            self.fp.seek(self.offsets[index])
+            chunks.append(self.fp.read(self.byte_counts[index]))
+            relative_offsets.append(position)
+            position += self.byte_counts[index]
+
+        counts_tag, offsets_tag = (TILE_BYTE_COUNTS, TILE_OFFSETS) if self.tiled else (STRIP_BYTE_COUNTS, STRIP_OFFSETS)
+        ifd[counts_tag] = tuple(len(chunk) for chunk in chunks)
+        ifd.tagtype[counts_tag] = ifd.tagtype[offsets_tag] = 4  # LONG
+        header = ifd._get_ifh()
+        if self.tiled:
+            # Tile offsets are absolute: place the data right after the directory
+            ifd[offsets_tag] = tuple(relative_offsets)
+            data_start = len(header) + len(ifd.tobytes(len(header)))
+            ifd[offsets_tag] = tuple(data_start + offset for offset in relative_offsets)
+        else:
+            # Strip offsets are made relative to the end of the directory by tobytes()
+            ifd[offsets_tag] = tuple(relative_offsets)
+        tiff = header + ifd.tobytes(len(header)) + b"".join(chunks)
+
+        strip = Image.open(io.BytesIO(tiff))
+        strip.load()
+        return strip
+
+    def strips(self):
+        """Yield (y, image) for consecutive strips from top to bottom."""
+        block_total = math.ceil(self.size[1] / self.block_rows)
+        for first_block in range(0, block_total, self.blocks_per_strip):
+            block_count = min(self.blocks_per_strip, block_total - first_block)
+            y = first_block * self.block_rows
+            rows = min(block_count * self.block_rows, self.size[1] - y)
+            yield y, self._decode(first_block, block_count, rows)
+
+
+def open_strip_reader(input_path, min_pixels=DEFAULT_LARGE_IMAGE_PIXELS):
+    """
+    Return a strip reader for input_path if it is a large image that can be read in strips.
+
+    Args:
+        input_path: Path to the source image, or a binary file object holding it
+        min_pixels: Only images with at least this many pixels get a reader
+
+    Returns:
+        A PngStripReader or TiffStripReader (whose fp must be closed by the caller),
+        or None if the image should be resized in memory
+    """
+    fp = input_path if hasattr(input_path, "read") else open(input_path, "rb")
+    try:
+        header = fp.read(8)
+        if header == PNG_SIGNATURE:
+            reader = PngStripReader.open(fp)
+        elif header[:4] in (b"II*\x00", b"MM\x00*"):
+            reader = TiffStripReader.open(fp, header)
+        else:
+            reader = None
+    except (struct.error, KeyError, ValueError, OSError, SyntaxError):
+        reader = None
+    if reader is None or reader.size[0] * reader.size[1] < min_pixels:
+        fp.close()
+        return None
+    return reader
+
+
+class _StripResizer:
+    """
+    Resizes an image delivered in horizontal strips into one output image.
+
+    Source rows are buffered only until every output row that needs them has been
+    computed. Each band of output rows is resampled from the buffer with a source
+    box expressed in image coordinates, so the filter sees exactly the rows it
+    would see on the whole image.
+    """
+
+    def __init__(self, source_size, new_size):
+        self.source_size = source_size
+        self.new_size = new_size
+        self.scale = source_size[1] / new_size[1]
+        self.margin = math.ceil(LANCZOS_SUPPORT * max(self.scale, 1.0)) + 2
+        self.output = None
+        self.buffer = None
+        self.buffer_y = 0
+        self.output_y = 0
+
+    def feed(self, y, strip, timer=NULL_TIMER):
+        """Add the strip starting at source row y and resize every output row it completes."""
+        if self.buffer is None:
+            self.buffer, self.buffer_y = strip, y
+        else:
+            # The buffer only holds the few rows kept for the filter margin at this point
+            buffer = Image.new(strip.mode, (strip.width, self.buffer.height + strip.height))
+            buffer.paste(self.buffer, (0, 0))
+            buffer.paste(strip, (0, self.buffer.height))
+            if strip.palette is not None:
+                buffer.putpalette(strip.palette)
+            buffer.info = strip.info
+            self.buffer = buffer
+        buffer_end = self.buffer_y + self.buffer.height
+
+        if buffer_end >= self.source_size[1]:
+            output_end = self.new_size[1]
+        else:
+            output_end = min(self.new_size[1], int((buffer_end - self.margin) / self.scale))
+        if output_end <= self.output_y:
+            return
+
+        with timer.stage("resize"):
+            box = (0, self.output_y * self.scale - self.buffer_y,
+                   self.source_size[0], output_end * self.scale - self.buffer_y)
+            band = self.buffer.resize((self.new_size[0], output_end - self.output_y),
+                                      Image.Resampling.LANCZOS, box=box)
+            if self.output is None:
+                self.output = Image.new(band.mode, self.new_size)
+                if band.palette is not None:
+                    self.output.putpalette(band.palette)
+                self.output.info = band.info
+            self.output.paste(band, (0, self.output_y))
+        self.output_y = output_end
+
+        # Drop the source rows no remaining output row needs
+        keep_from = max(self.buffer_y, int(output_end * self.scale) - self.margin)
+        if keep_from > self.buffer_y:
+            self.buffer = self.buffer.crop((0, keep_from - self.buffer_y, self.buffer.width, self.buffer.height))
+            self.buffer_y = keep_from
+
+
+def resize_strips(reader, new_sizes, timer=NULL_TIMER):
+    """
+    Resize the image of a strip reader to one or more sizes in a single pass.
+
+    Args:
+        reader: Reader returned by open_strip_reader
+        new_sizes: List of (width, height) tuples
+        timer: Optional StageTimer receiving the decode and resize times
+
+    Returns:
+        List of resized images in the order of new_sizes
+    """
+    resizers = [_StripResizer(reader.size, new_size) for new_size in new_sizes]
+    strips = reader.strips()
+    while True:
+        with timer.stage("decode"):
+            next_strip = next(strips, None)
+        if next_strip is None:
+            break
+        y, strip = next_strip
+        for resizer in resizers:
+            resizer.feed(y, strip, timer)
+    return [resizer.output for resizer in resizers]
@@ -0,0 +1,417 @@
+"""
+Image Resizer Watch
+
+Long-running watch mode: keeps a pool of worker processes warm and resizes new or
+modified images as soon as they have been completely written to the input folder.
+New files are detected with inotify on Linux and by polling elsewhere (or when
+inotify is unavailable). Already resized images are tracked in the manifest of
+the output folder, so a restarted daemon only catches up on what it missed.
+
+Author: Gianpaolo Albanese
+Email: albaneg@yahoo.com
+Version: 2
+Date: May 8th 2025
+Assisted by: Amazon Q for VS Code
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import signal
+import struct
+import threading
+import ctypes
+import ctypes.util
+from collections import deque
+
+from image_resizer import (SUPPORTED_EXTENSIONS, WorkerPool, add_result, create_directory, job_output_path,
+                           new_summary, output_paths, print_summary, resize_options, scan_images)
+from image_resizer_backend import DEFAULT_BACKEND, check_backend
+from image_resizer_manifest import ResizeManifest, params_key
+from image_resizer_profile import RunProfile
+from image_resizer_strips import DEFAULT_LARGE_IMAGE_PIXELS
+
+
+# Seconds between two scans of the input folder when polling
+DEFAULT_POLL_INTERVAL = 0.25
+
+# Seconds a file found by scanning must keep the same size and modification time
+# before it is considered completely written
+DEFAULT_SETTLE_TIME = 0.3
+
+# When polling, folders are only listed again when their modification time changes;
+# every this many seconds all files are checked, to catch files rewritten in place
+FULL_RESCAN_INTERVAL = 30.0
+
+# Seconds to wait for events when there is nothing else to do
+IDLE_TIMEOUT = 0.5
+
+# Seconds between checks of running jobs and settling files
+BUSY_TIMEOUT = 0.05
+
+# inotify event flags (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_supported(path):
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+class InotifyWatcher:
+    """
+    Reports images in a folder as soon as they are closed after writing or moved in.
+
+    Files reported by read() as ready are complete. Images found in folders that
+    appear while watching (and all images after an event queue overflow) are
+    reported as candidates, which still need to settle.
+    """
+
+    def __init__(self, input_folder, recursive=False, exclude=None):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.input_folder = input_folder
+        self.recursive = recursive
+        self.excluded = os.path.realpath(exclude) if exclude else None
+        self.directories = {}
+        try:
+            self._add_tree(input_folder, required=True)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_tree(self, directory, required=False):
+        """Watch directory and, when recursive, every folder below it."""
+        pending = [directory]
+        while pending:
+            directory = pending.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                             IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+            if wd < 0:
+                error = ctypes.get_errno()
+                # Folders that disappear before they are watched are not an error
+                if required or error != errno.ENOENT:
+                    raise OSError(error, os.strerror(error), directory)
+                continue
+            self.directories[wd] = directory
+            required = False
+            if self.recursive:
+                try:
+                    with os.scandir(directory) as entries:
+                        pending.extend(entry.path for entry in entries
+                                       if entry.is_dir(follow_symlinks=False)
+                                       and os.path.realpath(entry.path) != self.excluded)
+                except FileNotFoundError:
+                    pass
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            Tuple of (ready paths, candidate paths)
+        """
+        ready, candidates = [], []
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return ready, candidates
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return ready, candidates
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: look at every image again
+                candidates.extend(path for path, _ in scan_images(self.input_folder, self.recursive,
+                                                                  exclude=self.excluded))
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and os.path.realpath(path) != self.excluded:
+                    # Files may have been written before the new folder was watched
+                    self._add_tree(path)
+                    try:
+                        candidates.extend(image for image, _ in scan_images(path, recursive=True,
+                                                                            exclude=self.excluded))
+                    except FileNotFoundError:
+                        pass
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and _is_supported(name):
+                ready.append(path)
+        return ready, candidates
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Reports new and changed images in a folder by polling.
+
+    Each poll only stats the watched folders and lists those whose modification
+    time changed, so an idle folder costs one stat per folder. All files are
+    checked every FULL_RESCAN_INTERVAL seconds. Every reported path is a
+    candidate that still needs to settle.
+    """
+
+    def __init__(self, input_folder, recursive=False, exclude=None, interval=DEFAULT_POLL_INTERVAL):
+        self.input_folder = input_folder
+        self.recursive = recursive
+        self.excluded = os.path.realpath(exclude) if exclude else None
+        self.interval = interval
+        # Folder path -> modification time, and folder path -> {file path: (size, mtime)}
+        self.directories = {}
+        self.files = {}
+        # Take a snapshot so only changes from now on are reported
+        self._list(input_folder, [])
+        self.next_poll = time.monotonic() + interval
+        self.next_full_scan = time.monotonic() + FULL_RESCAN_INTERVAL
+
+    def _list(self, directory, candidates):
+        """List directory, adding new or changed images to candidates."""
+        try:
+            self.directories[directory] = os.stat(directory).st_mtime_ns
+            known = self.files.get(directory, {})
+            current = {}
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        if _is_supported(entry.name):
+                            stat = entry.stat()
+                            current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                            if known.get(entry.path) != current[entry.path]:
+                                candidates.append(entry.path)
+                    elif (self.recursive and entry.is_dir(follow_symlinks=False)
+                          and entry.path not in self.directories
+                          and os.path.realpath(entry.path) != self.excluded):
+                        self._list(entry.path, candidates)
+            self.files[directory] = current
+        except FileNotFoundError:
+            self.directories.pop(directory, None)
+            self.files.pop(directory, None)
+
+    def read(self, timeout):
+        """
+        Wait until the next poll (at most timeout seconds) and poll.
+
+        Returns:
+            Tuple of (ready paths, candidate paths); ready is always empty
+        """
+        delay = self.next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return [], []
+        if delay > 0:
+            time.sleep(delay)
+        self.next_poll = time.monotonic() + self.interval
+
+        full_scan = time.monotonic() >= self.next_full_scan
+        if full_scan:
+            self.next_full_scan = time.monotonic() + FULL_RESCAN_INTERVAL
+        candidates = []
+        for directory, mtime_ns in list(self.directories.items()):
+            try:
+                changed = os.stat(directory).st_mtime_ns != mtime_ns
+            except FileNotFoundError:
+                self.directories.pop(directory, None)
+                self.files.pop(directory, None)
+                continue
+            if changed or full_scan:
+                self._list(directory, candidates)
+        return [], candidates
+
+    def close(self):
+        pass
+
+
+def open_watcher(input_folder, recursive=False, exclude=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 use_inotify=True, log=print):
+    """Return an InotifyWatcher when possible, otherwise a PollingWatcher."""
+    if use_inotify:
+        try:
+            return InotifyWatcher(input_folder, recursive, exclude)
+        except (OSError, AttributeError) as e:
+            log(f"inotify is not available ({e}), polling every {poll_interval}s instead")
+    return PollingWatcher(input_folder, recursive, exclude, poll_interval)
+
+
+def _ignore_signals():
+    """Worker initializer: leave SIGINT and SIGTERM to the main process, which drains the pool."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def watch_images(input_folder, output_folder, width=None, height=None, percentage=None, workers=None,
+                 fast=False, recursive=False, renditions=None, profile_path=None,
+                 large_image_pixels=DEFAULT_LARGE_IMAGE_PIXELS, maintain_aspect=False, output=None,
+                 backend=DEFAULT_BACKEND, poll_interval=DEFAULT_POLL_INTERVAL, settle_time=DEFAULT_SETTLE_TIME,
+                 use_inotify=True, log=print, stop_event=None):
+    """
+    Resize images as they arrive in the input folder until stopped.
+
+    Images already in the folder are resized first unless the manifest in the
+    output folder shows they are up to date. On SIGTERM or SIGINT (or when
+    stop_event is set) no new images are started, the running ones are finished,
+    the manifest is saved and a summary is printed.
+
+    Args:
+        input_folder, output_folder, width, height, percentage, workers, fast,
+        recursive, renditions, profile_path, large_image_pixels, maintain_aspect,
+        output, backend: As for image_resizer.process_images
+        poll_interval: Seconds between scans when inotify is not used
+        settle_time: Seconds a file found by scanning must stay unchanged before
+                     it is resized
+        use_inotify: Use inotify when available
+        log: Function receiving every progress message (default: print)
+        stop_event: Optional threading.Event that stops watching when set
+
+    Returns:
+        Summary dictionary as returned by image_resizer.run_jobs
+    """
+    create_directory(output_folder)
+    workers = workers or os.cpu_count() or 1
+    check_backend(backend)
+    options = resize_options(output_folder, width, height, percentage, renditions, fast, large_image_pixels,
+                             maintain_aspect, output, backend)
+    params = params_key(options)
+    stop_event = stop_event or threading.Event()
+    profile = RunProfile() if profile_path else None
+    summary = new_summary(skipped=0)
+    start_time = time.perf_counter()
+
+    previous_handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        def request_stop(signum, frame):
+            stop_event.set()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(signum, request_stop)
+
+    # The watcher is set up before the initial scan so no file can slip in between
+    watcher = open_watcher(input_folder, recursive, output_folder, poll_interval, use_inotify, log)
+    manifest = ResizeManifest(output_folder)
+    # Runs the jobs keyed by (path, source stat, expected outputs, time the file was ready)
+    pool = WorkerPool(workers, initializer=_ignore_signals)
+    max_running = workers * 2
+    # Path -> ((size, mtime), time first seen with that state) of files waiting to settle
+    settling = {}
+    # Ready paths waiting for a free worker, in arrival order
+    queued = deque()
+    # Paths currently being resized, and those modified again in the meantime
+    busy = set()
+    modified = set()
+
+    def settle(path, now):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            settling.pop(path, None)
+            return
+        state = (stat.st_size, stat.st_mtime_ns)
+        seen = settling.get(path)
+        if seen is None or seen[0] != state:
+            settling[path] = (state, now)
+        elif now - seen[1] >= settle_time:
+            del settling[path]
+            queued.append((path, now))
+
+    def submit(path, ready_time):
+        if path in busy:
+            modified.add(path)
+            return
+        try:
+            source_stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        relative_path = os.path.relpath(path, input_folder)
+        output_path = job_output_path(output_folder, relative_path, options)
+        expected_outputs = output_paths(output_path, renditions, output_folder)
+        if manifest.is_up_to_date(path, source_stat, params, expected_outputs):
+            summary["skipped"] += 1
+            return
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        pool.submit((path, source_stat, expected_outputs, ready_time), (path, output_path, options),
+                    profile is not None)
+        busy.add(path)
+
+    def finish(key, result, error):
+        path, source_stat, expected_outputs, ready_time = key
+        busy.discard(path)
+        if error is not None:
+            result = (path, False, error, None)
+        _, success, message, stats = result
+        add_result(summary, result, profile)
+        if success:
+            manifest.record(path, source_stat, params, expected_outputs)
+            log(f"Resized: {os.path.basename(path)} -> {message} "
+                f"({time.monotonic() - ready_time:.2f}s after it was ready)")
+        else:
+            log(f"Error processing {path}: {message}")
+        if path in modified:
+            modified.discard(path)
+            settling.pop(path, None)
+            queued.append((path, time.monotonic()))
+
+    log(f"Watching {input_folder}{' (including subfolders)' if recursive else ''} "
+        f"with {type(watcher).__name__.replace('Watcher', '').lower()}, press Ctrl+C to stop")
+    try:
+        now = time.monotonic()
+        for path, _ in scan_images(input_folder, recursive=recursive, exclude=output_folder):
+            settle(path, now)
+
+        while not stop_event.is_set():
+            ready, candidates = watcher.read(BUSY_TIMEOUT if settling or len(pool) or queued else IDLE_TIMEOUT)
+            now = time.monotonic()
+            for path in ready:
+                settling.pop(path, None)
+                queued.append((path, now))
+            for path in candidates:
+                settle(path, now)
+            for path in list(settling):
+                settle(path, now)
+            while queued and len(pool) < max_running:
+                submit(*queued.popleft())
+            for finished in pool.collect(timeout=0):
+                finish(*finished)
+            if not len(pool) and manifest.uncommitted:
+                manifest.commit()
+
+        log(f"Stopping: finishing {len(pool)} running images")
+        while len(pool):
+            for finished in pool.collect():
+                finish(*finished)
+    finally:
+        pool.shutdown()
+        manifest.close()
+        watcher.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    if profile is not None:
+        profile.write(profile_path)
+        log(f"Profile report written to {profile_path}")
+    print_summary(summary, log)
+    return summary